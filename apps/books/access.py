@@ -0,0 +1,46 @@
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from apps.borrowing.models import BorrowRequest
+
+SALT = 'books.access-grant'
+
+
+def issue_grant(user, book, loan=None):
+    """
+    Return a signed token letting `user` fetch `book`'s file until it
+    expires: after settings.BOOK_ACCESS_GRANT_TTL seconds, or at the end of
+    the loan's due date if that comes first.
+    """
+    now = time.time()
+    expires = now + settings.BOOK_ACCESS_GRANT_TTL
+    grant = {'u': user.pk, 'b': book.pk, 'i': now}
+    if loan is not None:
+        loan_end = timezone.make_aware(datetime.combine(loan.due_date + timedelta(days=1), dt_time.min))
+        expires = min(expires, loan_end.timestamp())
+        grant['l'] = loan.pk
+    grant['e'] = expires
+    return signing.dumps(grant, salt=SALT, compress=True)
+
+
+def check_grant(token, user, book_id):
+    """
+    True if the token is a live grant for this user and book. A grant
+    issued for a loan also needs the loan to be current, looked up by
+    primary key, so returning or cancelling the loan revokes it at once.
+    """
+    if not token or not user.is_authenticated:
+        return False
+    try:
+        grant = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        return False
+    if grant.get('u') != user.pk or grant.get('b') != book_id or grant.get('e', 0) < time.time():
+        return False
+    if 'l' in grant:
+        return BorrowRequest.objects.filter(pk=grant['l']).current().exists()
+    return True
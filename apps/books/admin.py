@@ -1,13 +1,13 @@
 from django.contrib import admin
-from .models import Book, BookWishlist, ReadingHistory
+from .models import Book, BookWishlist, FavoriteGenre, ReadingHistory
 
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'genre', 'status', 'availability', 'created_at')
-    list_filter = ('status', 'genre', 'availability', 'created_at')
+    list_filter = ('status', 'genre', 'availability', 'processing_status', 'created_at')
     search_fields = ('title', 'author__username', 'description')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('processing_status', 'processing_error', 'created_at', 'updated_at')
     
     fieldsets = (
         ('Book Information', {
@@ -17,7 +17,7 @@ class BookAdmin(admin.ModelAdmin):
             'fields': ('publisher', 'isbn', 'pages', 'publication_date')
         }),
         ('Media', {
-            'fields': ('cover_image', 'pdf_file')
+            'fields': ('cover_image', 'pdf_file', 'processing_status', 'processing_error')
         }),
         ('Availability', {
             'fields': ('availability', 'status', 'rejection_reason')
@@ -53,3 +53,11 @@ class ReadingHistoryAdmin(admin.ModelAdmin):
     list_filter = ('completed', 'added_at')
     search_fields = ('user__username', 'book__title')
     readonly_fields = ('added_at',)
+
+
+@admin.register(FavoriteGenre)
+class FavoriteGenreAdmin(admin.ModelAdmin):
+    list_display = ('user', 'genre', 'added_at')
+    list_filter = ('genre',)
+    search_fields = ('user__username',)
+    readonly_fields = ('added_at',)
@@ -5,3 +5,6 @@ class BooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.books'
     verbose_name = 'Books'
+
+    def ready(self):
+        from . import signals  # noqa: F401
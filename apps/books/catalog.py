@@ -0,0 +1,193 @@
+"""
+Bulk catalogue import. Rows are read lazily from CSV or JSON Lines (optionally
+gzipped) and handled one chunk at a time: validate, drop rows whose ISBN,
+or title when there is no ISBN, is already in the catalogue, then
+bulk_create the rest in one transaction. Memory stays flat however large the file is.
+"""
+
+import csv
+import gzip
+import io
+import json
+import time
+from datetime import date
+from itertools import islice
+
+from django.db import transaction
+
+from .facets import invalidate_facets
+from .featured import invalidate_featured_books
+from .models import Book
+from .search import get_search_backend
+
+GENRES = {value for value, _ in Book.GENRE_CHOICES}
+AVAILABILITY = {value for value, _ in Book.AVAILABILITY_CHOICES}
+
+
+class RowError(ValueError):
+    """A row that can't become a Book."""
+
+
+def open_text(path):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_rows(f, fmt):
+    """Yield (line number, dict) for each record in a CSV or JSON Lines stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, RowError(f'invalid JSON: {exc}')
+            continue
+        yield number, record if isinstance(record, dict) else RowError('not a JSON object')
+
+
+def guess_format(path):
+    name = str(path).lower().removesuffix('.gz')
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    raise ValueError(f'Cannot tell the format of {path}; pass --format')
+
+
+def normalize_isbn(value):
+    isbn = ''.join(ch for ch in str(value or '') if ch.isalnum()).upper()
+    if len(isbn) > 20:
+        raise RowError(f'ISBN too long: {value}')
+    return isbn or None
+
+
+def _text(row, name, max_length=None, default=''):
+    value = row.get(name)
+    value = default if value is None or value == '' else str(value).strip()
+    if max_length and len(value) > max_length:
+        raise RowError(f'{name} is longer than {max_length} characters')
+    return value
+
+
+def build_book(row, defaults):
+    """Validate one record and return an unsaved Book."""
+    title = _text(row, 'title', 255)
+    if not title:
+        raise RowError('title is required')
+    try:
+        publication_date = date.fromisoformat(_text(row, 'publication_date'))
+    except ValueError:
+        raise RowError(f'publication_date must be YYYY-MM-DD, got {row.get("publication_date")!r}')
+    genre = _text(row, 'genre', default='other').lower()
+    if genre not in GENRES:
+        raise RowError(f'unknown genre {genre!r}')
+    availability = _text(row, 'availability', default=defaults['availability']).lower()
+    if availability not in AVAILABILITY:
+        raise RowError(f'unknown availability {availability!r}')
+    pages = row.get('pages')
+    try:
+        pages = int(pages) if pages not in (None, '') else None
+    except (TypeError, ValueError):
+        raise RowError(f'pages must be a number, got {pages!r}')
+
+    return Book(
+        title=title,
+        original_author=_text(row, 'original_author', 255) or _text(row, 'author_name', 255) or 'Unknown',
+        description=_text(row, 'description'),
+        genre=genre,
+        language=_text(row, 'language', 50, default='English'),
+        publication_date=publication_date,
+        publisher=_text(row, 'publisher', 255) or None,
+        isbn=normalize_isbn(row.get('isbn')),
+        pages=pages,
+        availability=availability,
+        status=defaults['status'],
+        author=defaults['author'],
+    )
+
+
+class CatalogImport:
+    """
+    One import run. `report` is a text stream receiving one JSON object per
+    line: every rejected or duplicate row, a progress record per chunk and
+    a final summary.
+    """
+
+    def __init__(self, author, status='approved', availability='download', chunk_size=2000,
+                 dry_run=False, report=None, progress=None):
+        self.defaults = {'author': author, 'status': status, 'availability': availability}
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.report = report or io.StringIO()
+        self.progress = progress
+        self.counts = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'errors': 0}
+        self.started = time.monotonic()
+        # dry runs insert nothing, so duplicates across chunks are caught here instead
+        self.planned_keys = set()
+
+    def log(self, **record):
+        self.report.write(json.dumps(record, default=str) + '\n')
+
+    def run(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+            self.log(progress=dict(self.counts, elapsed=round(time.monotonic() - self.started, 2)))
+            if self.progress:
+                self.progress(self.counts)
+        if self.counts['inserted'] and not self.dry_run:
+            invalidate_facets()
+            invalidate_featured_books()
+        self.log(summary=dict(self.counts, dry_run=self.dry_run, elapsed=round(time.monotonic() - self.started, 2)))
+        return self.counts
+
+    def import_chunk(self, chunk):
+        books = []
+        for line, row in chunk:
+            self.counts['rows'] += 1
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                book = build_book(row, self.defaults)
+            except RowError as exc:
+                self.counts['errors'] += 1
+                self.log(line=line, status='error', reason=str(exc))
+                continue
+            books.append((line, book))
+
+        # one lookup per key type for the whole chunk
+        isbns = {book.isbn for _, book in books if book.isbn}
+        titles = {book.title for _, book in books if not book.isbn}
+        existing_isbns = set(Book.objects.filter(isbn__in=isbns).values_list('isbn', flat=True)) if isbns else set()
+        existing_titles = set(
+            Book.objects.filter(title__in=titles).values_list('title', flat=True)) if titles else set()
+
+        new_books = []
+        seen = set()
+        for line, book in books:
+            key = ('isbn', book.isbn) if book.isbn else ('title', book.title)
+            if key in seen or key in self.planned_keys or (
+                    book.isbn in existing_isbns if book.isbn else book.title in existing_titles):
+                self.counts['duplicates'] += 1
+                self.log(line=line, status='duplicate', key=key[0], value=key[1])
+                continue
+            seen.add(key)
+            new_books.append(book)
+
+        if self.dry_run:
+            self.planned_keys |= seen
+        elif new_books:
+            with transaction.atomic():
+                Book.objects.bulk_create(new_books, batch_size=500)
+            get_search_backend().index_books(new_books)
+        self.counts['inserted'] += len(new_books)
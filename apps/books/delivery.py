@@ -0,0 +1,313 @@
+import hashlib
+import io
+import mimetypes
+import re
+import uuid
+from calendar import timegm
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_etags
+
+from .storage import get_blob_store
+
+# Size of each read when streaming a book file to the client
+CHUNK_SIZE = 64 * 1024
+
+# Requests asking for more ranges than this are answered with the full file
+MAX_RANGES = 16
+
+RANGE_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+class BookFile:
+    """
+    The stored file of a book, wherever it lives: the blob store, the
+    pdf_file FileField or the legacy file_blob column. Nothing is read until
+    open() is called, so conditional requests never touch the file.
+    """
+
+    def __init__(self, book):
+        self.book = book
+        if book.file_ref:
+            self.source = 'blob'
+            self.name = book.file_name or f'{book.pk}.bin'
+        elif book.pdf_file:
+            self.source = 'field'
+            self.name = book.pdf_file.name.split('/')[-1]
+        elif book.file_blob:
+            self.source = 'db'
+            self.name = book.file_name or f'{book.pk}.bin'
+        else:
+            raise FileNotFoundError(f'No file stored for book {book.pk}')
+
+        self.content_type = book.file_mime or mimetypes.guess_type(self.name)[0] or 'application/pdf'
+        self.last_modified = book.updated_at
+
+    @property
+    def size(self):
+        if self.source == 'blob':
+            return self.book.file_size if self.book.file_size is not None else get_blob_store().size(self.book.file_ref)
+        if self.source == 'field':
+            return self.book.pdf_file.size
+        return len(self.book.file_blob)
+
+    @property
+    def digest(self):
+        if self.source == 'blob' and self.book.file_digest:
+            return self.book.file_digest
+        if self.source == 'db':
+            return hashlib.sha256(self.book.file_blob).hexdigest()
+        if not self.book.file_digest:
+            # files attached through the admin have no digest yet; hash once and keep it
+            hasher = hashlib.sha256()
+            with self.open() as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+            self.book.file_digest = hasher.hexdigest()
+            type(self.book).objects.filter(pk=self.book.pk).update(file_digest=self.book.file_digest)
+        return self.book.file_digest
+
+    @property
+    def etag(self):
+        return f'"{self.digest}"'
+
+    def path(self):
+        """Absolute path on local disk, or None when the file is not on disk."""
+        if self.source == 'blob':
+            return get_blob_store().path(self.book.file_ref)
+        if self.source == 'field':
+            try:
+                return self.book.pdf_file.path
+            except NotImplementedError:
+                return None
+        return None
+
+    def internal_url(self):
+        """URI of the file under the front-end server's internal locations."""
+        if self.source == 'blob':
+            return settings.BOOK_ACCEL_BLOB_PREFIX + quote(self.book.file_ref)
+        if self.source == 'field':
+            return settings.BOOK_ACCEL_MEDIA_PREFIX + quote(self.book.pdf_file.name)
+        return None
+
+    def open(self):
+        if self.source == 'blob':
+            return get_blob_store().open(self.book.file_ref)
+        if self.source == 'field':
+            return self.book.pdf_file.storage.open(self.book.pdf_file.name, 'rb')
+        return io.BytesIO(self.book.file_blob)
+
+
+def parse_range_header(header, size):
+    """
+    Parse a "bytes=" Range header into a list of inclusive (start, end)
+    pairs. Returns None when the header should be ignored and an empty list
+    when none of the ranges can be satisfied.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+
+    parts = spec.split(',')
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        match = RANGE_RE.match(part)
+        if not match:
+            return None
+        first, last = match.groups()
+        if not first and not last:
+            return None
+        if not first:
+            # suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            ranges.append((max(size - length, 0), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            continue
+        end = min(int(last), size - 1) if last else size - 1
+        ranges.append((start, end))
+    return ranges
+
+
+def _if_range_matches(request, book_file):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return book_file.etag in parse_etags(if_range)
+    return if_range == http_date(timegm(book_file.last_modified.utctimetuple()))
+
+
+def iter_file_range(f, start, length, chunk_size=CHUNK_SIZE, close=True):
+    """Yield `length` bytes of `f` starting at `start`, chunk_size at a time."""
+    try:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        if close:
+            f.close()
+
+
+def _iter_multipart(f, ranges, size, content_type, boundary):
+    try:
+        for start, end in ranges:
+            yield _part_header(boundary, content_type, start, end, size)
+            yield from iter_file_range(f, start, end - start + 1, close=False)
+        yield f'\r\n--{boundary}--\r\n'.encode()
+    finally:
+        f.close()
+
+
+def _part_header(boundary, content_type, start, end, size):
+    return (
+        f'\r\n--{boundary}\r\n'
+        f'Content-Type: {content_type}\r\n'
+        f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+    ).encode()
+
+
+def _check_conditional(request, book_file):
+    """
+    Return the validator headers for a book file and, when the client's
+    copy is still current, the 304/412 response to send instead.
+    """
+    headers = HttpResponse()
+    headers['ETag'] = book_file.etag
+    headers['Last-Modified'] = http_date(timegm(book_file.last_modified.utctimetuple()))
+    patch_cache_control(headers, private=True, no_cache=True)
+
+    conditional = get_conditional_response(
+        request,
+        etag=headers['ETag'],
+        last_modified=timegm(book_file.last_modified.utctimetuple()),
+        response=headers,
+    )
+    return headers, (None if conditional is headers else conditional)
+
+
+def file_response(request, book_file, as_attachment=False):
+    """
+    Build a streaming response for a book file that honours conditional
+    requests (If-None-Match / If-Modified-Since) and byte ranges, including
+    multipart/byteranges when several ranges are asked for.
+    """
+    headers, conditional = _check_conditional(request, book_file)
+    if conditional is not None:
+        return conditional
+
+    size = book_file.size
+    ranges = None
+    range_header = request.headers.get('Range')
+    if range_header and _if_range_matches(request, book_file):
+        ranges = parse_range_header(range_header, size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif not ranges:
+        response = StreamingHttpResponse(iter_file_range(book_file.open(), 0, size), content_type=book_file.content_type)
+        response['Content-Length'] = str(size)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(
+            iter_file_range(book_file.open(), start, end - start + 1),
+            status=206,
+            content_type=book_file.content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        boundary = uuid.uuid4().hex
+        length = sum(
+            len(_part_header(boundary, book_file.content_type, start, end, size)) + end - start + 1
+            for start, end in ranges
+        ) + len(f'\r\n--{boundary}--\r\n')
+        response = StreamingHttpResponse(
+            _iter_multipart(book_file.open(), ranges, size, book_file.content_type, boundary),
+            status=206,
+            content_type=f'multipart/byteranges; boundary={boundary}',
+        )
+        response['Content-Length'] = str(length)
+
+    for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+        response[header] = headers[header]
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(as_attachment, book_file.name)
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def offloaded_response(request, book_file, as_attachment=False):
+    """
+    Hand the transfer to the front-end server. Access checks and logging
+    have already happened in the view; nginx (X-Accel-Redirect) or Apache
+    mod_xsendfile (X-Sendfile) then serve the bytes and handle Range
+    requests, so the worker is released immediately. Returns None when the
+    file is not on local disk and has to be streamed by Django.
+    """
+    mode = settings.BOOK_FILE_DELIVERY
+    if mode == 'nginx':
+        location = book_file.internal_url()
+        header = 'X-Accel-Redirect'
+    elif mode == 'apache':
+        location = book_file.path()
+        header = 'X-Sendfile'
+    else:
+        raise ImproperlyConfigured(f"Unknown BOOK_FILE_DELIVERY mode '{mode}'")
+    if not location:
+        return None
+
+    headers, conditional = _check_conditional(request, book_file)
+    if conditional is not None:
+        return conditional
+
+    # The front-end server fills in the body, Content-Length and Range handling
+    response = HttpResponse(content_type=book_file.content_type)
+    response[header] = location
+    for name in ('ETag', 'Last-Modified', 'Cache-Control'):
+        response[name] = headers[name]
+    response['Content-Disposition'] = content_disposition_header(as_attachment, book_file.name)
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def deliver_file(request, book_file, as_attachment=False):
+    """
+    Serve a book file using the mode in settings.BOOK_FILE_DELIVERY:
+    'django' streams it from the worker (development), 'nginx' and 'apache'
+    offload the transfer to the front-end server.
+    """
+    if settings.BOOK_FILE_DELIVERY != 'django':
+        response = offloaded_response(request, book_file, as_attachment)
+        if response is not None:
+            return response
+    return file_response(request, book_file, as_attachment)
+
+
+def is_first_transfer(request, response):
+    """True when a response starts the file from byte 0 (used to log a download once)."""
+    if response.status_code == 200 and ('X-Accel-Redirect' in response or 'X-Sendfile' in response):
+        # the front-end server applies the Range header, so look at the request
+        range_header = request.headers.get('Range', '').replace(' ', '')
+        return not range_header or range_header.startswith('bytes=0-')
+    if response.status_code == 200:
+        return True
+    return response.status_code == 206 and response.get('Content-Range', '').startswith('bytes 0-')
@@ -0,0 +1,192 @@
+"""
+EPUB support for the viewer. Each EPUB is indexed once: the OPF spine, the
+table of contents and, for every zip entry, the offset and size of its
+data. Serving a chapter then needs one mmap'd slice of the archive (plus
+inflating it if it was deflated) instead of extracting the EPUB or
+sending the whole file to the browser.
+"""
+
+import mmap
+import mimetypes
+import posixpath
+import struct
+import zipfile
+import zlib
+from xml.etree import ElementTree
+
+from .delivery import BookFile
+from .models import EpubIndex
+
+EPUB_MEDIA_TYPE = 'application/epub+zip'
+
+NS = {
+    'container': 'urn:oasis:names:tc:opendocument:xmlns:container',
+    'opf': 'http://www.idpf.org/2007/opf',
+    'ncx': 'http://www.daisy.org/z3986/2005/ncx/',
+    'xhtml': 'http://www.w3.org/1999/xhtml',
+    'epub': 'http://www.idpf.org/2007/ops',
+}
+
+# Fixed part of a zip local file header; the name and extra field follow it
+LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+class EpubError(Exception):
+    """The file is not a readable EPUB."""
+
+
+def is_epub(book_file):
+    return book_file.content_type == EPUB_MEDIA_TYPE or book_file.name.lower().endswith('.epub')
+
+
+def _resolve(base_dir, href):
+    """Zip path of an href relative to `base_dir`, keeping any #fragment."""
+    path, _, fragment = href.partition('#')
+    resolved = posixpath.normpath(posixpath.join(base_dir, path)) if path else ''
+    return f'{resolved}#{fragment}' if fragment else resolved
+
+
+def _data_offset(fileobj, info):
+    """Where an entry's data starts: after its local header, whose extra field may differ from the central one."""
+    fileobj.seek(info.header_offset)
+    header = fileobj.read(LOCAL_HEADER.size)
+    fields = LOCAL_HEADER.unpack(header)
+    if fields[0] != LOCAL_HEADER_SIGNATURE:
+        raise EpubError(f'Bad local header for {info.filename}')
+    name_length, extra_length = fields[-2], fields[-1]
+    return info.header_offset + LOCAL_HEADER.size + name_length + extra_length
+
+
+def _nav_toc(archive, nav_path):
+    root = ElementTree.fromstring(archive.read(nav_path))
+    base = posixpath.dirname(nav_path)
+    for nav in root.iter(f'{{{NS["xhtml"]}}}nav'):
+        if nav.get(f'{{{NS["epub"]}}}type') == 'toc':
+            return [
+                {'title': ' '.join(''.join(link.itertext()).split()), 'href': _resolve(base, link.get('href'))}
+                for link in nav.iter(f'{{{NS["xhtml"]}}}a') if link.get('href')
+            ]
+    return []
+
+
+def _ncx_toc(archive, ncx_path):
+    root = ElementTree.fromstring(archive.read(ncx_path))
+    base = posixpath.dirname(ncx_path)
+    toc = []
+    for point in root.iter(f'{{{NS["ncx"]}}}navPoint'):
+        label = point.find('ncx:navLabel/ncx:text', NS)
+        content = point.find('ncx:content', NS)
+        if content is not None and content.get('src'):
+            toc.append({
+                'title': (label.text or '').strip() if label is not None else '',
+                'href': _resolve(base, content.get('src')),
+            })
+    return toc
+
+
+def parse_epub(fileobj):
+    """
+    Read an EPUB's container, OPF and table of contents, and locate the data
+    of every entry. Returns the fields of an EpubIndex.
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+        container = ElementTree.fromstring(archive.read('META-INF/container.xml'))
+        rootfile = container.find('.//container:rootfile', NS)
+        if rootfile is None:
+            raise EpubError('container.xml names no package document')
+        opf_path = rootfile.get('full-path')
+        opf = ElementTree.fromstring(archive.read(opf_path))
+        opf_dir = posixpath.dirname(opf_path)
+
+        manifest = {}
+        nav_path = None
+        for item in opf.iterfind('opf:manifest/opf:item', NS):
+            path = _resolve(opf_dir, item.get('href', ''))
+            manifest[item.get('id')] = (path, item.get('media-type', ''))
+            if 'nav' in (item.get('properties') or '').split():
+                nav_path = path
+
+        spine_element = opf.find('opf:spine', NS)
+        if spine_element is None:
+            raise EpubError('package document has no spine')
+        spine = [
+            manifest[itemref.get('idref')][0]
+            for itemref in spine_element.iterfind('opf:itemref', NS)
+            if itemref.get('idref') in manifest
+        ]
+
+        toc = []
+        if nav_path:
+            toc = _nav_toc(archive, nav_path)
+        elif spine_element.get('toc') in manifest:
+            toc = _ncx_toc(archive, manifest[spine_element.get('toc')][0])
+
+        media_types = dict(manifest.values())
+        entries = {}
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            if info.flag_bits & 0x1:
+                raise EpubError(f'{info.filename} is encrypted')
+            if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                raise EpubError(f'{info.filename} uses an unsupported compression method')
+            media_type = media_types.get(info.filename) or mimetypes.guess_type(info.filename)[0] or \
+                'application/octet-stream'
+            entries[info.filename] = [
+                _data_offset(fileobj, info), info.compress_size, info.file_size, info.compress_type, media_type,
+            ]
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError, struct.error) as exc:
+        raise EpubError(str(exc)) from exc
+
+    return {'opf_path': opf_path, 'spine': spine, 'toc': toc, 'entries': entries}
+
+
+def get_epub_index(book, book_file=None):
+    """
+    Return the book's EpubIndex, building it if it is missing or was made
+    for a different file. Raises EpubError for files that aren't EPUBs.
+    """
+    book_file = book_file or BookFile(book)
+    if not is_epub(book_file):
+        raise EpubError('not an EPUB')
+    digest = book_file.digest
+    index = EpubIndex.objects.filter(book=book).first()
+    if index is not None and index.digest == digest:
+        return index
+
+    with book_file.open() as f:
+        fields = parse_epub(f)
+    index, _ = EpubIndex.objects.update_or_create(book=book, defaults=dict(digest=digest, **fields))
+    return index
+
+
+def read_entry(book_file, entry):
+    """
+    The uncompressed bytes of one zip entry, located through the index.
+    Archives on local disk are mmap'd and only the entry's own byte range is
+    touched; other storage falls back to a seek and read.
+    """
+    offset, compressed_size, size, method, _ = entry
+    path = book_file.path()
+    if path:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if offset + compressed_size > len(mapped):
+                raise EpubError('entry lies outside the archive')
+            with memoryview(mapped)[offset:offset + compressed_size] as data:
+                return _decode(data, method, size)
+    with book_file.open() as f:
+        f.seek(offset)
+        return _decode(f.read(compressed_size), method, size)
+
+
+def _decode(data, method, size):
+    if method == zipfile.ZIP_STORED:
+        return bytes(data)
+    inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+    # never inflate past the size recorded in the archive
+    content = inflater.decompress(data, size)
+    if len(content) != size:
+        raise EpubError('entry is truncated')
+    return content
@@ -0,0 +1,76 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+# Dimensions shown with counts on the search page
+FACET_FIELDS = ('genre', 'availability', 'language')
+
+# Bumped whenever a book changes, which orphans every cached facet entry
+GENERATION_KEY = 'book_facets:generation'
+
+
+def normalize_filters(backend, query='', genres=(), availability=(), language=''):
+    """
+    Canonical form of the search filters, used as the facet cache key. The
+    query is normalized by the search backend that will run it, since only
+    full-text backends ignore word order.
+    """
+    return {
+        'query': backend.query_key(query),
+        'genre': sorted(set(genres)),
+        'availability': sorted(set(availability)),
+        'language': language.strip().lower(),
+    }
+
+
+def apply_filters(queryset, filters, exclude=None):
+    """Apply the genre/availability/language filters, skipping `exclude`."""
+    if filters['genre'] and exclude != 'genre':
+        queryset = queryset.filter(genre__in=filters['genre'])
+    if filters['availability'] and exclude != 'availability':
+        queryset = queryset.filter(availability__in=filters['availability'])
+    if filters['language'] and exclude != 'language':
+        queryset = queryset.filter(language__icontains=filters['language'])
+    return queryset
+
+
+def compute_facets(queryset, filters):
+    """
+    Count books per value of each facet with one GROUP BY per dimension.
+    Each dimension ignores its own filter, so ticking "Mystery" still shows
+    how many results the other genres would add.
+    """
+    facets = {}
+    for field in FACET_FIELDS:
+        rows = apply_filters(queryset, filters, exclude=field).order_by().values(field).annotate(count=Count('pk'))
+        facets[field] = {row[field]: row['count'] for row in rows}
+    return facets
+
+
+def facet_cache_key(filters):
+    generation = cache.get_or_set(GENERATION_KEY, 1, None)
+    digest = hashlib.sha1(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    return f'book_facets:{generation}:{digest}'
+
+
+def get_facets(queryset, filters):
+    """
+    Facet counts for a search, cached per normalized query. `queryset`
+    must be the approved books with the text query already applied.
+    """
+    key = facet_cache_key(filters)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset, filters)
+        cache.set(key, facets, getattr(settings, 'BOOK_FACET_CACHE_TIMEOUT', 300))
+    return facets
+
+
+def invalidate_facets():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
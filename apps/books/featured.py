@@ -0,0 +1,56 @@
+"""
+The featured books on the landing page. The list is computed by
+refresh_featured_books() and stored in the cache, so rendering the page
+costs a cache read and never runs the ranking query. Review and book
+changes recompute the cached list once they commit, and
+`manage.py refresh_featured_books` refills it after an eviction or
+cache clear.
+
+Books are ranked by a Bayesian average: each book's ratings are blended
+with PRIOR_WEIGHT imaginary ratings at the catalogue-wide mean, so one
+5-star review can't outrank a hundred 4.8s.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, FloatField, Sum, Value
+from django.db.models.functions import Cast
+
+from .models import Book
+
+CACHE_KEY = 'featured_books'
+
+
+def bayesian_score(mean, weight):
+    """(weight * mean + sum of ratings) / (weight + number of ratings), as a query expression."""
+    return (Value(weight * mean) + Cast(F('rating_sum'), FloatField())) / (Value(float(weight)) + F('rating_count'))
+
+
+def compute_featured_books(limit=None, weight=None):
+    limit = limit or settings.FEATURED_BOOKS_COUNT
+    weight = settings.FEATURED_BOOKS_PRIOR_WEIGHT if weight is None else weight
+    approved = Book.objects.approved()
+    # the aggregate reads the per-book counters, not the reviews table
+    totals = approved.aggregate(ratings=Sum('rating_count'), total=Sum('rating_sum'))
+    mean = (totals['total'] or 0) / totals['ratings'] if totals['ratings'] else 0.0
+    return list(
+        approved.select_related('author').annotate(featured_score=bayesian_score(mean, weight))
+        .order_by('-featured_score', '-rating_count', '-pk')[:limit]
+    )
+
+
+def refresh_featured_books():
+    books = compute_featured_books()
+    cache.set(CACHE_KEY, books, settings.FEATURED_BOOKS_CACHE_TIMEOUT)
+    return books
+
+
+def get_featured_books():
+    # a miss shows no featured books until the next refresh rather than ranking on the request path
+    return cache.get(CACHE_KEY, [])
+
+
+def invalidate_featured_books():
+    """Recompute the cached list after the current transaction commits, replacing it rather than dropping it."""
+    transaction.on_commit(refresh_featured_books)
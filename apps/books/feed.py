@@ -0,0 +1,146 @@
+"""
+The reader's "For You" feed. Each reader's top READER_FEED_SIZE books are
+precomputed into FeedEntry rows, in batches by `manage.py build_feeds`, so
+a page of the feed is one read of the (user, rank) index. Nothing is
+computed while a request is served.
+
+A book's score for a reader blends:
+
+  - genre affinity: the reader's favourite genres, plus the share of their
+    borrows, downloads, wishlist and reading history in the book's genre
+  - popularity: borrows, downloads and reviews, on a log scale
+  - recency: halving every READER_FEED_RECENCY_DAYS since it was listed
+
+Popularity and recency don't depend on the reader, so the best books of
+each genre by those two are found once per build (and cached); a reader's
+feed is picked from those lists, skipping books they already know.
+
+Borrowing, downloading, wishlisting, reading or changing favourite genres
+clears the reader's User.feed_built_at; the rows already stored keep being
+shown until `manage.py build_feeds --stale` rebuilds them.
+"""
+
+import heapq
+import math
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.borrowing.models import BorrowRequest
+from apps.users.models import User
+from .models import Book, BookDownload, BookQuerySet, BookWishlist, FavoriteGenre, FeedEntry, ReadingHistory
+
+LEADERS_CACHE_KEY = 'reader_feed:leaders'
+
+
+def _history(user_ids):
+    """(user id, book id, genre) for everything the readers have borrowed, downloaded, wishlisted or read."""
+    sources = [
+        ('reader_id', BorrowRequest.objects.exclude(status__in=['rejected', 'cancelled'])),
+        ('user_id', BookDownload.objects.all()),
+        ('user_id', BookWishlist.objects.all()),
+        ('user_id', ReadingHistory.objects.all()),
+    ]
+    for user_field, queryset in sources:
+        yield from queryset.filter(**{f'{user_field}__in': user_ids}).order_by().values_list(
+            user_field, 'book_id', 'book__genre')
+
+
+def compute_genre_leaders(now=None):
+    """
+    {genre: [(book id, popularity/recency score), ...]} for the best
+    approved books of each genre, in one pass over the catalogue.
+    """
+    now = now or timezone.now()
+    weights = settings.READER_FEED_WEIGHTS
+    # enough spares per genre to fill a feed after skipping books the reader knows
+    keep = settings.READER_FEED_SIZE * 2
+    activity = Counter()
+    for queryset in (BorrowRequest.objects.all(), BookDownload.objects.all()):
+        activity.update(dict(queryset.order_by().values_list('book_id').annotate(n=Count('pk'))))
+    books = Book.objects.approved().order_by().values_list('pk', 'genre', 'created_at', 'rating_count')
+    rows = [
+        (pk, genre, math.log1p(activity[pk] + rating_count), (now - created_at).days)
+        for pk, genre, created_at, rating_count in books.iterator(chunk_size=5000)
+    ]
+    top = max((row[2] for row in rows), default=0) or 1.0
+    by_genre = defaultdict(list)
+    for pk, genre, popularity, age in rows:
+        score = (weights['popularity'] * popularity / top
+                 + weights['recency'] * 0.5 ** (age / settings.READER_FEED_RECENCY_DAYS))
+        by_genre[genre].append((pk, score))
+    return {genre: heapq.nlargest(keep, scored, key=itemgetter(1)) for genre, scored in by_genre.items()}
+
+
+def get_genre_leaders():
+    leaders = cache.get(LEADERS_CACHE_KEY)
+    if leaders is None:
+        leaders = compute_genre_leaders()
+        cache.set(LEADERS_CACHE_KEY, leaders, settings.READER_FEED_LEADERS_TIMEOUT)
+    return leaders
+
+
+def genre_affinity(favorites, history_genres):
+    """Per-genre weight in [0, 1]: half from being a favourite, half from the genre's share of the history."""
+    affinity = {genre: 0.5 for genre in favorites}
+    if history_genres:
+        most = max(history_genres.values())
+        for genre, count in history_genres.items():
+            affinity[genre] = affinity.get(genre, 0.0) + 0.5 * count / most
+    return affinity
+
+
+def build_feeds(user_ids, leaders=None):
+    """Rebuild the feeds of a batch of readers: five reads for the whole batch, then one write transaction."""
+    leaders = get_genre_leaders() if leaders is None else leaders
+    genre_weight = settings.READER_FEED_WEIGHTS['genre']
+    user_ids = list(user_ids)
+    seen = defaultdict(set)
+    history = defaultdict(Counter)
+    for user_id, book_id, genre in _history(user_ids):
+        seen[user_id].add(book_id)
+        history[user_id][genre] += 1
+    favorites = defaultdict(set)
+    for user_id, genre in FavoriteGenre.objects.filter(user_id__in=user_ids).values_list('user_id', 'genre'):
+        favorites[user_id].add(genre)
+
+    entries = []
+    for user_id in user_ids:
+        affinity = genre_affinity(favorites[user_id], history[user_id])
+        candidates = (
+            (book_id, genre_weight * affinity.get(genre, 0.0) + score)
+            for genre, books in leaders.items()
+            for book_id, score in books
+            if book_id not in seen[user_id]
+        )
+        best = heapq.nlargest(settings.READER_FEED_SIZE, candidates, key=itemgetter(1))
+        entries.extend(
+            FeedEntry(user_id=user_id, book_id=book_id, rank=rank, score=score)
+            for rank, (book_id, score) in enumerate(best, 1)
+        )
+    with transaction.atomic():
+        FeedEntry.objects.filter(user_id__in=user_ids).delete()
+        FeedEntry.objects.bulk_create(entries, batch_size=1000)
+        User.objects.filter(pk__in=user_ids).update(feed_built_at=timezone.now())
+    return len(entries)
+
+
+def invalidate_feed(user_id):
+    User.objects.filter(pk=user_id, feed_built_at__isnull=False).update(feed_built_at=None)
+
+
+def feed_entries(user):
+    """
+    The reader's stored feed as FeedEntry rows with their books, for a
+    CursorPaginator ordered by rank. Stale feeds are served as they are.
+    """
+    deferred = [f'book__{name}' for name in (*BookQuerySet.DETAIL_FIELDS, *BookQuerySet.FILE_FIELDS)]
+    return (
+        FeedEntry.objects.filter(user=user, book__status='approved')
+        .select_related('book', 'book__author').defer(*deferred)
+    )
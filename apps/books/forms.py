@@ -1,4 +1,5 @@
 from django import forms
+from .catalog import normalize_isbn
 from .models import Book, BookWishlist
 
 
@@ -11,6 +12,9 @@ class BookForm(forms.ModelForm):
             'accept': '.pdf,.epub,application/pdf,application/epub+zip'
         })
     )
+    # Set by the page script once a large file has gone up through the resumable upload API
+    upload_id = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Book
         fields = ('title', 'original_author', 'description', 'genre', 'language', 'publication_date', 
@@ -31,6 +35,10 @@ class BookForm(forms.ModelForm):
             self.fields['pdf_file'].help_text = self.fields['pdf_file'].help_text or ''
             self.fields['pdf_file'].help_text += ' (Accepted: PDF, EPUB)'
 
+    def clean_isbn(self):
+        # stored without separators, as the catalogue import writes it, so both see the same book
+        return normalize_isbn(self.cleaned_data.get('isbn'))
+
     def clean(self):
         cleaned_data = super().clean()
         availability = cleaned_data.get('availability')
@@ -41,7 +49,7 @@ class BookForm(forms.ModelForm):
 
         # Require a file when availability allows borrowing or download
         required_avail = ['borrow', 'download', 'both']
-        if availability in required_avail and not pdf_file and not upload_file:
+        if availability in required_avail and not pdf_file and not upload_file and not cleaned_data.get('upload_id'):
             self.add_error('pdf_file', 'A PDF or EPUB file is required when the book is available for borrowing or download (provide via the form file field or upload_file).')
 
         # Validate file types if provided (accept only .pdf and .epub)
@@ -76,11 +84,14 @@ class BookForm(forms.ModelForm):
 
 class BookSearchForm(forms.Form):
     SORT_CHOICES = (
+        ('relevance', 'Relevance'),
         ('-created_at', 'Newest First'),
         ('title', 'Title (A-Z)'),
         ('-title', 'Title (Z-A)'),
         ('publication_date', 'Publication Date (Oldest)'),
         ('-publication_date', 'Publication Date (Newest)'),
+        ('-rating_avg', 'Highest Rated'),
+        ('-trending_score', 'Trending'),
     )
     
     query = forms.CharField(
@@ -116,6 +127,6 @@ class BookSearchForm(forms.Form):
     sort_by = forms.ChoiceField(
         choices=SORT_CHOICES,
         required=False,
-        initial='-created_at',
+        initial='relevance',
         widget=forms.RadioSelect()
     )
@@ -1,8 +1,6 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from apps.books.models import Book
+from apps.books.catalog import CatalogImport
 from apps.users.models import User
-from datetime import datetime
 
 
 class Command(BaseCommand):
@@ -123,28 +121,8 @@ class Command(BaseCommand):
             },
         ]
         
-        added_count = 0
-        for book_data in free_books:
-            # Check if book already exists
-            if Book.objects.filter(title=book_data['title']).exists():
-                self.stdout.write(self.style.WARNING(f'Book "{book_data["title"]}" already exists. Skipping...'))
-                continue
-            
-            # Create book
-            book = Book.objects.create(
-                title=book_data['title'],
-                author=admin_user,
-                description=book_data['description'],
-                genre=book_data['genre'],
-                language=book_data['language'],
-                publication_date=book_data['publication_date'],
-                publisher=book_data['publisher'],
-                pages=book_data['pages'],
-                availability='download',
-                status='approved',  # Admin books are auto-approved
-            )
-            
-            added_count += 1
-            self.stdout.write(self.style.SUCCESS(f'✓ Added book: {book.title}'))
-        
-        self.stdout.write(self.style.SUCCESS(f'\n{added_count} books added successfully!'))
+        # same path as import_catalog: one duplicate lookup and one bulk insert
+        counts = CatalogImport(admin_user).run(enumerate(free_books, 1))
+        if counts['duplicates']:
+            self.stdout.write(self.style.WARNING(f'{counts["duplicates"]} book(s) already exist. Skipped.'))
+        self.stdout.write(self.style.SUCCESS(f'\n{counts["inserted"]} books added successfully!'))
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from apps.books.feed import LEADERS_CACHE_KEY, build_feeds, compute_genre_leaders
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Rebuild readers\' "For You" feeds in batches (run nightly; --stale every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale', action='store_true',
+                            help='Only rebuild feeds cleared by new activity, reusing the cached genre lists')
+        parser.add_argument('--batch-size', type=int, default=settings.READER_FEED_BATCH_SIZE,
+                            help='Readers rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        readers = User.objects.filter(role='reader', is_active=True)
+        if options['stale']:
+            readers = readers.filter(feed_built_at__isnull=True)
+            leaders = None
+        else:
+            # popularity and recency have moved since the last full build
+            leaders = compute_genre_leaders()
+            cache.set(LEADERS_CACHE_KEY, leaders, settings.READER_FEED_LEADERS_TIMEOUT)
+
+        built = entries = 0
+        last_pk = 0
+        while True:
+            batch = list(readers.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[
+                :options['batch_size']])
+            if not batch:
+                break
+            entries += build_feeds(batch, leaders)
+            built += len(batch)
+            last_pk = batch[-1]
+            self.stdout.write(f'  {built} reader(s)', ending='\r')
+        self.stdout.write(self.style.SUCCESS(f'Built {built} feed(s), {entries} entries.'))
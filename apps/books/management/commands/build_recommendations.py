@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.books.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute "readers also borrowed" neighbours for every book (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbors', type=int, default=settings.RECOMMENDATIONS_NEIGHBORS,
+                            help='Neighbours kept per book')
+        parser.add_argument('--block-size', type=int, default=settings.RECOMMENDATIONS_BLOCK_SIZE,
+                            help='Books whose neighbours are computed and written together')
+        parser.add_argument('--max-user-items', type=int, default=settings.RECOMMENDATIONS_MAX_USER_ITEMS,
+                            help='Readers with more books than this are left out')
+
+    def handle(self, *args, **options):
+        counts = build_recommendations(
+            k=options['neighbors'], block_size=options['block_size'], max_user_items=options['max_user_items'],
+            progress=lambda done, total: self.stdout.write(f'  {done}/{total} books', ending='\r'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{counts["neighbors"]} neighbour(s) stored for {counts["books"]} book(s) from '
+            f'{counts["interactions"]} interaction(s); {counts["skipped_users"]} reader(s) skipped.'
+        ))
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.books.exports import EXPORTS, FORMATS, export_filename, export_stream
+
+
+class Command(BaseCommand):
+    help = 'Stream books, borrows, downloads or reviews to CSV or JSON Lines (optionally gzipped)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('datasets', nargs='+', choices=sorted(EXPORTS), help='What to export')
+        parser.add_argument('--format', default='csv', choices=sorted(FORMATS), help='Output format')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output')
+        parser.add_argument('--output',
+                            help='File to write, or - for stdout (default: <dataset>-<date>.<format> per '
+                                 'dataset; only one dataset can go to a given file)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows fetched per round trip (default: EXPORT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        fmt, compress = options['format'], options['gzip']
+        if options['output'] not in (None, '-') and len(options['datasets']) > 1:
+            raise CommandError('--output takes a single dataset')
+        for dataset in options['datasets']:
+            chunks = export_stream(dataset, fmt, compress, options['chunk_size'])
+            path = options['output'] or export_filename(dataset, fmt, compress)
+            if path == '-':
+                for chunk in chunks:
+                    sys.stdout.buffer.write(chunk)
+                sys.stdout.buffer.flush()
+                continue
+            size = 0
+            with open(path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            self.stderr.write(f'{dataset}: {size} bytes written to {path}')
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.books.catalog import CatalogImport, guess_format, open_text, read_rows
+from apps.books.models import Book
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Import books from CSV or JSON Lines files (optionally .gz), skipping ones already in the catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Files to import')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--owner',
+                            help='Username the books are listed under (default: the first superuser)')
+        parser.add_argument('--status', default='approved', choices=[value for value, _ in Book.STATUS_CHOICES],
+                            help='Status given to imported books')
+        parser.add_argument('--availability', default='download',
+                            choices=[value for value, _ in Book.AVAILABILITY_CHOICES],
+                            help='Availability for rows that do not specify one')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows validated, checked for duplicates and inserted together')
+        parser.add_argument('--report',
+                            help='Where to write the JSON Lines report (default: <file>.report.jsonl)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate and report what would be imported without writing anything')
+
+    def handle(self, *args, **options):
+        owner = self.get_owner(options['owner'])
+        total = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'errors': 0}
+        for path in options['paths']:
+            try:
+                fmt = options['format'] or guess_format(path)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            report_path = options['report'] or f'{path}.report.jsonl'
+            with open_text(path) as f, open(report_path, 'w', encoding='utf-8') as report:
+                run = CatalogImport(
+                    owner, status=options['status'], availability=options['availability'],
+                    chunk_size=options['chunk_size'], dry_run=options['dry_run'], report=report,
+                    progress=lambda counts: self.stdout.write(
+                        f'  {counts["rows"]} rows, {counts["inserted"]} new', ending='\r'),
+                )
+                counts = run.run(read_rows(f, fmt))
+            for key in total:
+                total[key] += counts[key]
+            self.stdout.write(f'{path}: {counts["rows"]} rows, {counts["inserted"]} '
+                              f'{"to insert" if options["dry_run"] else "inserted"}, '
+                              f'{counts["duplicates"]} duplicate(s), {counts["errors"]} error(s). '
+                              f'Report: {report_path}')
+
+        verb = 'would be imported' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(f'{total["inserted"]} book(s) {verb}.'))
+
+    def get_owner(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'No user named {username!r}')
+        owner = User.objects.filter(is_superuser=True).first() or User.objects.filter(is_staff=True).first()
+        if owner is None:
+            raise CommandError('No admin user found. Please create an admin user first, or pass --owner.')
+        return owner
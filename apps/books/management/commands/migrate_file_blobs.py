@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.books.models import Book
+from apps.books.storage import get_blob_store
+
+
+class Command(BaseCommand):
+    help = 'Move book file bytes from Book.file_blob into the blob store in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Number of books to migrate per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many books would be migrated')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        store = get_blob_store()
+        pending = Book.objects.filter(file_blob__isnull=False, file_ref__isnull=True).order_by('pk')
+
+        if options['dry_run']:
+            self.stdout.write(f'{pending.count()} book(s) would be migrated.')
+            return
+
+        migrated = 0
+        last_pk = 0
+        while True:
+            # only ids are loaded up front; blobs are fetched one row at a time
+            batch_ids = list(pending.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not batch_ids:
+                break
+            last_pk = batch_ids[-1]
+
+            with transaction.atomic():
+                for pk in batch_ids:
+                    blob = Book.objects.filter(pk=pk).values_list('file_blob', flat=True).first()
+                    if not blob:
+                        continue
+                    ref, digest, size = store.save_bytes(blob)
+                    Book.objects.filter(pk=pk).update(
+                        file_ref=ref,
+                        file_digest=digest,
+                        file_size=size,
+                        file_blob=None,
+                    )
+                    migrated += 1
+
+            self.stdout.write(f'Migrated {migrated} book(s) so far...')
+
+        self.stdout.write(self.style.SUCCESS(f'{migrated} book file(s) moved to the blob store.'))
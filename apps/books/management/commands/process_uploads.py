@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count
+
+from apps.books.models import Book
+from apps.books.processing import claim_book, run_processing
+
+
+class Command(BaseCommand):
+    help = 'Process uploaded book files waiting in the queue (see BOOK_PROCESSING)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Books processed in parallel')
+        parser.add_argument('--max-books', type=int, default=0,
+                            help='Stop after this many books (0 = no limit)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new uploads instead of exiting when the queue is empty')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Seconds to wait between polls with --loop')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Reclaim books stuck in processing for this many seconds')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Queue books whose processing failed again before starting')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print the number of books in each processing state and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+        if options['retry_failed']:
+            retried = Book.objects.filter(processing_status='failed').update(processing_status='pending')
+            self.stdout.write(f'Queued {retried} failed book(s) again.')
+
+        workers = max(options['workers'], 1)
+        if workers == 1:
+            results = [self.work(options)]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda _: self.threaded_work(options), range(workers)))
+        processed = sum(done for done, _ in results)
+        failed = sum(failures for _, failures in results)
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} book(s), {failed} failed.'))
+        self.print_stats()
+
+    def work(self, options):
+        """One worker: claim and process books until the queue is empty or the limit is hit."""
+        processed = failed = 0
+        while not options['max_books'] or processed < options['max_books']:
+            book = claim_book(stale_after=options['stale_after'])
+            if book is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            processed += 1
+            if run_processing(book) is None:
+                failed += 1
+                self.stderr.write(f'Book {book.pk} failed; see its processing error.')
+        return processed, failed
+
+    def threaded_work(self, options):
+        try:
+            return self.work(options)
+        finally:
+            # each thread has its own database connection
+            connections.close_all()
+
+    def print_stats(self):
+        counts = dict(Book.objects.order_by().values_list('processing_status').annotate(n=Count('pk')))
+        self.stdout.write(
+            'Books: {pending} pending, {processing} processing, {failed} failed'.format(
+                pending=counts.get('pending', 0), processing=counts.get('processing', 0),
+                failed=counts.get('failed', 0),
+            )
+        )
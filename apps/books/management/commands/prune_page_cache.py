@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.books.pages import PageCache
+
+
+class Command(BaseCommand):
+    help = 'Evict least recently used rendered pages until the page cache fits BOOK_PAGE_CACHE_MAX_BYTES'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-bytes', type=int, default=None,
+                            help='Size to shrink the cache to (default: BOOK_PAGE_CACHE_MAX_BYTES)')
+
+    def handle(self, *args, **options):
+        freed = PageCache(max_bytes=options['max_bytes']).prune()
+        self.stdout.write(self.style.SUCCESS(f'Freed {freed} byte(s) from the page cache.'))
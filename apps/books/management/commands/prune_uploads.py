@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.books.uploads import prune_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable uploads that have not been touched for BOOK_UPLOAD_EXPIRY_HOURS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=None,
+                            help='Age after which an upload is removed (default: BOOK_UPLOAD_EXPIRY_HOURS)')
+
+    def handle(self, *args, **options):
+        hours = options['hours'] if options['hours'] is not None else settings.BOOK_UPLOAD_EXPIRY_HOURS
+        removed = prune_sessions(timedelta(hours=hours))
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} upload(s).'))
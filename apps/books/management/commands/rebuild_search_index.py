@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from apps.books.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all books'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of books to index per batch')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        indexed = backend.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{indexed} book(s) indexed with {backend.__class__.__name__}.'
+        ))
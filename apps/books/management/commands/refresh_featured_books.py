@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.books.featured import refresh_featured_books
+
+
+class Command(BaseCommand):
+    help = 'Recompute the featured books shown on the landing page (run every few minutes)'
+
+    def handle(self, *args, **options):
+        books = refresh_featured_books()
+        for book in books:
+            self.stdout.write(f'{book.featured_score:.2f}  {book.title} ({book.rating_count} rating(s))')
+        self.stdout.write(self.style.SUCCESS(f'Cached {len(books)} featured book(s).'))
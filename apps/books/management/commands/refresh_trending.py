@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.books.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = 'Fold new borrow and download counts into the trending scores (run every few minutes)'
+
+    def handle(self, *args, **options):
+        counts = refresh_trending()
+        self.stdout.write(self.style.SUCCESS(
+            f'{counts["events"]} new event(s) from {counts["buckets"]} bucket(s) added to '
+            f'{counts["books"]} book(s).'
+        ))
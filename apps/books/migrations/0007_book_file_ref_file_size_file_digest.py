@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_alter_book_pdf_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='file_digest',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 digest of the uploaded book file', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='file_ref',
+            field=models.CharField(blank=True, help_text='Blob store reference of the uploaded book file', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, help_text='Size of the uploaded book file in bytes', null=True),
+        ),
+    ]
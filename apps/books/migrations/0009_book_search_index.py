@@ -0,0 +1,70 @@
+# Generated by Django 4.2 on 2026-10-18 00:58
+
+import apps.books.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Book = apps.get_model('books', 'Book')
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE books_book_fts USING fts5("
+        "book_id UNINDEXED, title, original_author, author_name, description, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    # BM25 column weights: book id (never matched), title, original author, author name, description
+    schema_editor.execute(
+        "INSERT INTO books_book_fts (books_book_fts, rank) VALUES ('rank', 'bm25(0.0, 10.0, 5.0, 5.0, 1.0)')"
+    )
+    # only the indexed columns, never the file blobs
+    rows = Book.objects.order_by().values_list(
+        'pk', 'title', 'original_author', 'description', 'author__first_name', 'author__last_name',
+        'author__username',
+    )
+    for pk, title, original_author, description, first_name, last_name, username in rows.iterator(chunk_size=500):
+        schema_editor.execute(
+            'INSERT INTO books_book_fts (rowid, book_id, title, original_author, author_name, description) '
+            'VALUES (%s, %s, %s, %s, %s, %s)',
+            (
+                pk,
+                pk,
+                title,
+                original_author or '',
+                ' '.join(filter(None, [first_name, last_name])) or username,
+                description or '',
+            ),
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS books_book_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_book_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchEntry',
+            fields=[
+                ('book', models.OneToOneField(db_column='book_id', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='books.book')),
+                ('document', apps.books.models.FullTextField(db_column='books_book_fts')),
+                ('rank', models.FloatField()),
+                ('title', models.TextField()),
+                ('original_author', models.TextField()),
+                ('author_name', models.TextField()),
+                ('description', models.TextField()),
+            ],
+            options={
+                'db_table': 'books_book_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 00:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['status', 'genre', 'availability', 'language'], name='books_book_status_fa59c2_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-18 01:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_book_facet_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EpubIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64)),
+                ('opf_path', models.CharField(max_length=255)),
+                ('spine', models.JSONField(default=list)),
+                ('toc', models.JSONField(default=list)),
+                ('entries', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='epub_index', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'EPUB Index',
+                'verbose_name_plural': 'EPUB Indexes',
+            },
+        ),
+    ]
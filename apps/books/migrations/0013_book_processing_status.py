@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0012_epub_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='processing_error',
+            field=models.TextField(blank=True, help_text='Why processing the book file failed', null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, help_text='When the current processing run was claimed', null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Waiting for Processing'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Processing Failed')], db_index=True, default='ready', help_text='Progress of the post-upload processing of the book file', max_length=20),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 01:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0014_upload_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('built_at', models.DateTimeField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='books.book')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Book Neighbor',
+                'verbose_name_plural': 'Book Neighbors',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bookneighbor',
+            index=models.Index(fields=['book', '-score'], name='books_bookn_book_id_c48a34_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookneighbor',
+            constraint=models.UniqueConstraint(fields=('book', 'neighbor'), name='unique_book_neighbor'),
+        ),
+    ]
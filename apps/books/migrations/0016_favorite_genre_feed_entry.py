@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 01:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('books', '0015_book_neighbor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='books.book')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Feed Entry',
+                'verbose_name_plural': 'Feed Entries',
+            },
+        ),
+        migrations.CreateModel(
+            name='FavoriteGenre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genre', models.CharField(choices=[('fiction', 'Fiction'), ('non-fiction', 'Non-Fiction'), ('mystery', 'Mystery'), ('romance', 'Romance'), ('sci-fi', 'Science Fiction'), ('fantasy', 'Fantasy'), ('thriller', 'Thriller'), ('horror', 'Horror'), ('biography', 'Biography'), ('history', 'History'), ('self-help', 'Self-Help'), ('poetry', 'Poetry'), ('children', 'Children'), ('young-adult', 'Young Adult'), ('educational', 'Educational'), ('other', 'Other')], max_length=50)),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorite_genre_set', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Favorite Genre',
+                'verbose_name_plural': 'Favorite Genres',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'rank'), name='unique_feed_rank'),
+        ),
+        migrations.AddIndex(
+            model_name='favoritegenre',
+            index=models.Index(fields=['genre'], name='books_favor_genre_f51e91_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='favoritegenre',
+            unique_together={('user', 'genre')},
+        ),
+    ]
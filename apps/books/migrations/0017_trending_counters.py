@@ -0,0 +1,65 @@
+# Generated by Django 4.2 on 2026-10-18 01:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0016_favorite_genre_feed_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookActivityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('pending', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Book Activity Bucket',
+                'verbose_name_plural': 'Book Activity Buckets',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField()),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='trending_score',
+            field=models.FloatField(default=0, help_text='Recent borrows and downloads, weighted towards the newest'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['status', '-trending_score'], name='books_book_status_231018_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['genre', '-trending_score'], name='books_book_genre_8109e5_idx'),
+        ),
+        migrations.AddField(
+            model_name='bookactivitybucket',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_buckets', to='books.book'),
+        ),
+        migrations.AddIndex(
+            model_name='bookactivitybucket',
+            index=models.Index(fields=['pending'], name='books_booka_pending_13ee0e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookactivitybucket',
+            index=models.Index(fields=['hour'], name='books_booka_hour_13c63f_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='bookactivitybucket',
+            unique_together={('book', 'hour')},
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 03:12
+
+from django.db import migrations
+
+
+def normalize_isbns(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    taken = set(Book.objects.exclude(isbn=None).values_list('isbn', flat=True))
+    for pk, isbn in Book.objects.exclude(isbn=None).order_by('pk').values_list('pk', 'isbn'):
+        normalized = ''.join(ch for ch in isbn if ch.isalnum()).upper() or None
+        # a book already stored under the normalised form keeps it; the other row is left for an admin
+        if normalized == isbn or normalized in taken:
+            continue
+        Book.objects.filter(pk=pk).update(isbn=normalized)
+        taken.add(normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0017_trending_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_isbns, migrations.RunPython.noop),
+    ]
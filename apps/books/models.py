@@ -1,7 +1,72 @@
+import uuid
+
 from django.db import models
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Cast, Coalesce
 from apps.users.models import User
 
 
+class BookQuerySet(models.QuerySet):
+    # Columns that list pages never render; loaded only when asked for
+    DETAIL_FIELDS = ('description', 'rejection_reason', 'processing_error')
+    FILE_FIELDS = ('file_blob',)
+
+    def cards(self):
+        """Lightweight projection used by list pages and dashboards."""
+        return self.defer(*self.DETAIL_FIELDS, *self.FILE_FIELDS)
+
+    def with_details(self):
+        """Load the text columns needed by detail and edit pages."""
+        return self.defer(None).defer(*self.FILE_FIELDS)
+
+    def with_file(self):
+        """Load every column, including the legacy file bytes."""
+        return self.defer(None)
+
+    def approved(self):
+        return self.filter(status='approved')
+
+    def adjust_ratings(self, count_delta, sum_delta):
+        """
+        Atomically apply a review change to the stored rating aggregates.
+        The average is computed from the same expressions in one UPDATE, so
+        concurrent reviews can't leave it out of step with count and sum.
+        """
+        new_count = F('rating_count') + count_delta
+        new_sum = F('rating_sum') + sum_delta
+        return self.update(
+            rating_count=new_count,
+            rating_sum=new_sum,
+            rating_avg=Case(
+                When(rating_count__gt=-count_delta, then=Cast(new_sum, FloatField()) / new_count),
+                default=0.0,
+                output_field=FloatField(),
+            ),
+        )
+
+    def recompute_ratings(self):
+        """Rebuild the rating aggregates from the reviews table."""
+        from apps.reviews.models import Review
+
+        reviews = Review.objects.filter(book=OuterRef('pk')).order_by().values('book')
+        self.update(
+            rating_count=Coalesce(Subquery(reviews.annotate(n=Count('pk')).values('n')), 0),
+            rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+        )
+        return self.update(
+            rating_avg=Case(
+                When(rating_count__gt=0, then=Cast(F('rating_sum'), FloatField()) / F('rating_count')),
+                default=0.0,
+                output_field=FloatField(),
+            ),
+        )
+
+
+class BookManager(models.Manager.from_queryset(BookQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().cards()
+
+
 class Book(models.Model):
     GENRE_CHOICES = (
         ('fiction', 'Fiction'),
@@ -29,6 +94,13 @@ class Book(models.Model):
         ('rejected', 'Rejected'),
     )
     
+    PROCESSING_STATUS_CHOICES = (
+        ('pending', 'Waiting for Processing'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Processing Failed'),
+    )
+    
     AVAILABILITY_CHOICES = (
         ('borrow', 'Available for Borrowing'),
         ('download', 'Available for Download'),
@@ -104,13 +176,36 @@ class Book(models.Model):
         help_text='PDF/EPUB file of the book (for download)'
     )
 
-    # Store uploaded file bytes in the database (optional/alternative to FileField)
+    # Legacy: uploaded file bytes stored in the database. New uploads go to the
+    # blob store (see file_ref); run `migrate_file_blobs` to move old rows.
     file_blob = models.BinaryField(
         blank=True,
         null=True,
         help_text='Binary content of uploaded book file (pdf/epub)'
     )
 
+    # Reference to the uploaded file in the content-addressed blob store
+    file_ref = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        help_text='Blob store reference of the uploaded book file'
+    )
+
+    file_size = models.BigIntegerField(
+        blank=True,
+        null=True,
+        help_text='Size of the uploaded book file in bytes'
+    )
+
+    file_digest = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text='SHA-256 digest of the uploaded book file'
+    )
+
     file_name = models.CharField(
         max_length=255,
         blank=True,
@@ -150,9 +245,54 @@ class Book(models.Model):
         null=True,
         help_text='Number of pages'
     )
+
+    # Review aggregates, maintained by the review views (see recompute_ratings)
+    rating_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of reviews'
+    )
+
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        help_text='Sum of all review ratings'
+    )
+
+    rating_avg = models.FloatField(
+        default=0,
+        help_text='Average review rating'
+    )
+
+    # Borrows and downloads, decayed over time (see apps/books/trending.py)
+    trending_score = models.FloatField(
+        default=0,
+        help_text='Recent borrows and downloads, weighted towards the newest'
+    )
+
+    # Post-upload processing (see apps/books/processing.py)
+    processing_status = models.CharField(
+        max_length=20,
+        choices=PROCESSING_STATUS_CHOICES,
+        default='ready',
+        db_index=True,
+        help_text='Progress of the post-upload processing of the book file'
+    )
+
+    processing_started_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text='When the current processing run was claimed'
+    )
+
+    processing_error = models.TextField(
+        blank=True,
+        null=True,
+        help_text='Why processing the book file failed'
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookManager()
     
     class Meta:
         ordering = ['-created_at']
@@ -163,6 +303,12 @@ class Book(models.Model):
             models.Index(fields=['author']),
             models.Index(fields=['genre']),
             models.Index(fields=['status']),
+            models.Index(fields=['status', '-rating_avg']),
+            # trending lists on the home and genre pages
+            models.Index(fields=['status', '-trending_score']),
+            models.Index(fields=['genre', '-trending_score']),
+            # covers the grouped facet counts on the search page
+            models.Index(fields=['status', 'genre', 'availability', 'language']),
         ]
     
     def __str__(self):
@@ -171,10 +317,28 @@ class Book(models.Model):
     def is_available_for_borrowing(self):
         return self.status == 'approved' and self.availability in ['borrow', 'both']
     
+    def has_file(self):
+        if self.file_ref or self.pdf_file:
+            return True
+        if 'file_blob' in self.get_deferred_fields():
+            # check for legacy bytes without pulling them out of the database
+            return Book.objects.filter(pk=self.pk, file_blob__isnull=False).exists()
+        return bool(self.file_blob)
+
     def is_available_for_download(self):
-        # Available for download if approved and availability allows it, and either a stored file or file field exists
-        has_file = bool(self.file_blob) or bool(self.pdf_file)
-        return self.status == 'approved' and self.availability in ['download', 'both'] and has_file
+        # Available for download if approved and availability allows it, and a stored file exists
+        return self.status == 'approved' and self.availability in ['download', 'both'] and self.has_file()
+
+    def attach_file(self, upload):
+        """Store an uploaded file in the blob store and point this book at it."""
+        from .storage import get_blob_store
+        ref, digest, size = get_blob_store().save(upload)
+        self.file_ref = ref
+        self.file_digest = digest
+        self.file_size = size
+        self.file_name = upload.name
+        self.file_mime = getattr(upload, 'content_type', '') or self.file_mime
+        self.file_blob = None
     
     def is_published(self):
         return self.status == 'approved'
@@ -266,3 +430,283 @@ class BookDownload(models.Model):
         
     def __str__(self):
         return f"{self.user.username} downloaded {self.book.title}"
+
+
+class EpubIndex(models.Model):
+    """
+    Where everything in a book's EPUB lives inside the zip, read once when
+    the file is uploaded so chapters can be served without opening the
+    archive's central directory again.
+    """
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        related_name='epub_index'
+    )
+    
+    # digest of the file this index was built from
+    digest = models.CharField(max_length=64)
+    
+    opf_path = models.CharField(max_length=255)
+    
+    # zip paths of the chapters in reading order
+    spine = models.JSONField(default=list)
+    
+    # [{"title": ..., "href": ...}] from the EPUB 3 nav document or EPUB 2 NCX
+    toc = models.JSONField(default=list)
+    
+    # zip path -> [data offset, compressed size, size, compression method, media type]
+    entries = models.JSONField(default=dict)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'EPUB Index'
+        verbose_name_plural = 'EPUB Indexes'
+    
+    def __str__(self):
+        return f"EPUB index for {self.book.title}"
+
+
+class UploadSession(models.Model):
+    """
+    A book file uploaded in parts so that a dropped connection can resume
+    where it stopped. Parts are appended to a file under BOOK_UPLOAD_ROOT;
+    completing the session moves that file into the blob store.
+    """
+    STATUS_CHOICES = (
+        ('open', 'Receiving Parts'),
+        ('complete', 'Complete'),
+        ('attached', 'Attached to a Book'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    
+    file_name = models.CharField(max_length=255)
+    
+    content_type = models.CharField(max_length=100, blank=True)
+    
+    # declared total size; parts may not go past it
+    size = models.BigIntegerField()
+    
+    # bytes received so far, which is also the offset of the next part
+    received = models.BigIntegerField(default=0)
+    
+    # optional SHA-256 of the whole file, checked on completion
+    expected_digest = models.CharField(max_length=64, blank=True)
+    
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='open'
+    )
+    
+    # where the completed file went in the blob store
+    file_ref = models.CharField(max_length=255, blank=True, null=True)
+    file_digest = models.CharField(max_length=64, blank=True, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Upload Session'
+        verbose_name_plural = 'Upload Sessions'
+        indexes = [
+            # stale sessions swept by prune_uploads
+            models.Index(fields=['status', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.received}/{self.size} bytes)"
+
+
+class BookNeighbor(models.Model):
+    """
+    A book often borrowed, downloaded, wishlisted or read by the same readers
+    as `book`, with their cosine similarity. Rebuilt by `manage.py build_recommendations`.
+    """
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name='neighbors'
+    )
+    
+    neighbor = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name='neighbor_of'
+    )
+    
+    score = models.FloatField()
+    
+    # start of the build that wrote this row; rows from older builds are dropped at the end
+    built_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Book Neighbor'
+        verbose_name_plural = 'Book Neighbors'
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'neighbor'], name='unique_book_neighbor'),
+        ]
+        indexes = [
+            # the detail page reads one book's neighbors best first
+            models.Index(fields=['book', '-score']),
+        ]
+    
+    def __str__(self):
+        return f"{self.book_id} -> {self.neighbor_id} ({self.score:.3f})"
+
+
+class FavoriteGenre(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='favorite_genre_set'
+    )
+    
+    genre = models.CharField(
+        max_length=50,
+        choices=Book.GENRE_CHOICES
+    )
+    
+    added_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('user', 'genre')
+        verbose_name = 'Favorite Genre'
+        verbose_name_plural = 'Favorite Genres'
+        indexes = [
+            models.Index(fields=['genre']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.genre}"
+
+
+class FeedEntry(models.Model):
+    """
+    One book in a reader's "For You" feed, precomputed by apps.books.feed.
+    Pages are read in rank order straight from the (user, rank) index.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    
+    # 1 is the best match
+    rank = models.PositiveIntegerField()
+    
+    score = models.FloatField()
+    
+    class Meta:
+        verbose_name = 'Feed Entry'
+        verbose_name_plural = 'Feed Entries'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'rank'], name='unique_feed_rank'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} #{self.rank}: {self.book_id}"
+
+
+class BookActivityBucket(models.Model):
+    """Borrow approvals and downloads of a book in one hour, for the trending scores."""
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name='activity_buckets'
+    )
+    
+    # start of the hour
+    hour = models.DateTimeField()
+    
+    count = models.PositiveIntegerField(default=0)
+    
+    # events counted here but not yet added to the book's trending_score
+    pending = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('book', 'hour')
+        verbose_name = 'Book Activity Bucket'
+        verbose_name_plural = 'Book Activity Buckets'
+        indexes = [
+            # refresh_trending reads only buckets with new events
+            models.Index(fields=['pending']),
+            models.Index(fields=['hour']),
+        ]
+    
+    def __str__(self):
+        return f"{self.book_id} @ {self.hour:%Y-%m-%d %H:00}: {self.count}"
+
+
+class TrendingState(models.Model):
+    """
+    The single row recording the time trending scores are measured from
+    (see apps/books/trending.py) and when they were last refreshed.
+    """
+    epoch = models.DateTimeField()
+    
+    refreshed_at = models.DateTimeField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"Trending scores since {self.epoch:%Y-%m-%d %H:00}"
+
+
+class FullTextField(models.TextField):
+    """The hidden full-text column of an FTS table; supports the `match` lookup."""
+
+
+@FullTextField.register_lookup
+class FullTextMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class BookSearchEntry(models.Model):
+    """
+    A row of the books_book_fts SQLite FTS5 table, keyed by the book id.
+    The table is created by migration and written by apps.books.search;
+    the model only exists so book querysets can join it and order by rank.
+
+    The join uses the UNINDEXED book_id column rather than rowid: SQLite
+    can then only drive the join from the MATCH cursor, instead of running
+    the full-text query once per book row.
+    """
+    book = models.OneToOneField(
+        Book,
+        primary_key=True,
+        db_column='book_id',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_entry'
+    )
+
+    # FTS5 exposes a hidden column named after the table for MATCH queries
+    document = FullTextField(db_column='books_book_fts')
+    rank = models.FloatField()
+
+    title = models.TextField()
+    original_author = models.TextField()
+    author_name = models.TextField()
+    description = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'books_book_fts'
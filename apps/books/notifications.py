@@ -0,0 +1,32 @@
+from apps.core.utils import dispatch_notifications
+from apps.users.models import User
+
+
+def wishlist_holders(book_id, exclude_user_id=None):
+    """Audience for book_available jobs: everyone with the book on their wishlist."""
+    users = User.objects.filter(wishlist__book_id=book_id)
+    if exclude_user_id:
+        users = users.exclude(pk=exclude_user_id)
+    return users
+
+
+def notify_book_available(book, event, exclude_user=None):
+    """
+    Queue a book_available notification for the book's wishlist holders.
+    The audience is unbounded, so the job is always left to the worker
+    whatever NOTIFICATION_DISPATCH says. `event` names what made the book available (e.g. 'approved' or
+    'return:<borrow id>'); each event notifies at most once, however many
+    times it is triggered.
+    """
+    if book.status != 'approved':
+        return None
+    return dispatch_notifications(
+        'book_available',
+        f'"{book.title}" is now available',
+        f'"{book.title}" from your wishlist is available to borrow.',
+        audience='apps.books.notifications.wishlist_holders',
+        audience_kwargs={'book_id': book.pk, 'exclude_user_id': exclude_user.pk if exclude_user else None},
+        related_book=book,
+        defer=True,
+        dedupe_key=f'book_available:{book.pk}:{event}',
+    )
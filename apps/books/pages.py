@@ -0,0 +1,229 @@
+"""
+Server-side page rendering for the online viewer. Pages of a book's PDF
+are rendered one at a time on first request and kept in an on-disk cache
+keyed by the file's SHA-256 digest, so every copy of the same file shares
+them and a changed file never serves stale pages.
+"""
+
+import itertools
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .delivery import CHUNK_SIZE
+
+PAGES_RE = re.compile(r'^Pages:\s+(\d+)', re.MULTILINE)
+
+
+class PageRenderError(Exception):
+    """The renderer failed on this file or page."""
+
+
+class PageRenderer:
+    """Turns single pages of a PDF on local disk into images or text."""
+    media_type = 'image/png'
+    extension = 'png'
+
+    @classmethod
+    def available(cls):
+        return False
+
+    def page_count(self, path):
+        raise NotImplementedError
+
+    def render(self, path, number, out_path):
+        """Write page `number` (1-based) of the PDF at `path` to `out_path`."""
+        raise NotImplementedError
+
+
+class PdftoppmRenderer(PageRenderer):
+    """Renders PNGs with poppler's pdftoppm and pdfinfo (the poppler-utils package)."""
+
+    @classmethod
+    def available(cls):
+        return bool(shutil.which('pdftoppm') and shutil.which('pdfinfo'))
+
+    def page_count(self, path):
+        result = subprocess.run(['pdfinfo', str(path)], capture_output=True, text=True, timeout=30, check=True)
+        match = PAGES_RE.search(result.stdout)
+        if not match:
+            raise ValueError(f'pdfinfo reported no page count for {path}')
+        return int(match.group(1))
+
+    def render(self, path, number, out_path):
+        prefix = str(out_path) + '.render'
+        subprocess.run(
+            ['pdftoppm', '-png', '-r', str(settings.BOOK_PAGE_DPI), '-f', str(number), '-l', str(number),
+             '-singlefile', str(path), prefix],
+            capture_output=True, timeout=60, check=True,
+        )
+        os.replace(prefix + '.png', out_path)
+
+
+class PyPDFTextRenderer(PageRenderer):
+    """Pure-Python fallback: extracts each page's text with pypdf."""
+    media_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    @classmethod
+    def available(cls):
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def page_count(self, path):
+        from pypdf import PdfReader
+
+        return len(PdfReader(path).pages)
+
+    def render(self, path, number, out_path):
+        from pypdf import PdfReader
+
+        text = PdfReader(path).pages[number - 1].extract_text() or ''
+        Path(out_path).write_text(text, encoding='utf-8')
+
+
+def get_page_renderer():
+    """
+    Return the renderer named in settings.BOOK_PAGE_RENDERER, or the first
+    one available on this machine, or None if pages can't be rendered.
+    """
+    if settings.BOOK_PAGE_RENDERER:
+        return import_string(settings.BOOK_PAGE_RENDERER)()
+    for renderer in (PdftoppmRenderer, PyPDFTextRenderer):
+        if renderer.available():
+            return renderer()
+    return None
+
+
+class PageCache:
+    """
+    Rendered pages under root/ab/<digest>/, evicted least recently used
+    first once the cache grows past max_bytes. Reads bump a file's mtime,
+    which is what eviction orders by.
+    """
+    _writes = itertools.count(1)
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or settings.BOOK_PAGE_CACHE_ROOT)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.BOOK_PAGE_CACHE_MAX_BYTES
+
+    def directory(self, digest):
+        return self.root / digest[:2] / digest
+
+    def page_path(self, digest, number, extension):
+        return self.directory(digest) / f'{number}.{extension}'
+
+    def get(self, path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def write(self, path, produce):
+        """Create `path` by calling produce(temp_path), then install it atomically."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        os.close(fd)
+        try:
+            produce(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        if next(self._writes) % settings.BOOK_PAGE_CACHE_PRUNE_INTERVAL == 0:
+            self.prune()
+        return path
+
+    def prune(self):
+        """Delete least recently used files until the cache fits in max_bytes. Returns bytes freed."""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        freed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            freed += size
+        return freed
+
+
+@contextmanager
+def local_copy(book_file):
+    """Yield a local path to the book file, copying it to a temp file if it isn't on disk."""
+    path = book_file.path()
+    if path:
+        yield path
+        return
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as tmp, book_file.open() as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            tmp.write(chunk)
+        tmp.flush()
+        yield tmp.name
+
+
+class BookPages:
+    """The rendered pages of one book file."""
+
+    def __init__(self, book_file, renderer, cache=None):
+        self.book_file = book_file
+        self.renderer = renderer
+        self.cache = cache or PageCache()
+        self.digest = book_file.digest
+
+    @property
+    def media_type(self):
+        return self.renderer.media_type
+
+    def page_count(self):
+        count_path = self.cache.directory(self.digest) / 'pages'
+        if self.cache.get(count_path):
+            return int(count_path.read_text())
+
+        def produce(tmp):
+            with local_copy(self.book_file) as source:
+                try:
+                    count = self.renderer.page_count(source)
+                except Exception as exc:
+                    raise PageRenderError(f'Could not count pages of {self.digest}') from exc
+            Path(tmp).write_text(str(count))
+
+        return int(self.cache.write(count_path, produce).read_text())
+
+    def page(self, number):
+        """Path of the rendered page, rendering it on first access."""
+        path = self.cache.page_path(self.digest, number, self.renderer.extension)
+        if self.cache.get(path):
+            return path
+
+        def produce(tmp):
+            with local_copy(self.book_file) as source:
+                try:
+                    self.renderer.render(source, number, tmp)
+                except Exception as exc:
+                    raise PageRenderError(f'Could not render page {number} of {self.digest}') from exc
+
+        return self.cache.write(path, produce)
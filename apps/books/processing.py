@@ -0,0 +1,174 @@
+"""
+Post-upload processing of book files. The upload request only streams the
+bytes into the blob store and marks the book 'pending'; once that commits,
+the work below runs in a small in-process thread pool or, with
+BOOK_PROCESSING = 'queue', in `manage.py process_uploads`:
+
+  - digest and size of the stored file
+  - the real MIME type, sniffed from the file's first bytes
+  - page count into Book.pages (PDF), or the chapter index (EPUB)
+  - a cover thumbnail when the book has no cover image, and the cover's
+    resized variants for list pages
+  - a fresh search index row
+"""
+
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.thumbnails import generate_variants
+from .delivery import BookFile
+from .epub import EPUB_MEDIA_TYPE, get_epub_index, read_entry
+from .models import Book
+from .pages import BookPages, get_page_renderer
+from .search import get_search_backend
+
+logger = logging.getLogger(__name__)
+
+# Enough leading bytes to recognise every format below
+SNIFF_BYTES = 64
+
+_executor = None
+
+
+def sniff_content_type(head):
+    """MIME type from a file's leading bytes, or None if unrecognised."""
+    if head.startswith(b'%PDF-'):
+        return 'application/pdf'
+    if head.startswith(b'PK\x03\x04'):
+        # the OCF spec requires an uncompressed 'mimetype' entry first in the archive
+        if head[30:38] == b'mimetype' and head[38:58] == EPUB_MEDIA_TYPE.encode():
+            return EPUB_MEDIA_TYPE
+        return 'application/zip'
+    return None
+
+
+def make_thumbnail(data):
+    """A JPEG cover thumbnail, no larger than BOOK_COVER_SIZE, from image bytes."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail(settings.BOOK_COVER_SIZE)
+        out = io.BytesIO()
+        image.convert('RGB').save(out, 'JPEG', quality=85, optimize=True)
+    return out.getvalue()
+
+
+def _epub_cover(book_file, index):
+    """Bytes of the image an EPUB names as its cover, going by the usual file names."""
+    images = [(path, entry) for path, entry in index.entries.items() if entry[4].startswith('image/')]
+    for path, entry in images:
+        if 'cover' in path.rsplit('/', 1)[-1].lower():
+            return read_entry(book_file, entry)
+    return None
+
+
+def process_book(book):
+    """Run every processing step for the book's file and mark it ready."""
+    book_file = BookFile(book)
+    update_fields = ['file_digest', 'file_size', 'file_mime', 'processing_status', 'processing_error']
+
+    book.file_digest = book_file.digest
+    book.file_size = book_file.size
+    with book_file.open() as f:
+        head = f.read(SNIFF_BYTES)
+    book.file_mime = sniff_content_type(head) or book_file.content_type
+    book_file.content_type = book.file_mime
+
+    cover = None
+    if book.file_mime == 'application/pdf':
+        renderer = get_page_renderer()
+        if renderer is not None:
+            pages = BookPages(book_file, renderer)
+            if not book.pages:
+                book.pages = pages.page_count()
+                update_fields.append('pages')
+            if not book.cover_image and renderer.media_type.startswith('image/'):
+                # page 1 also stays in the page cache for the viewer's first request
+                cover = pages.page(1).read_bytes()
+    elif book.file_mime == EPUB_MEDIA_TYPE:
+        index = get_epub_index(book, book_file)
+        if not book.cover_image:
+            cover = _epub_cover(book_file, index)
+
+    if cover:
+        book.cover_image.save(f'{book.pk}-cover.jpg', ContentFile(make_thumbnail(cover)), save=False)
+        update_fields.append('cover_image')
+
+    book.processing_status = 'ready'
+    book.processing_error = None
+    book.save(update_fields=update_fields)
+    if book.cover_image:
+        generate_variants(book.cover_image)
+    get_search_backend().index_book(book)
+    return book
+
+
+def claim_book(stale_after=600, book_id=None):
+    """
+    Take a book waiting for processing (or a specific one), including books
+    whose worker stopped `stale_after` seconds ago. The claim is a
+    conditional UPDATE, so two workers never process the same book.
+    """
+    now = timezone.now()
+    claimable = Q(processing_status='pending') | Q(
+        processing_status='processing', processing_started_at__lt=now - timedelta(seconds=stale_after),
+    )
+    if book_id is not None:
+        candidates = [book_id]
+    else:
+        candidates = Book.objects.filter(claimable).order_by('pk').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        claimed = Book.objects.filter(claimable, pk=pk).update(
+            processing_status='processing', processing_started_at=now,
+        )
+        if claimed:
+            return Book.objects.with_file().select_related('author').get(pk=pk)
+    return None
+
+
+def run_processing(book):
+    """Process a claimed book, recording a failure on it instead of raising."""
+    try:
+        return process_book(book)
+    except Exception as exc:
+        logger.exception('Processing book %s failed', book.pk)
+        Book.objects.filter(pk=book.pk).update(processing_status='failed', processing_error=repr(exc))
+        return None
+
+
+def _process_in_pool(book_id):
+    close_old_connections()
+    try:
+        book = claim_book(book_id=book_id)
+        if book is not None:
+            run_processing(book)
+    finally:
+        close_old_connections()
+
+
+def _submit(book_id):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BOOK_PROCESSING_WORKERS, thread_name_prefix='book-processing',
+        )
+    _executor.submit(_process_in_pool, book_id)
+
+
+def queue_processing(book):
+    """
+    Mark a freshly uploaded book for processing. Work starts only after the
+    surrounding transaction commits, so it never sees an uncommitted row.
+    """
+    Book.objects.filter(pk=book.pk).update(processing_status='pending', processing_error=None)
+    book.processing_status = 'pending'
+    if settings.BOOK_PROCESSING == 'pool':
+        transaction.on_commit(lambda: _submit(book.pk))
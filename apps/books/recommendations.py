@@ -0,0 +1,172 @@
+"""
+"Readers also borrowed": item-to-item recommendations computed offline by
+`manage.py build_recommendations` and stored in BookNeighbor, so the
+detail page reads a book's neighbours with one indexed query.
+
+Borrows, downloads, wishlist entries and reading history are merged into
+one weighted reader-by-book matrix, streamed from the database in reader
+order and kept in compact arrays (row pointers, book columns, weights)
+instead of per-interaction objects. Each book's cosine similarity to
+every book sharing a reader is then accumulated from the transposed
+matrix, a block of books at a time, keeping the top k. Memory holds the
+matrix plus one block of results, whatever the catalogue size.
+"""
+
+import heapq
+import math
+from array import array
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.borrowing.models import BorrowRequest
+from .models import Book, BookDownload, BookNeighbor, BookWishlist, ReadingHistory
+
+
+def interaction_sources():
+    """(name, querysets of (reader id, book id) ordered by both) for every kind of interaction."""
+    return [
+        ('borrows', BorrowRequest.objects.exclude(status__in=['rejected', 'cancelled'])
+         .order_by('reader_id', 'book_id').values_list('reader_id', 'book_id')),
+        ('downloads', BookDownload.objects.order_by('user_id', 'book_id').values_list('user_id', 'book_id')),
+        ('wishlist', BookWishlist.objects.order_by('user_id', 'book_id').values_list('user_id', 'book_id')),
+        ('reading', ReadingHistory.objects.order_by('user_id', 'book_id').values_list('user_id', 'book_id')),
+    ]
+
+
+def _weighted(pairs, weight):
+    for user, book in pairs:
+        yield user, book, weight
+
+
+def interactions(chunk_size=5000):
+    """
+    Yield (reader id, book id, weight) once per pair, in reader order. The
+    sources are merged as they stream; a pair seen in several of them gets
+    the largest of their RECOMMENDATION_WEIGHTS.
+    """
+    weights = settings.RECOMMENDATION_WEIGHTS
+    streams = [
+        _weighted(queryset.iterator(chunk_size=chunk_size), weights[name])
+        for name, queryset in interaction_sources()
+    ]
+    merged = heapq.merge(*streams, key=itemgetter(0, 1))
+    for (user, book), rows in groupby(merged, key=itemgetter(0, 1)):
+        yield user, book, max(row[2] for row in rows)
+
+
+class InteractionMatrix:
+    """
+    The reader-by-book matrix in compressed sparse row form, plus its
+    transpose. Books are numbered by column in `book_ids`.
+    """
+
+    def __init__(self, rows, max_user_items):
+        self.book_ids = array('q')
+        columns = {}
+        # row r's books are columns[row_ptr[r]:row_ptr[r + 1]]
+        self.row_ptr = array('q', [0])
+        self.columns = array('i')
+        self.weights = array('f')
+        squares = array('d')
+        self.interactions = self.skipped_users = 0
+
+        for user, group in groupby(rows, key=itemgetter(0)):
+            basket = [(book, weight) for _, book, weight in group]
+            if len(basket) > max_user_items:
+                # crawlers and bulk downloaders say little about taste and cost the square of their size
+                self.skipped_users += 1
+                continue
+            self.interactions += len(basket)
+            for book, weight in basket:
+                column = columns.get(book)
+                if column is None:
+                    column = columns[book] = len(self.book_ids)
+                    self.book_ids.append(book)
+                    squares.append(0.0)
+                squares[column] += weight * weight
+                if len(basket) > 1:
+                    self.columns.append(column)
+                    self.weights.append(weight)
+            if len(basket) > 1:
+                # a reader with one book adds to its norm but pairs it with nothing
+                self.row_ptr.append(len(self.columns))
+
+        self.norms = array('d', map(math.sqrt, squares))
+        self._transpose()
+
+    def _transpose(self):
+        count = len(self.book_ids)
+        self.col_ptr = array('q', bytes(8 * (count + 1)))
+        for column in self.columns:
+            self.col_ptr[column + 1] += 1
+        for column in range(count):
+            self.col_ptr[column + 1] += self.col_ptr[column]
+        self.col_rows = array('i', bytes(4 * len(self.columns)))
+        self.col_weights = array('f', bytes(4 * len(self.columns)))
+        fill = array('q', self.col_ptr[:-1])
+        for row in range(len(self.row_ptr) - 1):
+            for k in range(self.row_ptr[row], self.row_ptr[row + 1]):
+                column = self.columns[k]
+                self.col_rows[fill[column]] = row
+                self.col_weights[fill[column]] = self.weights[k]
+                fill[column] += 1
+
+    def neighbors(self, column, k):
+        """The k (column, cosine similarity) pairs closest to a column, best first."""
+        dot = defaultdict(float)
+        row_ptr, columns, weights = self.row_ptr, self.columns, self.weights
+        for i in range(self.col_ptr[column], self.col_ptr[column + 1]):
+            row, weight = self.col_rows[i], self.col_weights[i]
+            start, end = row_ptr[row], row_ptr[row + 1]
+            for other, other_weight in zip(columns[start:end], weights[start:end]):
+                dot[other] += weight * other_weight
+        dot.pop(column, None)
+        norm = self.norms[column]
+        norms = self.norms
+        return heapq.nlargest(k, ((other, value / (norm * norms[other])) for other, value in dot.items()),
+                              key=itemgetter(1))
+
+
+def build_recommendations(k=None, block_size=None, max_user_items=None, progress=None):
+    """Recompute every book's neighbours and replace the stored ones. Returns counts for the report."""
+    k = k or settings.RECOMMENDATIONS_NEIGHBORS
+    block_size = block_size or settings.RECOMMENDATIONS_BLOCK_SIZE
+    max_user_items = max_user_items or settings.RECOMMENDATIONS_MAX_USER_ITEMS
+    started = timezone.now()
+
+    matrix = InteractionMatrix(interactions(), max_user_items)
+    counts = {
+        'interactions': matrix.interactions, 'books': len(matrix.book_ids),
+        'skipped_users': matrix.skipped_users, 'neighbors': 0,
+    }
+    book_ids = matrix.book_ids
+    for block_start in range(0, len(book_ids), block_size):
+        block = range(block_start, min(block_start + block_size, len(book_ids)))
+        rows = [
+            BookNeighbor(book_id=book_ids[column], neighbor_id=book_ids[other], score=score, built_at=started)
+            for column in block
+            for other, score in matrix.neighbors(column, k)
+        ]
+        with transaction.atomic():
+            BookNeighbor.objects.filter(book_id__in=[book_ids[column] for column in block]).delete()
+            BookNeighbor.objects.bulk_create(rows, batch_size=1000)
+        counts['neighbors'] += len(rows)
+        if progress:
+            progress(block.stop, len(book_ids))
+
+    # books nobody interacts with any more
+    BookNeighbor.objects.filter(built_at__lt=started).delete()
+    return counts
+
+
+def similar_books(book, limit=None):
+    """The book's stored neighbours that are listed in the catalogue, closest first."""
+    return (
+        Book.objects.cards().approved().select_related('author')
+        .filter(neighbor_of__book=book).order_by('-neighbor_of__score')[:limit or settings.RECOMMENDATIONS_SHOWN]
+    )
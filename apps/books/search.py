@@ -0,0 +1,224 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from .models import Book, BookSearchEntry
+
+# Book fields copied into the search index
+INDEXED_FIELDS = {'title', 'original_author', 'description', 'author', 'author_id'}
+
+# Markers placed around matched terms in snippets; replaced after escaping
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def highlight(snippet):
+    """Escape a snippet and turn the match markers into <mark> tags."""
+    html = escape(snippet).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+    return mark_safe(html)
+
+
+def query_terms(query):
+    return TERM_RE.findall(query.lower())[:16]
+
+
+class SearchBackend:
+    """
+    Full-text search over books. search() narrows and ranks a Book queryset,
+    so callers can keep chaining filters on the result.
+    """
+    ranked = False
+    # ordering that puts the best match first, for backends that annotate search_rank
+    rank_ordering = None
+    # whether search() matches the query's terms in any order rather than the phrase as typed
+    matches_terms = False
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def query_key(self, query):
+        """The query as it appears in cache keys: queries with the same key find the same books."""
+        if self.matches_terms:
+            return ' '.join(sorted(set(query_terms(query))))
+        return query.lower()
+
+    def snippets(self, query, books):
+        """Return {book_id: highlighted snippet} for the given page of books."""
+        return {}
+
+    def index_book(self, book):
+        pass
+
+    def index_books(self, books):
+        """Index many saved books, e.g. after a bulk_create."""
+        for book in books:
+            self.index_book(book)
+
+    def remove_book(self, book_id):
+        pass
+
+    def rebuild(self, batch_size=500):
+        return 0
+
+
+class BasicSearchBackend(SearchBackend):
+    """Unindexed substring search, for database engines without full-text support."""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(original_author__icontains=query) |
+            Q(author__first_name__icontains=query) |
+            Q(author__last_name__icontains=query)
+        )
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    SQLite FTS5 index in books_book_fts, ranked with BM25 (title weighted
+    highest). Every query term is matched as a prefix, so results update as
+    the user types.
+    """
+    ranked = True
+    rank_ordering = 'search_rank'
+    table = 'books_book_fts'
+    matches_terms = True
+
+    def match_expression(self, query):
+        return ' '.join(f'"{term}"*' for term in query_terms(query))
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        return queryset.filter(search_entry__document__match=expression).annotate(
+            search_rank=F('search_entry__rank'),
+        ).order_by('search_rank')
+
+    def snippets(self, query, books):
+        expression = self.match_expression(query)
+        if not expression or not books:
+            return {}
+        rows = BookSearchEntry.objects.filter(
+            document__match=expression,
+            pk__in=[book.pk for book in books],
+        ).annotate(
+            snippet=RawSQL(f"snippet({self.table}, -1, %s, %s, '…', 16)", (HIGHLIGHT_START, HIGHLIGHT_END))
+        ).values_list('pk', 'snippet')
+        return {pk: highlight(snippet) for pk, snippet in rows}
+
+    def _row(self, book):
+        author_name = book.author.get_full_name() or book.author.username
+        return (book.pk, book.pk, book.title, book.original_author or '', author_name, book.description or '')
+
+    def index_book(self, book):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [book.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, book_id, title, original_author, author_name, description) '
+                f'VALUES (%s, %s, %s, %s, %s, %s)',
+                self._row(book),
+            )
+
+    def index_books(self, books):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(book.pk,) for book in books])
+            self._insert_many(cursor, [self._row(book) for book in books])
+
+    def remove_book(self, book_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [book_id])
+
+    def rebuild(self, batch_size=500):
+        books = Book.objects.with_details().select_related('author').order_by('pk').iterator(chunk_size=batch_size)
+        indexed = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            batch = []
+            for book in books:
+                batch.append(self._row(book))
+                if len(batch) >= batch_size:
+                    indexed += self._insert_many(cursor, batch)
+                    batch = []
+            indexed += self._insert_many(cursor, batch)
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return indexed
+
+    def _insert_many(self, cursor, rows):
+        if rows:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, book_id, title, original_author, author_name, description) '
+                f'VALUES (%s, %s, %s, %s, %s, %s)',
+                rows,
+            )
+        return len(rows)
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    PostgreSQL tsvector search with ts_rank and ts_headline. The vector is
+    built in the query from the book columns, so there is nothing to keep
+    in sync on save.
+    """
+    ranked = True
+    rank_ordering = '-search_rank'
+    matches_terms = True
+
+    def _search_query(self, query):
+        from django.contrib.postgres.search import SearchQuery
+
+        terms = query_terms(query)
+        if not terms:
+            return None
+        return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw')
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchRank, SearchVector
+
+        search_query = self._search_query(query)
+        if search_query is None:
+            return queryset.none()
+        vector = (
+            SearchVector('title', weight='A') +
+            SearchVector('original_author', 'author__first_name', 'author__last_name', weight='B') +
+            SearchVector('description', weight='C')
+        )
+        return queryset.annotate(
+            search_document=vector,
+            search_rank=SearchRank(vector, search_query),
+        ).filter(search_document=search_query).order_by('-search_rank')
+
+    def snippets(self, query, books):
+        from django.contrib.postgres.search import SearchHeadline
+
+        search_query = self._search_query(query)
+        if search_query is None or not books:
+            return {}
+        rows = Book.objects.with_details().filter(pk__in=[book.pk for book in books]).annotate(
+            snippet=SearchHeadline('description', search_query, start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_END)
+        ).values_list('pk', 'snippet')
+        return {pk: highlight(snippet) for pk, snippet in rows}
+
+
+def get_search_backend():
+    """
+    Return the backend named in settings.BOOK_SEARCH_BACKEND, or pick one
+    to match the configured database engine.
+    """
+    backend_path = getattr(settings, 'BOOK_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return BasicSearchBackend()
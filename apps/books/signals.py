@@ -0,0 +1,68 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.borrowing.models import BorrowRequest
+from apps.users.models import User
+from .models import Book, BookDownload, BookWishlist, FavoriteGenre, ReadingHistory
+from .facets import invalidate_facets
+from .featured import invalidate_featured_books
+from .feed import invalidate_feed
+from .trending import record_activity
+from .search import INDEXED_FIELDS, get_search_backend
+
+
+# Book fields shown in the cached featured list
+FEATURED_FIELDS = {'title', 'status', 'cover_image', 'author', 'author_id'}
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, raw=False, update_fields=None, **kwargs):
+    invalidate_facets()
+    if not update_fields or FEATURED_FIELDS.intersection(update_fields):
+        invalidate_featured_books()
+    # saves that only touch status, files, counters etc. leave the index as is
+    if raw or (update_fields and not INDEXED_FIELDS.intersection(update_fields)):
+        return
+    get_search_backend().index_book(instance)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    invalidate_facets()
+    invalidate_featured_books()
+    get_search_backend().remove_book(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def reindex_author_books(sender, instance, raw=False, update_fields=None, **kwargs):
+    # author names are part of the index; logins only save last_login
+    if raw or (update_fields and not {'first_name', 'last_name'}.intersection(update_fields)):
+        return
+    backend = get_search_backend()
+    for book in Book.objects.with_details().filter(author=instance).select_related('author'):
+        backend.index_book(book)
+
+
+@receiver(post_save, sender=BookWishlist)
+@receiver(post_delete, sender=BookWishlist)
+@receiver(post_save, sender=ReadingHistory)
+@receiver(post_delete, sender=ReadingHistory)
+@receiver(post_save, sender=BookDownload)
+@receiver(post_save, sender=FavoriteGenre)
+@receiver(post_delete, sender=FavoriteGenre)
+def invalidate_reader_feed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_feed(instance.user_id)
+
+
+@receiver(post_save, sender=BorrowRequest)
+def invalidate_borrower_feed(sender, instance, created=False, raw=False, **kwargs):
+    # status changes don't move the reader's tastes; a new request does
+    if created and not raw:
+        invalidate_feed(instance.reader_id)
+
+
+@receiver(post_save, sender=BookDownload)
+def count_download(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        record_activity(instance.book_id)
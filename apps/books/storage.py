@@ -0,0 +1,145 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.utils.module_loading import import_string
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file on disk, read in chunks."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class BlobStore:
+    """
+    Base class for book file stores. Content is addressed by its SHA-256
+    digest, so saving the same bytes twice stores them only once.
+    """
+
+    def save(self, upload):
+        """Store an UploadedFile/File and return (ref, digest, size)."""
+        raise NotImplementedError
+
+    def open(self, ref):
+        raise NotImplementedError
+
+    def exists(self, ref):
+        raise NotImplementedError
+
+    def size(self, ref):
+        raise NotImplementedError
+
+    def delete(self, ref):
+        raise NotImplementedError
+
+    def path(self, ref):
+        """Local filesystem path for a ref, or None if the store has none."""
+        return None
+
+    def save_bytes(self, data, name='blob'):
+        return self.save(ContentFile(bytes(data), name=name))
+
+    def save_file(self, path, digest=None):
+        """
+        Store a complete file from local disk, consuming it. Pass the digest
+        if it is already known: stores that copy the file check the copy
+        against it, stores that move the file use it instead of hashing.
+        """
+        with open(path, 'rb') as f:
+            result = self.save(File(f, name=os.path.basename(path)))
+        if digest is not None and result[1] != digest:
+            raise ValueError(f'{path} changed while it was being stored')
+        os.remove(path)
+        return result
+
+
+class FileSystemBlobStore(BlobStore):
+    """
+    Stores blobs on local disk under <root>/<d[:2]>/<d[2:4]>/<digest>.
+    Uploads are written chunk by chunk to a temporary file in the store and
+    renamed into place, so a partially written file is never visible.
+    """
+
+    def __init__(self, root=None):
+        self.root = str(root or settings.BOOK_BLOB_ROOT)
+
+    def ref_for_digest(self, digest):
+        return f'{digest[:2]}/{digest[2:4]}/{digest}'
+
+    def path(self, ref):
+        return os.path.join(self.root, *ref.split('/'))
+
+    def save(self, upload):
+        os.makedirs(self.root, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(upload, 'seek'):
+                    upload.seek(0)
+                for chunk in upload.chunks():
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+
+            digest = hasher.hexdigest()
+            ref = self.ref_for_digest(digest)
+            final_path = self.path(ref)
+            if os.path.exists(final_path):
+                # identical content is already stored
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return ref, digest, size
+
+    def save_file(self, path, digest=None):
+        # files staged inside the store's root are renamed into place, not copied
+        root = os.path.abspath(self.root)
+        if os.path.commonpath([os.path.abspath(path), root]) == root:
+            if digest is None:
+                digest = file_digest(path)
+            size = os.path.getsize(path)
+            ref = self.ref_for_digest(digest)
+            final_path = self.path(ref)
+            if os.path.exists(final_path):
+                os.remove(path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(path, final_path)
+            return ref, digest, size
+        return super().save_file(path, digest)
+
+    def open(self, ref):
+        return open(self.path(ref), 'rb')
+
+    def exists(self, ref):
+        return os.path.exists(self.path(ref))
+
+    def size(self, ref):
+        return os.path.getsize(self.path(ref))
+
+    def delete(self, ref):
+        try:
+            os.remove(self.path(ref))
+        except FileNotFoundError:
+            pass
+
+
+def get_blob_store():
+    """Return an instance of the store configured in settings.BOOK_BLOB_STORE."""
+    store_class = import_string(getattr(settings, 'BOOK_BLOB_STORE', 'apps.books.storage.FileSystemBlobStore'))
+    return store_class()
@@ -0,0 +1,1180 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import RequestFactory, TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core.models import Notification, NotificationJob
+from apps.core.pagination import CursorPaginator
+from .access import check_grant
+from .delivery import BookFile
+from .epub import get_epub_index, read_entry
+from .feed import feed_entries
+from .facets import normalize_filters
+from .featured import (
+    CACHE_KEY as FEATURED_CACHE_KEY, compute_featured_books, get_featured_books, refresh_featured_books,
+)
+from .pages import BookPages, PageCache, PageRenderer
+from .processing import sniff_content_type
+from .recommendations import similar_books
+from .models import (
+    Book, BookActivityBucket, BookDownload, BookNeighbor, BookWishlist, EpubIndex, FavoriteGenre, FeedEntry,
+    ReadingHistory, TrendingState, UploadSession,
+)
+from .search import BasicSearchBackend, SQLiteFTSBackend, get_search_backend
+from .trending import get_trending_books, record_activity, refresh_trending
+from .storage import FileSystemBlobStore, get_blob_store
+from .uploads import UploadConflict, UploadError, append_part, parts_dir
+
+User = get_user_model()
+
+
+def create_book(author, **kwargs):
+    data = dict(
+        title='Test Book',
+        original_author='Original',
+        author=author,
+        description='A test book',
+        genre='fiction',
+        language='English',
+        publication_date=timezone.now().date(),
+        status='approved',
+    )
+    data.update(kwargs)
+    return Book.objects.create(**data)
+
+
+class BlobStoreTestCase(TestCase):
+    """Points the blob store at a throwaway directory for each test."""
+
+    def setUp(self):
+        super().setUp()
+        self.blob_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.blob_root, ignore_errors=True)
+        override = override_settings(BOOK_BLOB_ROOT=self.blob_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class BlobStoreTests(BlobStoreTestCase):
+    def test_identical_uploads_are_stored_once(self):
+        store = get_blob_store()
+        ref1, digest1, size1 = store.save(SimpleUploadedFile('a.pdf', b'%PDF-1.4 same bytes'))
+        ref2, digest2, size2 = store.save(SimpleUploadedFile('b.pdf', b'%PDF-1.4 same bytes'))
+        self.assertEqual(ref1, ref2)
+        self.assertEqual(digest1, digest2)
+        self.assertEqual(size1, len(b'%PDF-1.4 same bytes'))
+        with store.open(ref1) as f:
+            self.assertEqual(f.read(), b'%PDF-1.4 same bytes')
+
+    def test_copied_files_are_checked_against_their_digest(self):
+        store = get_blob_store()
+        data = b'%PDF-1.4 staged elsewhere'
+
+        def staged():
+            fd, path = tempfile.mkstemp()
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+            return path
+
+        path = staged()
+        with self.assertRaises(ValueError):
+            store.save_file(path, '0' * 64)
+        self.assertTrue(os.path.exists(path))
+        path = staged()
+        self.assertEqual(store.save_file(path, hashlib.sha256(data).hexdigest())[1], hashlib.sha256(data).hexdigest())
+        self.assertFalse(os.path.exists(path))
+
+    def test_book_upload_goes_to_blob_store(self):
+        author = User.objects.create_user(username='author', password='password', role='author')
+        self.client.login(username='author', password='password')
+        upload = SimpleUploadedFile('book.pdf', b'%PDF-1.4 uploaded', content_type='application/pdf')
+        resp = self.client.post(reverse('book_add'), {
+            'title': 'Uploaded',
+            'original_author': 'Someone',
+            'description': 'd',
+            'genre': 'fiction',
+            'language': 'English',
+            'publication_date': '2020-01-01',
+            'availability': 'download',
+            'upload_file': upload,
+        })
+        self.assertEqual(resp.status_code, 302)
+        book = Book.objects.get(title='Uploaded', author=author)
+        self.assertIsNone(book.file_blob)
+        self.assertEqual(book.file_size, len(b'%PDF-1.4 uploaded'))
+        self.assertTrue(get_blob_store().exists(book.file_ref))
+
+    def test_migrate_file_blobs_command(self):
+        author = User.objects.create_user(username='author', password='password', role='author')
+        books = [create_book(author, title=f'Book {i}', file_blob=b'%%PDF legacy %d' % i) for i in range(3)]
+        call_command('migrate_file_blobs', batch_size=2, stdout=io.StringIO())
+        for book in books:
+            book.refresh_from_db()
+            self.assertIsNone(book.file_blob)
+            self.assertTrue(book.file_ref)
+            with get_blob_store().open(book.file_ref) as f:
+                self.assertTrue(f.read().startswith(b'%PDF legacy'))
+
+
+class BookProjectionTests(TestCase):
+    # Columns loaded for list pages. Adding a heavy column here should be a
+    # deliberate decision, not something a new field slips in by default.
+    CARD_COLUMNS = [
+        'id', 'title', 'original_author', 'author_id', 'genre', 'language',
+        'publication_date', 'publisher', 'isbn', 'cover_image', 'pdf_file',
+        'file_ref', 'file_size', 'file_digest', 'file_name', 'file_mime',
+        'availability', 'status', 'pages', 'processing_status',
+        'processing_started_at', 'rating_count', 'rating_sum', 'rating_avg',
+        'trending_score', 'created_at', 'updated_at',
+    ]
+
+    def selected_columns(self, queryset):
+        select, _, _ = queryset.query.get_compiler(using='default').get_select()
+        return sorted(col.target.column for col, _, _ in select)
+
+    def test_default_manager_loads_card_columns_only(self):
+        self.assertEqual(self.selected_columns(Book.objects.all()), sorted(self.CARD_COLUMNS))
+
+    def test_opt_in_loads_heavy_columns(self):
+        detail_columns = self.selected_columns(Book.objects.with_details())
+        self.assertIn('description', detail_columns)
+        self.assertNotIn('file_blob', detail_columns)
+        self.assertIn('file_blob', self.selected_columns(Book.objects.with_file()))
+
+    def test_book_list_does_not_select_heavy_columns(self):
+        author = User.objects.create_user(username='author', password='password', role='author')
+        create_book(author, file_blob=b'%PDF-1.4')
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('book_list'))
+        self.assertEqual(resp.status_code, 200)
+        book_queries = [q['sql'] for q in ctx.captured_queries if 'FROM "books_book"' in q['sql']]
+        self.assertTrue(book_queries)
+        for sql in book_queries:
+            self.assertNotIn('"file_blob"', sql)
+            self.assertNotIn('"description"', sql)
+
+
+class BookFileDeliveryTests(BlobStoreTestCase):
+    CONTENT = b'%PDF-1.4 ' + bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        author = User.objects.create_user(username='author', password='password', role='author')
+        User.objects.create_user(username='reader', password='password', role='reader')
+        self.book = create_book(author, availability='download')
+        self.book.attach_file(SimpleUploadedFile('book.pdf', self.CONTENT, content_type='application/pdf'))
+        self.book.save()
+        self.client.login(username='reader', password='password')
+        self.url = reverse('book_file', args=[self.book.pk])
+
+    def test_full_response_has_validators(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['ETag'], f'"{self.book.file_digest}"')
+        self.assertEqual(resp['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(resp.streaming_content), self.CONTENT)
+
+    def test_single_and_suffix_ranges(self):
+        resp = self.client.get(self.url, HTTP_RANGE='bytes=0-8')
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp['Content-Range'], f'bytes 0-8/{len(self.CONTENT)}')
+        self.assertEqual(b''.join(resp.streaming_content), self.CONTENT[:9])
+
+        resp = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(b''.join(resp.streaming_content), self.CONTENT[-10:])
+
+    def test_multipart_ranges(self):
+        resp = self.client.get(self.url, HTTP_RANGE='bytes=0-3,10-19')
+        self.assertEqual(resp.status_code, 206)
+        self.assertTrue(resp['Content-Type'].startswith('multipart/byteranges; boundary='))
+        body = b''.join(resp.streaming_content)
+        self.assertEqual(len(body), int(resp['Content-Length']))
+        self.assertIn(b'Content-Range: bytes 0-3/', body)
+        self.assertIn(b'Content-Range: bytes 10-19/', body)
+        self.assertIn(self.CONTENT[10:20], body)
+
+    def test_unsatisfiable_range(self):
+        resp = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.CONTENT)}-')
+        self.assertEqual(resp.status_code, 416)
+        self.assertEqual(resp['Content-Range'], f'bytes */{len(self.CONTENT)}')
+
+    def test_conditional_get_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        last_modified = self.client.get(self.url)['Last-Modified']
+        resp = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_download_logged_once_per_transfer(self):
+        url = reverse('book_download', args=[self.book.pk])
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('attachment', resp['Content-Disposition'])
+        self.client.get(url, HTTP_RANGE='bytes=100-')
+        self.client.get(url, HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(self.book.downloads.count(), 1)
+
+
+class AccessGrantTests(BlobStoreTestCase):
+    def setUp(self):
+        from apps.borrowing.models import BorrowRequest
+
+        super().setUp()
+        cache.clear()
+        author = User.objects.create_user(username='author', password='password', role='author')
+        self.reader = User.objects.create_user(username='reader', password='password', role='reader')
+        self.book = create_book(author, availability='borrow')
+        self.book.attach_file(SimpleUploadedFile('book.pdf', b'%PDF-1.4 data', content_type='application/pdf'))
+        self.book.save()
+        self.loan = BorrowRequest.objects.create(reader=self.reader, book=self.book)
+        self.loan.approve_request()
+        self.client.login(username='reader', password='password')
+        self.url = reverse('book_file', args=[self.book.pk])
+
+    def grant(self):
+        return self.client.get(reverse('book_viewer', args=[self.book.pk])).context['grant']
+
+    def test_file_requests_with_a_grant_only_look_up_the_loan(self):
+        grant = self.grant()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url, {'grant': grant}, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(resp.status_code, 206)
+        loan_queries = [q['sql'] for q in ctx.captured_queries if 'borrowing_borrowrequest' in q['sql']]
+        self.assertEqual(len(loan_queries), 1)
+        self.assertIn('"borrowing_borrowrequest"."id" =', loan_queries[0])
+
+    def test_returning_the_book_revokes_the_grant(self):
+        grant = self.grant()
+        self.assertTrue(check_grant(grant, self.reader, self.book.pk))
+        self.loan.return_book()
+        self.assertFalse(check_grant(grant, self.reader, self.book.pk))
+        self.assertEqual(self.client.get(self.url, {'grant': grant}).status_code, 403)
+
+    def test_revocation_does_not_depend_on_the_cache(self):
+        from apps.borrowing.models import BorrowRequest
+
+        grant = self.grant()
+        BorrowRequest.objects.filter(pk=self.loan.pk).update(status='cancelled')
+        cache.clear()
+        self.assertFalse(check_grant(grant, self.reader, self.book.pk))
+
+    def test_grants_are_bound_to_the_user(self):
+        grant = self.grant()
+        User.objects.create_user(username='other', password='password')
+        self.client.login(username='other', password='password')
+        self.assertEqual(self.client.get(self.url, {'grant': grant}).status_code, 403)
+
+
+class FakePageRenderer(PageRenderer):
+    """Stands in for pdftoppm: three 'pages' whose bytes name the page."""
+    calls = []
+
+    def page_count(self, path):
+        return 3
+
+    def render(self, path, number, out_path):
+        FakePageRenderer.calls.append(number)
+        with open(out_path, 'wb') as f:
+            f.write(b'page %d' % number)
+
+
+@override_settings(BOOK_PAGE_RENDERER='apps.books.tests.FakePageRenderer')
+class BookPagesTests(BlobStoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.page_root, ignore_errors=True)
+        self.override = override_settings(BOOK_PAGE_CACHE_ROOT=self.page_root)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        FakePageRenderer.calls = []
+
+        author = User.objects.create_user(username='author', password='password', role='author')
+        User.objects.create_user(username='reader', password='password', role='reader')
+        self.book = create_book(author, availability='download')
+        self.book.attach_file(SimpleUploadedFile('book.pdf', b'%PDF-1.4 data', content_type='application/pdf'))
+        self.book.save()
+        self.client.login(username='reader', password='password')
+
+    def test_listing_and_pages_render_once(self):
+        data = self.client.get(reverse('book_pages', args=[self.book.pk])).json()
+        self.assertEqual(data['page_count'], 3)
+        self.assertEqual([page['number'] for page in data['pages']], [1, 2, 3])
+        self.assertIsNone(data['next'])
+
+        for _ in range(2):
+            resp = self.client.get(data['pages'][1]['url'])
+            self.assertEqual(b''.join(resp.streaming_content), b'page 2')
+        self.assertEqual(FakePageRenderer.calls, [2])
+        self.assertEqual(self.client.get(reverse('book_page', args=[self.book.pk, 4])).status_code, 404)
+
+        resp = self.client.get(data['pages'][1]['url'], HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_missing_renderer_is_reported(self):
+        with mock.patch('apps.books.views.get_page_renderer', return_value=None):
+            resp = self.client.get(reverse('book_pages', args=[self.book.pk]))
+            self.assertEqual(resp.status_code, 501)
+            self.assertIn('renderer', resp.json()['error'])
+            self.assertIsNone(self.client.get(reverse('book_viewer', args=[self.book.pk])).context['pages_url'])
+
+    def test_cache_evicts_least_recently_used_pages(self):
+        cache = PageCache(max_bytes=8)
+        pages = BookPages(BookFile(Book.objects.with_file().get(pk=self.book.pk)), FakePageRenderer(), cache)
+        first = pages.page(1)
+        os.utime(first, (1, 1))
+        second = pages.page(2)
+        pages.page(1)  # reading bumps it to most recent
+        os.utime(second, (2, 2))
+        cache.prune()
+        self.assertTrue(first.exists())
+        self.assertFalse(second.exists())
+
+
+def make_epub(chapter_text=b'<p>Chapter two</p>'):
+    """A minimal EPUB 3 with one stored and one deflated chapter."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        archive.writestr('META-INF/container.xml', (
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container" version="1.0"><rootfiles>'
+            '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            '</rootfiles></container>'
+        ))
+        archive.writestr('OEBPS/content.opf', (
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0"><manifest>'
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+            '<item id="c1" href="text/one.xhtml" media-type="application/xhtml+xml"/>'
+            '<item id="c2" href="text/two.xhtml" media-type="application/xhtml+xml"/>'
+            '</manifest><spine><itemref idref="c1"/><itemref idref="c2"/></spine></package>'
+        ))
+        archive.writestr('OEBPS/nav.xhtml', (
+            '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops"><body>'
+            '<nav epub:type="toc"><ol><li><a href="text/one.xhtml">One</a></li>'
+            '<li><a href="text/two.xhtml#start">Two</a></li></ol></nav></body></html>'
+        ))
+        archive.writestr('OEBPS/text/one.xhtml', b'<p>Chapter one</p>', compress_type=zipfile.ZIP_STORED)
+        archive.writestr('OEBPS/text/two.xhtml', chapter_text, compress_type=zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+
+class EpubChapterTests(BlobStoreTestCase):
+    def setUp(self):
+        super().setUp()
+        author = User.objects.create_user(username='author', password='password', role='author')
+        User.objects.create_user(username='reader', password='password', role='reader')
+        self.book = create_book(author, availability='download')
+        self.attach(make_epub())
+        self.client.login(username='reader', password='password')
+
+    def attach(self, data):
+        self.book.attach_file(SimpleUploadedFile('book.epub', data, content_type='application/epub+zip'))
+        self.book.save()
+
+    def test_index_records_spine_toc_and_entry_offsets(self):
+        index = get_epub_index(self.book)
+        self.assertEqual(index.spine, ['OEBPS/text/one.xhtml', 'OEBPS/text/two.xhtml'])
+        self.assertEqual(index.toc[1], {'title': 'Two', 'href': 'OEBPS/text/two.xhtml#start'})
+        book_file = BookFile(self.book)
+        self.assertEqual(read_entry(book_file, index.entries['OEBPS/text/one.xhtml']), b'<p>Chapter one</p>')
+        self.assertEqual(read_entry(book_file, index.entries['OEBPS/text/two.xhtml']), b'<p>Chapter two</p>')
+
+    def test_chapters_are_served_from_the_archive(self):
+        data = self.client.get(reverse('book_chapters', args=[self.book.pk])).json()
+        self.assertEqual([c['href'] for c in data['spine']], ['OEBPS/text/one.xhtml', 'OEBPS/text/two.xhtml'])
+
+        resp = self.client.get(data['spine'][1]['url'])
+        self.assertEqual(resp.content, b'<p>Chapter two</p>')
+        self.assertEqual(resp['Content-Type'], 'application/xhtml+xml')
+        self.assertEqual(self.client.get(data['spine'][1]['url'], HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 304)
+        missing = reverse('book_epub_resource', args=[self.book.pk, 'OEBPS/missing.xhtml'])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_replacing_the_file_rebuilds_the_index(self):
+        get_epub_index(self.book)
+        self.attach(make_epub(b'<p>Revised</p>'))
+        url = reverse('book_epub_resource', args=[self.book.pk, 'OEBPS/text/two.xhtml'])
+        self.assertEqual(self.client.get(url).content, b'<p>Revised</p>')
+        self.assertEqual(EpubIndex.objects.get(book=self.book).digest, self.book.file_digest)
+
+    def test_scripted_entries_are_sandboxed(self):
+        self.attach(make_epub(b'<p>Hi</p><script>alert(document.cookie)</script>'))
+        resp = self.client.get(reverse('book_epub_resource', args=[self.book.pk, 'OEBPS/text/two.xhtml']))
+        self.assertIn(b'<script>', resp.content)
+        self.assertEqual(resp['Content-Security-Policy'], 'sandbox')
+        self.assertEqual(resp['Content-Disposition'], 'inline')
+        self.assertEqual(resp['X-Content-Type-Options'], 'nosniff')
+
+    def test_readers_without_access_are_refused(self):
+        Book.objects.filter(pk=self.book.pk).update(availability='borrow')
+        self.assertEqual(self.client.get(reverse('book_chapters', args=[self.book.pk])).status_code, 403)
+
+
+class FakeImageRenderer(FakePageRenderer):
+    """Three pages rendered as small PNGs, for cover generation."""
+
+    def render(self, path, number, out_path):
+        from PIL import Image
+
+        Image.new('RGB', (800, 1000), 'white').save(out_path, 'PNG')
+
+
+class BrokenRenderer(FakePageRenderer):
+    def page_count(self, path):
+        raise ValueError('not a PDF')
+
+
+class FullBlobStore(FileSystemBlobStore):
+    def save(self, upload):
+        raise OSError('No space left on device')
+
+
+@override_settings(BOOK_PROCESSING='queue', BOOK_PAGE_RENDERER='apps.books.tests.FakeImageRenderer')
+class UploadProcessingTests(BlobStoreTestCase):
+    def setUp(self):
+        super().setUp()
+        for setting in ('MEDIA_ROOT', 'BOOK_PAGE_CACHE_ROOT'):
+            root = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+            override = override_settings(**{setting: root})
+            override.enable()
+            self.addCleanup(override.disable)
+        User.objects.create_user(username='author', password='password', role='author')
+        self.client.login(username='author', password='password')
+
+    def upload(self, name, data):
+        self.client.post(reverse('book_add'), {
+            'title': 'Uploaded', 'original_author': 'Original', 'description': 'd', 'genre': 'fiction',
+            'language': 'English', 'publication_date': '2024-01-01', 'availability': 'borrow',
+            'upload_file': SimpleUploadedFile(name, data, content_type='application/octet-stream'),
+        })
+        return Book.objects.get(title='Uploaded')
+
+    def process(self):
+        call_command('process_uploads', stdout=io.StringIO(), stderr=io.StringIO())
+
+    @override_settings(BOOK_BLOB_STORE='apps.books.tests.FullBlobStore')
+    def test_storage_failures_are_shown_and_not_queued(self):
+        with self.assertLogs('apps.books.views', 'ERROR'):
+            resp = self.client.post(reverse('book_add'), {
+                'title': 'Uploaded', 'original_author': 'Original', 'description': 'd', 'genre': 'fiction',
+                'language': 'English', 'publication_date': '2024-01-01', 'availability': 'borrow',
+                'upload_file': SimpleUploadedFile('book.pdf', b'%PDF-1.4 data', content_type='application/pdf'),
+            })
+        self.assertContains(resp, 'The file could not be stored')
+        self.assertFalse(Book.objects.filter(title='Uploaded').exists())
+
+    def test_upload_is_queued_then_processed(self):
+        book = self.upload('book.pdf', b'%PDF-1.4 data')
+        self.assertEqual(book.processing_status, 'pending')
+        self.assertIsNone(book.pages)
+
+        self.process()
+        book.refresh_from_db()
+        self.assertEqual(book.processing_status, 'ready')
+        self.assertEqual(book.file_mime, 'application/pdf')
+        self.assertEqual(book.pages, 3)
+        from PIL import Image
+        with Image.open(book.cover_image.path) as cover:
+            self.assertEqual(cover.format, 'JPEG')
+            self.assertLessEqual(cover.size[1], 600)
+
+    def test_epub_type_is_sniffed_and_indexed(self):
+        book = self.upload('book.epub', make_epub())
+        self.process()
+        book.refresh_from_db()
+        self.assertEqual(book.file_mime, 'application/epub+zip')
+        self.assertEqual(EpubIndex.objects.get(book=book).digest, book.file_digest)
+        self.assertEqual(sniff_content_type(b'plain text'), None)
+
+    @override_settings(BOOK_PAGE_RENDERER='apps.books.tests.BrokenRenderer')
+    def test_failures_are_recorded_and_can_be_retried(self):
+        book = self.upload('book.pdf', b'%PDF-1.4 data')
+        with self.assertLogs('apps.books.processing', 'ERROR'):
+            self.process()
+        book.refresh_from_db()
+        self.assertEqual(book.processing_status, 'failed')
+        self.assertIn('Could not count pages', book.processing_error)
+
+        with override_settings(BOOK_PAGE_RENDERER='apps.books.tests.FakeImageRenderer'):
+            call_command('process_uploads', '--retry-failed', stdout=io.StringIO())
+        book.refresh_from_db()
+        self.assertEqual(book.processing_status, 'ready')
+
+
+@override_settings(BOOK_PROCESSING='queue', BOOK_UPLOAD_ROOT='')
+class ResumableUploadTests(BlobStoreTestCase):
+    data = b'%PDF-1.4 ' + b'x' * 31
+
+    def setUp(self):
+        super().setUp()
+        User.objects.create_user(username='author', password='password', role='author')
+        self.client.login(username='author', password='password')
+        resp = self.client.post(reverse('book_upload_create'), {'file_name': 'big.pdf', 'size': len(self.data)})
+        self.assertEqual(resp.status_code, 201)
+        self.session = resp.json()
+
+    def put(self, offset, part, checksum=None):
+        return self.client.put(
+            self.session['url'], part, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset), HTTP_UPLOAD_CHECKSUM=checksum or hashlib.sha256(part).hexdigest(),
+        )
+
+    def test_parts_resume_and_attach_to_a_book(self):
+        self.assertEqual(self.put(0, self.data[:20]).json()['offset'], 20)
+        # a retried part that already arrived is answered with the current offset
+        resp = self.put(0, self.data[:20])
+        self.assertEqual((resp.status_code, resp.json()['offset']), (409, 20))
+        resp = self.put(20, self.data[20:], checksum='0' * 64)
+        self.assertEqual((resp.status_code, resp.json()['offset']), (400, 20))
+        self.assertEqual(self.client.get(self.session['url']).json()['offset'], 20)
+
+        self.put(20, self.data[20:])
+        resp = self.client.post(reverse('book_upload_complete', args=[self.session['id']]))
+        self.assertEqual(resp.json()['status'], 'complete')
+
+        self.client.post(reverse('book_add'), {
+            'title': 'Chunked', 'original_author': 'Original', 'description': 'd', 'genre': 'fiction',
+            'language': 'English', 'publication_date': '2024-01-01', 'availability': 'borrow',
+            'upload_id': self.session['id'],
+        })
+        book = Book.objects.get(title='Chunked')
+        self.assertEqual(book.file_digest, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(book.processing_status, 'pending')
+        with BookFile(book).open() as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(UploadSession.objects.get(pk=self.session['id']).status, 'attached')
+
+    def test_late_requests_cannot_overwrite_a_stored_part(self):
+        stale = UploadSession.objects.get(pk=self.session['id'])
+        self.put(0, self.data[:20])
+        # a retry or concurrent request that read the session before the part was counted
+        rogue = b'X' * 20
+        with self.assertRaises(UploadConflict):
+            append_part(stale, 0, io.BytesIO(rogue), 20, hashlib.sha256(rogue).hexdigest())
+        stale.received = 0
+        with self.assertRaises(UploadError):
+            append_part(stale, 0, io.BytesIO(rogue), 20, '0' * 64)
+        self.put(20, self.data[20:])
+        self.client.post(reverse('book_upload_complete', args=[self.session['id']]))
+        session = UploadSession.objects.get(pk=self.session['id'])
+        self.assertEqual(session.file_digest, hashlib.sha256(self.data).hexdigest())
+        self.assertFalse(parts_dir(session).exists())
+
+    def test_whole_file_checksum_is_checked_on_completion(self):
+        resp = self.client.post(reverse('book_upload_create'), {
+            'file_name': 'big.pdf', 'size': len(self.data), 'sha256': '0' * 64,
+        })
+        self.session = resp.json()
+        self.put(0, self.data)
+        resp = self.client.post(reverse('book_upload_complete', args=[self.session['id']]))
+        self.assertEqual(resp.status_code, 400)
+
+    def test_incomplete_uploads_cannot_be_completed(self):
+        self.put(0, self.data[:10])
+        resp = self.client.post(reverse('book_upload_complete', args=[self.session['id']]))
+        self.assertEqual(resp.status_code, 400)
+
+    def test_sessions_belong_to_their_user(self):
+        User.objects.create_user(username='other', password='password', role='author')
+        self.client.login(username='other', password='password')
+        self.assertEqual(self.client.get(self.session['url']).status_code, 404)
+
+    def test_prune_removes_abandoned_uploads(self):
+        session = UploadSession.objects.get(pk=self.session['id'])
+        self.put(0, self.data[:10])
+        self.assertTrue(parts_dir(session).exists())
+        UploadSession.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        call_command('prune_uploads', stdout=io.StringIO())
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(parts_dir(session).exists())
+
+
+class OffloadedDeliveryTests(BlobStoreTestCase):
+    def setUp(self):
+        super().setUp()
+        author = User.objects.create_user(username='author', password='password', role='author')
+        User.objects.create_user(username='reader', password='password', role='reader')
+        self.book = create_book(author, availability='download')
+        self.book.attach_file(SimpleUploadedFile('book.pdf', b'%PDF-1.4 offload', content_type='application/pdf'))
+        self.book.save()
+        self.client.login(username='reader', password='password')
+        self.url = reverse('book_download', args=[self.book.pk])
+
+    @override_settings(BOOK_FILE_DELIVERY='nginx', BOOK_ACCEL_BLOB_PREFIX='/protected/blobs/')
+    def test_nginx_mode_sets_accel_redirect(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['X-Accel-Redirect'], f'/protected/blobs/{self.book.file_ref}')
+        self.assertNotIn('X-Sendfile', resp)
+        self.assertEqual(resp.content, b'')
+        self.assertEqual(resp['Content-Type'], 'application/pdf')
+        self.assertIn('attachment', resp['Content-Disposition'])
+        self.assertEqual(self.book.downloads.count(), 1)
+
+    @override_settings(BOOK_FILE_DELIVERY='apache')
+    def test_apache_mode_sets_sendfile_path(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['X-Sendfile'], get_blob_store().path(self.book.file_ref))
+        self.assertNotIn('X-Accel-Redirect', resp)
+        self.client.get(self.url, HTTP_RANGE='bytes=5-')
+        self.assertEqual(self.book.downloads.count(), 1)
+
+    @override_settings(BOOK_FILE_DELIVERY='nginx')
+    def test_database_blob_falls_back_to_streaming(self):
+        Book.objects.filter(pk=self.book.pk).update(file_ref=None, file_blob=b'%PDF-1.4 legacy')
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('X-Accel-Redirect', resp)
+        self.assertEqual(b''.join(resp.streaming_content), b'%PDF-1.4 legacy')
+
+
+class BookSearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author', password='password', role='author', first_name='Jane', last_name='Writer')
+        self.in_title = create_book(self.author, title='Dragon Tales', description='Stories for children', genre='fantasy')
+        self.in_description = create_book(self.author, title='Mountain Life', description='A dragon appears once', genre='fiction')
+        create_book(self.author, title='Unrelated', description='Nothing here')
+
+    def search(self, **params):
+        return list(self.client.get(reverse('book_search'), params).context['books'])
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search(query='dragon'), [self.in_title, self.in_description])
+
+    def test_prefix_and_author_name_matching(self):
+        self.assertEqual(self.search(query='drag'), [self.in_title, self.in_description])
+        self.assertEqual(len(self.search(query='writer')), 3)
+
+    def test_filters_apply_to_ranked_results(self):
+        self.assertEqual(self.search(query='dragon', genre='fiction'), [self.in_description])
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        create_book(self.author, title='Escaping', description='<b>griffin</b> and friends')
+        book = self.search(query='griffin')[0]
+        self.assertIn('<mark>griffin</mark>', book.search_snippet)
+        self.assertIn('&lt;b&gt;', book.search_snippet)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.in_title.title = 'Wyvern Tales'
+        self.in_title.save()
+        self.assertEqual(self.search(query='wyvern'), [self.in_title])
+        self.in_title.delete()
+        self.assertEqual(self.search(query='wyvern'), [])
+
+    def test_rebuild_search_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM books_book_fts')
+        self.assertEqual(self.search(query='dragon'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.search(query='dragon'), [self.in_title, self.in_description])
+
+
+class SearchFacetTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author', password='password', role='author')
+        create_book(author, title='Mystery One', genre='mystery', availability='borrow')
+        create_book(author, title='Mystery Two', genre='mystery', availability='download', language='French')
+        create_book(author, title='Poems', genre='poetry', availability='borrow')
+
+    def facets(self, response):
+        genres = {value: count for value, _, count, _ in response.context['genre_facets']}
+        availability = {value: count for value, _, count, _ in response.context['availability_facets']}
+        return genres, availability, dict(response.context['language_facets'])
+
+    def test_counts_ignore_their_own_dimension(self):
+        resp = self.client.get(reverse('book_search'), {'genre': 'mystery'})
+        genres, availability, languages = self.facets(resp)
+        self.assertEqual(len(resp.context['books']), 2)
+        # other genres are still counted so the user can widen the selection
+        self.assertEqual(genres['mystery'], 2)
+        self.assertEqual(genres['poetry'], 1)
+        self.assertEqual(availability, {'borrow': 1, 'download': 1, 'both': 0, 'unavailable': 0})
+        self.assertEqual(languages, {'English': 1, 'French': 1})
+        self.assertContains(resp, 'Mystery (2)')
+
+    def test_facets_are_cached_per_normalized_query(self):
+        self.client.get(reverse('book_search'), {'genre': ['poetry', 'mystery']})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('book_search'), {'genre': ['mystery', 'poetry']})
+        grouped = [q for q in ctx.captured_queries if 'GROUP BY' in q['sql']]
+        self.assertEqual(grouped, [])
+
+    def test_phrase_search_keys_facets_on_the_phrase(self):
+        phrase, terms = BasicSearchBackend(), SQLiteFTSBackend()
+        self.assertNotEqual(normalize_filters(phrase, 'Mystery One'), normalize_filters(phrase, 'one mystery'))
+        self.assertEqual(normalize_filters(phrase, 'Mystery One'), normalize_filters(phrase, 'mystery one'))
+        self.assertEqual(normalize_filters(terms, 'Mystery One'), normalize_filters(terms, 'one, mystery'))
+
+    def test_book_changes_invalidate_cached_facets(self):
+        self.client.get(reverse('book_search'))
+        book = Book.objects.get(title='Poems')
+        book.genre = 'mystery'
+        book.save()
+        genres, _, _ = self.facets(self.client.get(reverse('book_search')))
+        self.assertEqual(genres['mystery'], 3)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password', role='author')
+        for i in range(30):
+            create_book(self.author, title=f'Dragon {i:02d}', description='dragon ' * (i % 4 + 1))
+        # ties on created_at must be broken by id, not skipped or repeated
+        Book.objects.filter(pk__in=list(Book.objects.values_list('pk', flat=True)[:10])).update(
+            created_at=timezone.now())
+
+    def walk(self, url, params):
+        pages, resp = [], self.client.get(url, params)
+        while True:
+            page = resp.context['page_obj']
+            pages.append([book.pk for book in page])
+            if not page.has_next():
+                return pages, page
+            resp = self.client.get(url + page.next_url)
+
+    def test_pages_cover_every_book_once_in_order(self):
+        pages, last = self.walk(reverse('book_list'), {})
+        expected = list(Book.objects.approved().order_by('-created_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual(sum(pages, []), expected)
+
+        resp = self.client.get(reverse('book_list') + last.previous_url)
+        self.assertEqual([book.pk for book in resp.context['page_obj']], pages[-2])
+        self.assertTrue(resp.context['page_obj'].has_previous())
+
+    def test_search_pages_keep_relevance_order_and_filters(self):
+        pages, _ = self.walk(reverse('book_search'), {'query': 'dragon', 'genre': 'fiction'})
+        results = get_search_backend().search(Book.objects.approved(), 'dragon').order_by('search_rank', 'pk')
+        expected = [book.pk for book in results]
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_deep_pages_skip_offset_and_count(self):
+        resp = self.client.get(reverse('book_list'))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('book_list') + resp.context['page_obj'].next_url)
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        first = self.client.get(reverse('book_list')).context['page_obj']
+        resp = self.client.get(reverse('book_list'), {'cursor': 'bogus:cursor'})
+        self.assertEqual(list(resp.context['page_obj']), list(first))
+        self.assertFalse(resp.context['page_obj'].has_previous())
+
+
+class WishlistAvailabilityTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password', role='author')
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        self.book = create_book(self.author, status='pending')
+        self.readers = [User.objects.create_user(username=f'reader{i}', password='password') for i in range(3)]
+        BookWishlist.objects.bulk_create([BookWishlist(user=reader, book=self.book) for reader in self.readers])
+        self.client.login(username='admin', password='password')
+
+    def moderate(self, action):
+        self.client.post(reverse('admin_book_requests'), {'book_id': self.book.pk, 'action': action})
+
+    def notified(self):
+        call_command('process_notification_jobs', stdout=io.StringIO())
+        return sorted(Notification.objects.filter(notification_type='book_available').values_list('user__username', flat=True))
+
+    def test_approval_notifies_wishlist_holders_once(self):
+        self.moderate('approve')
+        self.assertEqual(self.notified(), ['reader0', 'reader1', 'reader2'])
+        self.moderate('reject')
+        self.moderate('approve')
+        self.assertEqual(len(self.notified()), 3)
+
+    @override_settings(NOTIFICATION_DISPATCH='inline')
+    def test_approval_request_only_queues_the_fan_out(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.moderate('approve')
+        self.assertFalse([q for q in ctx.captured_queries if 'core_notification"' in q['sql']])
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(NotificationJob.objects.get().status, 'pending')
+
+    def test_return_notifies_everyone_but_the_returning_reader(self):
+        from apps.borrowing.models import BorrowRequest
+
+        self.book.status = 'approved'
+        self.book.save()
+        borrow = BorrowRequest.objects.create(reader=self.readers[0], book=self.book, status='approved')
+        borrow.return_book()
+        borrow.return_book()
+        self.assertEqual(self.notified(), ['reader1', 'reader2'])
+
+
+class FeaturedBooksTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='password', role='author')
+        self.lucky = create_book(self.author, title='One Review', rating_count=1, rating_sum=5, rating_avg=5.0)
+        self.loved = create_book(self.author, title='Many Reviews', rating_count=20, rating_sum=94, rating_avg=4.7)
+        create_book(self.author, title='Unrated')
+        create_book(self.author, title='Panned', rating_count=10, rating_sum=20, rating_avg=2.0)
+        create_book(self.author, title='Hidden', status='pending', rating_count=50, rating_sum=250, rating_avg=5.0)
+
+    def test_bayesian_average_outweighs_a_single_review(self):
+        titles = [book.title for book in compute_featured_books()]
+        self.assertEqual(titles, ['Many Reviews', 'One Review', 'Unrated', 'Panned'])
+
+    def test_landing_page_reads_the_cached_list(self):
+        refresh_featured_books()
+        User.objects.create_user(username='reader', password='password')
+        self.client.login(username='reader', password='password')
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('home'))
+        self.assertContains(resp, 'Many Reviews')
+        self.assertFalse([q for q in ctx.captured_queries if 'books_book' in q['sql']])
+
+    def test_a_cache_miss_does_not_rank_on_the_request_path(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(get_featured_books(), [])
+        self.assertFalse([q for q in ctx.captured_queries if 'books_book' in q['sql']])
+
+    def test_reviews_refresh_the_cached_list(self):
+        refresh_featured_books()
+        User.objects.create_user(username='reader', password='password')
+        self.client.login(username='reader', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('review_add', args=[self.lucky.pk]), {'rating': 5, 'title': 't', 'content': 'c'})
+        cached = {book.title: book.rating_count for book in cache.get(FEATURED_CACHE_KEY)}
+        self.assertEqual(cached['One Review'], 2)
+
+    def test_refresh_command_fills_the_shared_cache(self):
+        from django.core.cache import caches
+        from django.core.cache.backends.locmem import LocMemCache
+
+        # the command runs in its own process, so a per-process cache would never reach the web workers
+        self.assertNotIsInstance(caches['default'], LocMemCache)
+        call_command('refresh_featured_books', stdout=io.StringIO())
+        self.assertEqual([book.title for book in cache.get(FEATURED_CACHE_KEY)][0], 'Many Reviews')
+
+
+class CatalogImportTests(TestCase):
+    CSV = (
+        'title,original_author,genre,publication_date,isbn,pages\n'
+        'New Book,Someone,fiction,2001-02-03,978-0-00-000001-1,120\n'
+        'Bad Date,Someone,fiction,03/02/2001,,\n'
+        'Same Isbn,Someone,fiction,2001-02-03,9780000000011,\n'
+        'Existing Title,Someone,fiction,2001-02-03,,\n'
+        'Already Listed,Someone,fiction,2001-02-03,111,\n'
+        'Untitled Genre,Someone,cookery,2001-02-03,,\n'
+    )
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        create_book(self.admin, title='Existing Title')
+        create_book(self.admin, title='Something Else', isbn='111')
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            f.write(data)
+        return path
+
+    def report(self, path):
+        with open(f'{path}.report.jsonl', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_csv_rows_are_validated_deduplicated_and_inserted(self):
+        path = self.write('books.csv', self.CSV)
+        call_command('import_catalog', path, '--chunk-size', '4', stdout=io.StringIO())
+
+        book = Book.objects.get(title='New Book')
+        self.assertEqual(
+            (book.isbn, book.pages, book.author, book.status), ('9780000000011', 120, self.admin, 'approved'),
+        )
+        self.assertEqual(Book.objects.count(), 3)
+        report = self.report(path)
+        self.assertEqual(report[-1]['summary']['inserted'], 1)
+        self.assertEqual(report[-1]['summary']['duplicates'], 3)
+        errors = {row['line']: row['reason'] for row in report if row.get('status') == 'error'}
+        self.assertEqual(set(errors), {3, 7})
+        self.assertIn('publication_date', errors[3])
+        self.assertEqual([b.pk for b in get_search_backend().search(Book.objects.all(), 'new book')], [book.pk])
+
+    def test_reimporting_a_book_added_in_the_ui_is_a_duplicate(self):
+        self.client.login(username='admin', password='password')
+        self.client.post(reverse('book_add'), {
+            'title': 'Typed In', 'original_author': 'Someone', 'description': 'd', 'genre': 'fiction',
+            'language': 'English', 'publication_date': '2001-02-03', 'isbn': '978-0-00-000002-8',
+            'availability': 'unavailable',
+        })
+        self.assertEqual(Book.objects.get(title='Typed In').isbn, '9780000000028')
+        path = self.write('books.csv', 'title,publication_date,isbn\nTyped In Again,2001-02-03,978 0 00 000002 8\n')
+        call_command('import_catalog', path, stdout=io.StringIO())
+        self.assertFalse(Book.objects.filter(title='Typed In Again').exists())
+        self.assertEqual(self.report(path)[-1]['summary']['duplicates'], 1)
+
+    def test_dry_run_writes_nothing(self):
+        rows = [{'title': f'Book {i % 3}', 'publication_date': '2001-02-03'} for i in range(6)]
+        path = self.write('books.jsonl.gz', ''.join(json.dumps(row) + '\n' for row in rows))
+        call_command('import_catalog', path, '--dry-run', '--chunk-size', '2', stdout=io.StringIO())
+        self.assertEqual(Book.objects.count(), 2)
+        summary = self.report(path)[-1]['summary']
+        self.assertEqual((summary['inserted'], summary['duplicates'], summary['dry_run']), (3, 3, True))
+
+
+class CatalogExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        self.reader = User.objects.create_user(username='reader', password='password')
+        self.book = create_book(self.admin, title='Exported, "quoted"', isbn='123')
+        create_book(self.admin, title='Second')
+
+    def test_admin_streams_csv(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_export', args=['books', 'csv']))
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['title'] for row in rows], ['Exported, "quoted"', 'Second'])
+        self.assertEqual(rows[0]['author__username'], 'admin')
+        self.assertNotIn('file_blob', rows[0])
+
+    def test_csv_cells_cannot_start_formulas(self):
+        create_book(self.admin, title='=HYPERLINK("http://example.com")', isbn='-5', pages=-1)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_export', args=['books', 'csv']))
+        row = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))[-1]
+        self.assertEqual((row['title'], row['isbn']), ('\'=HYPERLINK("http://example.com")', "'-5"))
+        # numbers are not text, so a spreadsheet reads them as values
+        self.assertEqual(row['pages'], '-1')
+        response = self.client.get(reverse('admin_export', args=['books', 'jsonl']))
+        self.assertEqual(json.loads(b''.join(response.streaming_content).splitlines()[-1])['isbn'], '-5')
+
+    def test_gzipped_jsonl_uses_bounded_queries(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin_export', args=['books', 'jsonl']) + '?gzip=1')
+            data = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = [json.loads(line) for line in data.decode().splitlines()]
+        self.assertEqual((rows[0]['id'], rows[0]['isbn']), (self.book.pk, '123'))
+        self.assertEqual(len([q for q in queries if 'books_book' in q['sql'] and 'title' in q['sql']]), 1)
+
+    def test_readers_and_unknown_datasets_are_refused(self):
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(reverse('admin_export', args=['books', 'csv'])).status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('admin_export', args=['users', 'csv'])).status_code, 404)
+
+    def test_command_writes_file(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        path = os.path.join(tmp, 'books.csv.gz')
+        call_command('export_catalog', 'books', '--gzip', '--output', path, '--chunk-size', '1',
+                     stderr=io.StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 2)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        from apps.borrowing.models import BorrowRequest
+
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        self.a, self.b, self.c, self.d = [create_book(self.admin, title=title) for title in 'ABCD']
+        r1, r2, r3, crawler = [User.objects.create_user(username=f'r{i}', password='password') for i in range(4)]
+        self.borrow = BorrowRequest.objects.create(reader=r1, book=self.a, status='approved')
+        BookDownload.objects.create(user=r1, book=self.b)
+        BookWishlist.objects.create(user=r2, book=self.a)
+        ReadingHistory.objects.create(user=r2, book=self.b)
+        BookDownload.objects.create(user=r2, book=self.c)
+        BorrowRequest.objects.create(reader=r3, book=self.c, status='borrowed')
+        BorrowRequest.objects.create(reader=r3, book=self.d, status='rejected')
+        for book in (self.a, self.b, self.c, self.d):
+            BookDownload.objects.create(user=crawler, book=book)
+
+    def build(self):
+        call_command('build_recommendations', '--max-user-items', '3', stdout=io.StringIO())
+
+    def test_neighbours_are_weighted_cosine_similarities(self):
+        self.build()
+        neighbors = list(BookNeighbor.objects.filter(book=self.a).order_by('-score'))
+        self.assertEqual([n.neighbor for n in neighbors], [self.b, self.c])
+        # A = (borrow 3, wishlist 1), B = (download 2, reading 2), C = (download 2, borrow 3) over r1, r2, r3
+        self.assertAlmostEqual(neighbors[0].score, 8 / (10 ** 0.5 * 8 ** 0.5), places=5)
+        self.assertAlmostEqual(neighbors[1].score, 2 / (10 ** 0.5 * 13 ** 0.5), places=5)
+        # the crawler and the rejected request are ignored
+        self.assertFalse(BookNeighbor.objects.filter(neighbor=self.d).exists())
+
+    def test_detail_page_reads_neighbours_in_one_query(self):
+        self.build()
+        self.c.status = 'pending'
+        self.c.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(list(similar_books(self.a)), [self.b])
+        response = self.client.get(reverse('book_detail', args=[self.a.pk]))
+        self.assertContains(response, 'Readers Also Borrowed')
+        self.assertEqual(list(response.context['similar_books']), [self.b])
+
+    def test_rebuild_drops_stale_neighbours(self):
+        self.build()
+        self.borrow.delete()
+        BookWishlist.objects.all().delete()
+        self.build()
+        self.assertFalse(BookNeighbor.objects.filter(book=self.a).exists())
+        self.assertTrue(BookNeighbor.objects.filter(book=self.b, neighbor=self.c).exists())
+
+
+class ReaderFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        self.reader = User.objects.create_user(username='reader', password='password', role='reader')
+        self.other = User.objects.create_user(username='other', password='password', role='reader')
+        self.mystery = create_book(self.admin, title='Mystery', genre='mystery')
+        self.read_mystery = create_book(self.admin, title='Read Mystery', genre='mystery')
+        self.popular = create_book(self.admin, title='Popular', genre='fiction')
+        self.unlisted = create_book(self.admin, title='Unlisted', genre='mystery', status='pending')
+        for user in (self.reader, self.other):
+            BookDownload.objects.create(user=user, book=self.popular)
+        ReadingHistory.objects.create(user=self.reader, book=self.read_mystery)
+        FavoriteGenre.objects.create(user=self.reader, genre='mystery')
+
+    def feed_titles(self):
+        self.reader.refresh_from_db()
+        return [entry.book.title for entry in feed_entries(self.reader).order_by('rank')]
+
+    def test_feed_prefers_favourite_genres_and_skips_known_books(self):
+        call_command('build_feeds', stdout=io.StringIO())
+        self.assertEqual(self.feed_titles(), ['Mystery'])
+        other_feed = FeedEntry.objects.filter(user=self.other).order_by('rank')
+        # no history left to go by but what is popular
+        self.assertEqual([entry.book for entry in other_feed], [self.mystery, self.read_mystery])
+
+    def test_favourite_genre_outranks_a_more_popular_book(self):
+        fan = User.objects.create_user(username='fan', password='password', role='reader')
+        FavoriteGenre.objects.create(user=fan, genre='poetry')
+        quiet = create_book(self.admin, title='Quiet Poems', genre='poetry')
+        bestseller = create_book(self.admin, title='Bestseller', genre='fiction')
+        BookDownload.objects.bulk_create([BookDownload(user=self.other, book=bestseller) for _ in range(50)])
+        call_command('build_feeds', stdout=io.StringIO())
+        feed = [entry.book for entry in FeedEntry.objects.filter(user=fan).order_by('rank')]
+        self.assertLess(feed.index(quiet), feed.index(bestseller))
+
+    def test_page_is_one_indexed_read(self):
+        call_command('build_feeds', stdout=io.StringIO())
+        self.reader.refresh_from_db()
+        request = RequestFactory().get('/books/reader/for-you/')
+        with self.assertNumQueries(1):
+            page = CursorPaginator(feed_entries(self.reader), 12, ['rank']).get_page(request)
+            self.assertEqual([entry.book.title for entry in page], ['Mystery'])
+
+    def test_activity_invalidates_feed(self):
+        call_command('build_feeds', stdout=io.StringIO())
+        BookWishlist.objects.create(user=self.reader, book=self.mystery)
+        self.reader.refresh_from_db()
+        self.assertIsNone(self.reader.feed_built_at)
+        # the stale rows are served without rebuilding during the request
+        with self.assertNumQueries(1):
+            self.assertEqual([entry.book.title for entry in feed_entries(self.reader)], ['Mystery'])
+        self.assertIsNone(User.objects.get(pk=self.reader.pk).feed_built_at)
+        call_command('build_feeds', '--stale', stdout=io.StringIO())
+        self.assertEqual(self.feed_titles(), [])
+        self.assertIsNotNone(self.reader.feed_built_at)
+
+    def test_profile_saves_favourite_genres(self):
+        self.client.force_login(self.reader)
+        response = self.client.post(reverse('profile_edit'), {
+            'first_name': 'Rea', 'last_name': 'Der', 'email': 'reader@example.com',
+            'favorite_genres': ['fantasy', 'poetry'],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(FavoriteGenre.objects.filter(user=self.reader).values_list('genre', flat=True)), {'fantasy', 'poetry'},
+        )
+        self.assertContains(self.client.get(reverse('reader_feed')), 'being prepared')
+        call_command('build_feeds', '--stale', stdout=io.StringIO())
+        self.assertContains(self.client.get(reverse('reader_feed')), 'Mystery')
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        from apps.borrowing.models import BorrowRequest
+
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        self.reader = User.objects.create_user(username='reader', password='password')
+        self.hot = create_book(self.admin, title='Hot', genre='mystery')
+        self.warm = create_book(self.admin, title='Warm', genre='fiction')
+        self.cold = create_book(self.admin, title='Cold', genre='mystery')
+        self.loan = BorrowRequest.objects.create(reader=self.reader, book=self.hot)
+
+    def test_downloads_and_approvals_are_counted_and_decayed(self):
+        now = timezone.now()
+        BookDownload.objects.create(user=self.reader, book=self.hot)
+        self.loan.approve_request()
+        record_activity(self.warm.pk, when=now - timedelta(hours=72))
+        record_activity(self.warm.pk, count=2, when=now - timedelta(hours=72))
+        record_activity(self.cold.pk, when=now - timedelta(days=20))
+        self.assertEqual(BookActivityBucket.objects.get(book=self.hot).count, 2)
+
+        self.assertEqual(refresh_trending(now), {'buckets': 3, 'books': 3, 'events': 6})
+        hot, warm = Book.objects.get(pk=self.hot.pk), Book.objects.get(pk=self.warm.pk)
+        # three events one half-life ago weigh 1.5 of the two from this hour
+        self.assertAlmostEqual(warm.trending_score / hot.trending_score, 0.75, places=5)
+        # twenty days on, Cold no longer counts as trending
+        self.assertEqual(get_trending_books(), [self.hot, self.warm])
+        self.assertEqual(get_trending_books('mystery'), [self.hot])
+
+    def test_refresh_reads_only_new_events(self):
+        record_activity(self.hot.pk)
+        refresh_trending()
+        score = Book.objects.get(pk=self.hot.pk).trending_score
+        self.assertEqual(refresh_trending()['buckets'], 0)
+
+        record_activity(self.hot.pk)
+        record_activity(self.warm.pk)
+        self.assertEqual(refresh_trending(), {'buckets': 2, 'books': 2, 'events': 2})
+        self.assertAlmostEqual(Book.objects.get(pk=self.hot.pk).trending_score, 2 * score, places=5)
+        self.assertFalse(BookActivityBucket.objects.filter(pending__gt=0).exists())
+
+    def test_epoch_is_moved_forward_without_changing_ranking(self):
+        record_activity(self.hot.pk)
+        refresh_trending()
+        state = TrendingState.objects.get()
+        state.epoch -= timedelta(days=365)
+        state.save()
+        Book.objects.filter(pk=self.hot.pk).update(trending_score=1e40)
+        refresh_trending()
+        state.refresh_from_db()
+        self.assertLess(timezone.now() - state.epoch, timedelta(hours=1))
+        self.assertLess(Book.objects.get(pk=self.hot.pk).trending_score, 1e40)
+
+    def test_home_and_genre_pages_list_trending_books(self):
+        record_activity(self.hot.pk)
+        refresh_trending()
+        self.client.force_login(self.reader)
+        self.assertContains(self.client.get(reverse('home')), 'Trending This Week')
+        response = self.client.get(reverse('book_search'), {'genre': 'mystery'})
+        self.assertContains(response, 'Trending This Week in Mystery')
+        self.assertEqual(response.context['trending_books'], [self.hot])
@@ -0,0 +1,137 @@
+"""
+Trending books. Every borrow approval and download adds one to the book's
+BookActivityBucket for the current hour, and `manage.py refresh_trending`
+folds the new counts into Book.trending_score.
+
+An event's weight halves every TRENDING_HALF_LIFE_HOURS. Rather than
+decaying every score on each refresh, an event at hour t is stored with
+weight e^(rate * (t - epoch)): all scores would shrink by the same factor
+as time passes, so the stored values already rank books exactly as the
+decayed ones do. A refresh therefore touches only the buckets with
+pending events and the books they belong to, however long the history.
+When the weights get large the epoch is moved forward, rescaling all
+stored scores in one UPDATE.
+"""
+
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Book, BookActivityBucket, TrendingState
+
+CACHE_KEY = 'trending_books:{genre}'
+
+# Rescale once e^(rate * hours since epoch) passes e^REBASE_EXPONENT; far below float overflow
+REBASE_EXPONENT = 50
+
+
+def decay_rate():
+    """Decay per hour."""
+    return math.log(2) / settings.TRENDING_HALF_LIFE_HOURS
+
+
+def hours_between(start, end):
+    return (end - start).total_seconds() / 3600
+
+
+def floor_hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def record_activity(book_id, count=1, when=None):
+    """Count `count` events for the book in the current hour's bucket."""
+    hour = floor_hour(when or timezone.now())
+    increment = {'count': F('count') + count, 'pending': F('pending') + count}
+    if BookActivityBucket.objects.filter(book_id=book_id, hour=hour).update(**increment):
+        return
+    try:
+        with transaction.atomic():
+            BookActivityBucket.objects.create(book_id=book_id, hour=hour, count=count, pending=count)
+    except IntegrityError:
+        # another request opened the bucket first
+        BookActivityBucket.objects.filter(book_id=book_id, hour=hour).update(**increment)
+
+
+def _rebase(state, now, rate):
+    epoch = floor_hour(now)
+    factor = math.exp(-rate * hours_between(state.epoch, epoch))
+    Book.objects.filter(trending_score__gt=0).update(trending_score=F('trending_score') * factor)
+    state.epoch = epoch
+
+
+def refresh_trending(now=None):
+    """
+    Add every bucket's pending events to its book's score. Returns counts of
+    the buckets, books and events folded in.
+    """
+    now = now or timezone.now()
+    rate = decay_rate()
+    with transaction.atomic():
+        state, _ = TrendingState.objects.select_for_update().get_or_create(
+            pk=1, defaults={'epoch': floor_hour(now)},
+        )
+        if rate * hours_between(state.epoch, now) > REBASE_EXPONENT:
+            _rebase(state, now, rate)
+
+        buckets = list(BookActivityBucket.objects.filter(pending__gt=0).values_list('pk', 'book_id', 'hour', 'pending'))
+        gains = defaultdict(float)
+        by_pending = defaultdict(list)
+        for pk, book_id, hour, pending in buckets:
+            gains[book_id] += pending * math.exp(rate * hours_between(state.epoch, hour))
+            by_pending[pending].append(pk)
+
+        scores = Book.objects.filter(pk__in=list(gains)).values_list('pk', 'trending_score')
+        Book.objects.bulk_update(
+            [Book(pk=pk, trending_score=score + gains[pk]) for pk, score in scores],
+            ['trending_score'], batch_size=500,
+        )
+        # subtract what was read, so events counted meanwhile stay pending
+        for pending, pks in by_pending.items():
+            BookActivityBucket.objects.filter(pk__in=pks).update(pending=F('pending') - pending)
+        BookActivityBucket.objects.filter(
+            hour__lt=now - timedelta(days=settings.TRENDING_BUCKET_RETENTION_DAYS), pending=0,
+        ).delete()
+
+        state.refreshed_at = now
+        state.save()
+    invalidate_trending_books()
+    return {
+        'buckets': len(buckets), 'books': len(gains), 'events': sum(pending for *_, pending in buckets),
+    }
+
+
+def stored_threshold(state, now):
+    """The stored score that a decayed score of TRENDING_MIN_SCORE corresponds to now."""
+    return settings.TRENDING_MIN_SCORE * math.exp(decay_rate() * hours_between(state.epoch, now))
+
+
+def compute_trending_books(genre=None, limit=None):
+    state = TrendingState.objects.filter(pk=1).first()
+    if state is None:
+        return []
+    books = Book.objects.cards().approved().select_related('author').filter(
+        trending_score__gte=stored_threshold(state, timezone.now()),
+    )
+    if genre:
+        books = books.filter(genre=genre)
+    return list(books.order_by('-trending_score', '-pk')[:limit or settings.TRENDING_BOOKS_COUNT])
+
+
+def get_trending_books(genre=None):
+    """The cached "trending this week" list, overall or for one genre."""
+    key = CACHE_KEY.format(genre=genre or 'all')
+    books = cache.get(key)
+    if books is None:
+        books = compute_trending_books(genre)
+        cache.set(key, books, settings.TRENDING_CACHE_TIMEOUT)
+    return books
+
+
+def invalidate_trending_books():
+    cache.delete_many([CACHE_KEY.format(genre=genre) for genre in ['all', *dict(Book.GENRE_CHOICES)]])
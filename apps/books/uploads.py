@@ -0,0 +1,178 @@
+"""
+Resumable uploads of book files. The client opens a session with the file's
+name and size, then sends the file in parts, each with the offset it
+starts at and its SHA-256. Each part is staged in a file of its own, only
+put in place once its offset has been claimed on the session row, so a
+duplicate or concurrent request can never overwrite bytes already counted.
+Completing the upload joins the parts, so the worker never holds more than
+one read buffer of the file in memory. A client whose connection drops asks
+the session for its offset and carries on from there.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .delivery import CHUNK_SIZE
+from .models import UploadSession
+from .storage import file_digest, get_blob_store
+
+ALLOWED_EXTENSIONS = ('.pdf', '.epub')
+
+
+class UploadError(Exception):
+    """The request doesn't fit the upload session; answered with 400."""
+
+
+class UploadConflict(UploadError):
+    """A part didn't start at the session's offset; answered with 409 so the client resumes."""
+
+    def __init__(self, received):
+        super().__init__(f'Expected a part starting at offset {received}')
+        self.received = received
+
+
+def upload_root():
+    # inside the blob store by default, so the joined file is renamed into place
+    return Path(settings.BOOK_UPLOAD_ROOT or Path(settings.BOOK_BLOB_ROOT) / '.partial')
+
+
+def parts_dir(session):
+    return upload_root() / str(session.pk)
+
+
+def part_path(session, offset):
+    # zero-padded so the parts sort in file order
+    return parts_dir(session) / f'{offset:012d}.part'
+
+
+def discard_parts(session):
+    shutil.rmtree(parts_dir(session), ignore_errors=True)
+
+
+def create_session(user, file_name, size, content_type='', expected_digest=''):
+    if not file_name.lower().endswith(ALLOWED_EXTENSIONS):
+        raise UploadError('Only PDF and EPUB files can be uploaded.')
+    if not 0 < size <= settings.BOOK_UPLOAD_MAX_BYTES:
+        raise UploadError(f'File size must be between 1 and {settings.BOOK_UPLOAD_MAX_BYTES} bytes.')
+    session = UploadSession.objects.create(
+        user=user, file_name=os.path.basename(file_name)[:255], size=size,
+        content_type=content_type[:100], expected_digest=expected_digest.lower(),
+    )
+    parts_dir(session).mkdir(parents=True, exist_ok=True)
+    return session
+
+
+def append_part(session, offset, stream, length, checksum):
+    """
+    Store `length` bytes read from `stream` as the part at `offset`. The part
+    is written to a temporary file and only counted once it matches
+    `checksum` (SHA-256 hex) and this request has moved the session's offset
+    past it; otherwise the temporary file is dropped.
+    """
+    if session.status != 'open':
+        raise UploadError('This upload is already complete.')
+    if offset != session.received:
+        raise UploadConflict(session.received)
+    if not 0 < length <= settings.BOOK_UPLOAD_PART_MAX_BYTES:
+        raise UploadError(f'Parts must be between 1 and {settings.BOOK_UPLOAD_PART_MAX_BYTES} bytes.')
+    if offset + length > session.size:
+        raise UploadError('Part goes past the declared file size.')
+
+    hasher = hashlib.sha256()
+    written = 0
+    parts_dir(session).mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=parts_dir(session), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while written < length:
+                chunk = stream.read(min(CHUNK_SIZE, length - written))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                f.write(chunk)
+                written += len(chunk)
+            if written != length or hasher.hexdigest() != checksum.lower():
+                raise UploadError('Part was incomplete or did not match its checksum.')
+            f.flush()
+            os.fsync(f.fileno())
+
+        # another request may have stored this part first; only one claims the offset
+        advanced = UploadSession.objects.filter(pk=session.pk, status='open', received=offset).update(
+            received=offset + length, updated_at=timezone.now(),
+        )
+        if not advanced:
+            session.refresh_from_db(fields=['received'])
+            raise UploadConflict(session.received)
+        os.replace(tmp_path, part_path(session, offset))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    session.received = offset + length
+    return session.received
+
+
+def join_parts(session):
+    """Join the parts into one file next to them. Returns (path, SHA-256 hex)."""
+    hasher = hashlib.sha256()
+    path = upload_root() / f'{session.pk}.joined'
+    offset = 0
+    with open(path, 'wb') as out:
+        while offset < session.size:
+            try:
+                part = open(part_path(session, offset), 'rb')
+            except FileNotFoundError:
+                out.close()
+                os.remove(path)
+                raise UploadError(f'The part at offset {offset} is missing; start the upload again.')
+            with part:
+                for chunk in iter(lambda: part.read(CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    offset += len(chunk)
+        out.flush()
+        os.fsync(out.fileno())
+    return path, hasher.hexdigest()
+
+
+def complete_session(session):
+    """Join the fully received parts and move the file into the blob store."""
+    if session.status != 'open':
+        return session
+    if session.received != session.size:
+        raise UploadError(f'Received {session.received} of {session.size} bytes.')
+    path, digest = join_parts(session)
+    if session.expected_digest and digest != session.expected_digest:
+        os.remove(path)
+        raise UploadError('The uploaded file does not match its checksum.')
+    session.file_ref, session.file_digest, _ = get_blob_store().save_file(path, digest)
+    discard_parts(session)
+    session.status = 'complete'
+    session.save(update_fields=['file_ref', 'file_digest', 'status', 'updated_at'])
+    return session
+
+
+def attach_session(book, session):
+    """Point the book at a completed upload, as Book.attach_file does for a form upload."""
+    book.file_ref = session.file_ref
+    book.file_digest = session.file_digest
+    book.file_size = session.size
+    book.file_name = session.file_name
+    book.file_mime = session.content_type or book.file_mime
+    book.file_blob = None
+    UploadSession.objects.filter(pk=session.pk).update(status='attached', updated_at=timezone.now())
+
+
+def prune_sessions(older_than):
+    """Delete sessions untouched for `older_than` (a timedelta) and their staging files. Returns the count."""
+    cutoff = timezone.now() - older_than
+    stale = UploadSession.objects.filter(updated_at__lt=cutoff)
+    for session in stale.filter(status='open').iterator():
+        discard_parts(session)
+    removed, _ = stale.delete()
+    return removed
@@ -7,17 +7,27 @@ urlpatterns = [
     path('<int:pk>/', views.BookDetailView.as_view(), name='book_detail'),
     path('add/', views.BookAddView.as_view(), name='book_add'),
     path('<int:pk>/edit/', views.BookEditView.as_view(), name='book_edit'),
+    path('uploads/', views.BookUploadCreateView.as_view(), name='book_upload_create'),
+    path('uploads/<uuid:upload_id>/', views.BookUploadView.as_view(), name='book_upload'),
+    path('uploads/<uuid:upload_id>/complete/', views.BookUploadCompleteView.as_view(), name='book_upload_complete'),
     path('<int:pk>/delete/', views.BookDeleteView.as_view(), name='book_delete'),
     path('<int:pk>/download/', views.BookDownloadView.as_view(), name='book_download'),
     # viewer & file streaming for borrowed books
     path('<int:pk>/view/', views.BookViewerView.as_view(), name='book_viewer'),
     path('<int:pk>/file/', views.BookFileView.as_view(), name='book_file'),
+    path('<int:pk>/pages/', views.BookPagesView.as_view(), name='book_pages'),
+    path('<int:pk>/pages/<int:number>/', views.BookPageView.as_view(), name='book_page'),
+    path('<int:pk>/chapters/', views.BookChaptersView.as_view(), name='book_chapters'),
+    path('<int:pk>/epub/', views.BookEpubResourceView.as_view(), name='book_epub'),
+    path('<int:pk>/epub/<path:href>', views.BookEpubResourceView.as_view(), name='book_epub_resource'),
     path('<int:pk>/wishlist-toggle/', views.WishlistToggleView.as_view(), name='wishlist_toggle'),
     path('author/books/', views.AuthorBooksView.as_view(), name='author_books'),
     path('author/dashboard/', views.AuthorDashboardView.as_view(), name='author_dashboard'),
     path('reader/dashboard/', views.ReaderDashboardView.as_view(), name='reader_dashboard'),
+    path('reader/for-you/', views.ReaderFeedView.as_view(), name='reader_feed'),
     path('admin/dashboard/', views.AdminDashboardView.as_view(), name='admin_dashboard'),
     path('admin/book-requests/', views.AdminBookRequestsView.as_view(), name='admin_book_requests'),
+    path('admin/export/<str:dataset>.<str:fmt>', views.AdminExportView.as_view(), name='admin_export'),
     path('admin/users/', views.AdminUsersView.as_view(), name='admin_users'),
     path('admin/role-requests/', views.AdminRoleRequestsView.as_view(), name='admin_role_requests'),
 ]
@@ -1,17 +1,44 @@
+import logging
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.db.models import Q, Count, Avg
-from django.core.paginator import Paginator
-from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotFound
-import io
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotFound, JsonResponse,
+    StreamingHttpResponse,
+)
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils import timezone
+from django.utils.http import content_disposition_header
 from apps.users.models import User, RoleChangeRequest
-from apps.books.models import Book, BookWishlist, ReadingHistory, BookDownload
+from apps.books.models import Book, BookWishlist, ReadingHistory, BookDownload, UploadSession
 from apps.reviews.models import Review
 from apps.borrowing.models import BorrowRequest
+from apps.core.models import NotificationJob
+from apps.core.pagination import CursorPaginator
+from apps.core.thumbnails import generate_variants
 from .forms import BookForm, BookSearchForm
+from .access import check_grant, issue_grant
+from .delivery import BookFile, deliver_file, is_first_transfer
+from .epub import EpubError, get_epub_index, read_entry
+from .exports import EXPORTS, FORMATS as EXPORT_FORMATS, export_filename, export_stream
+from .feed import feed_entries
+from .facets import apply_filters, get_facets, normalize_filters
+from .notifications import notify_book_available
+from .pages import BookPages, PageRenderError, get_page_renderer
+from .processing import queue_processing
+from .recommendations import similar_books
+from .trending import get_trending_books
+from .uploads import (
+    UploadConflict, UploadError, append_part, attach_session, complete_session, create_session, discard_parts,
+)
+from .search import get_search_backend
+
+logger = logging.getLogger(__name__)
 
 
 class BookListView(View):
@@ -19,11 +46,9 @@ class BookListView(View):
     paginate_by = 12
     
     def get(self, request):
-        books = Book.objects.filter(status='approved').select_related('author').prefetch_related('reviews')
+        books = Book.objects.filter(status='approved').select_related('author')
         
-        paginator = Paginator(books, self.paginate_by)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        page_obj = CursorPaginator(books, self.paginate_by, ['-created_at']).get_page(request)
         
         context = {
             'page_obj': page_obj,
@@ -39,44 +64,59 @@ class BookSearchView(View):
     def get(self, request):
         form = BookSearchForm(request.GET)
         books = Book.objects.filter(status='approved').select_related('author')
+        backend = get_search_backend()
+
+        query = request.GET.get('query', '').strip()
+        sort_by = request.GET.get('sort_by', '')
+        filters = normalize_filters(
+            backend,
+            query=query,
+            genres=request.GET.getlist('genre'),
+            availability=request.GET.getlist('availability'),
+            language=request.GET.get('language', ''),
+        )
+
+        if query:
+            # ranked by relevance unless the user picks another order
+            books = backend.search(books, query)
+
+        # counts for every facet value, computed before the facet filters narrow the results
+        facets = get_facets(books, filters)
+        books = apply_filters(books, filters)
+
+        if sort_by in dict(BookSearchForm.SORT_CHOICES) and sort_by != 'relevance':
+            ordering = [sort_by]
+        elif query and backend.ranked:
+            ordering = [backend.rank_ordering]
+        else:
+            ordering = ['-created_at']
         
-        if request.GET:
-            query = request.GET.get('query', '').strip()
-            genres = request.GET.getlist('genre')
-            availability = request.GET.getlist('availability')
-            language = request.GET.get('language', '').strip()
-            sort_by = request.GET.get('sort_by', '-created_at')
-            
-            if query:
-                books = books.filter(
-                    Q(title__icontains=query) |
-                    Q(description__icontains=query) |
-                    Q(original_author__icontains=query) |
-                    Q(author__first_name__icontains=query) |
-                    Q(author__last_name__icontains=query)
-                )
-            
-            if genres:
-                books = books.filter(genre__in=genres)
-            
-            if availability:
-                books = books.filter(availability__in=availability)
-            
-            if language:
-                books = books.filter(language__icontains=language)
-            
-            if sort_by:
-                books = books.order_by(sort_by)
-        
-        paginator = Paginator(books, self.paginate_by)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        page_obj = CursorPaginator(books, self.paginate_by, ordering).get_page(request)
+
+        if query:
+            snippets = backend.snippets(query, page_obj.object_list)
+            for book in page_obj.object_list:
+                book.search_snippet = snippets.get(book.pk)
         
         context = {
             'form': form,
             'page_obj': page_obj,
             'books': page_obj.object_list,
+            'genre_facets': [
+                (value, label, facets['genre'].get(value, 0), value in filters['genre'])
+                for value, label in Book.GENRE_CHOICES
+            ],
+            'availability_facets': [
+                (value, label, facets['availability'].get(value, 0), value in filters['availability'])
+                for value, label in Book.AVAILABILITY_CHOICES
+            ],
+            'language_facets': sorted(facets['language'].items(), key=lambda item: (-item[1], item[0])),
         }
+        genres = dict(Book.GENRE_CHOICES)
+        if len(filters['genre']) == 1 and filters['genre'][0] in genres and not query:
+            # browsing a single genre
+            context['trending_genre'] = genres[filters['genre'][0]]
+            context['trending_books'] = get_trending_books(filters['genre'][0])
         return render(request, self.template_name, context)
 
 
@@ -84,9 +124,8 @@ class BookDetailView(View):
     template_name = 'books/book_detail.html'
     
     def get(self, request, pk):
-        book = get_object_or_404(Book, pk=pk, status='approved')
+        book = get_object_or_404(Book.objects.with_details(), pk=pk, status='approved')
         reviews = book.reviews.all()
-        avg_rating = reviews.aggregate(Avg('rating'))['rating__avg']
         
         # Check if user has already reviewed
         user_review = None
@@ -94,9 +133,7 @@ class BookDetailView(View):
         in_wishlist = False
         if request.user.is_authenticated:
             user_review = reviews.filter(reviewer=request.user).first()
-            user_borrow_request = BorrowRequest.objects.filter(
-                reader=request.user,
-                book=book,
+            user_borrow_request = BorrowRequest.objects.between(request.user, book).filter(
                 status__in=['pending', 'approved', 'borrowed']
             ).first()
             in_wishlist = BookWishlist.objects.filter(user=request.user, book=book).exists()
@@ -104,11 +141,12 @@ class BookDetailView(View):
         context = {
             'book': book,
             'reviews': reviews,
-            'avg_rating': avg_rating,
+            'avg_rating': book.rating_avg if book.rating_count else None,
             'user_review': user_review,
-            'review_count': reviews.count(),
+            'review_count': book.rating_count,
             'user_borrow_request': user_borrow_request,
             'in_wishlist': in_wishlist,
+            'similar_books': similar_books(book),
         }
         return render(request, self.template_name, context)
 
@@ -131,18 +169,27 @@ class BookAddView(LoginRequiredMixin, UserPassesTestMixin, View):
             book = form.save(commit=False)
             book.author = request.user
             book.status = 'pending'
-            # Handle uploaded file (store in DB fields)
+            # Handle uploaded file (streamed into the blob store)
             upload = request.FILES.get('upload_file') or request.FILES.get('pdf_file')
             if upload:
                 try:
-                    content = upload.read()
-                    book.file_blob = content
-                    book.file_name = upload.name
-                    book.file_mime = getattr(upload, 'content_type', '')
-                except Exception:
-                    # ignore file storage problems and continue
-                    pass
+                    book.attach_file(upload)
+                except OSError:
+                    logger.exception('Could not store the file uploaded for a new book')
+                    form.add_error('upload_file', 'The file could not be stored. Please try again.')
+                    return render(request, self.template_name, {'form': form, 'action': 'Add'})
+            if not upload and form.cleaned_data.get('upload_id'):
+                # a file sent in parts through the resumable upload API
+                upload = completed_upload(request, form.cleaned_data['upload_id'])
+                if upload is None:
+                    form.add_error(None, 'The uploaded file has expired. Please upload it again.')
+                    return render(request, self.template_name, {'form': form, 'action': 'Add'})
+                attach_session(book, upload)
             book.save()
+            if upload:
+                queue_processing(book)
+            if book.cover_image and 'cover_image' in form.changed_data:
+                generate_variants(book.cover_image)
             messages.success(request, 'Book submitted for approval!')
             return redirect('author_books')
         return render(request, self.template_name, {'form': form, 'action': 'Add'})
@@ -158,28 +205,38 @@ class BookEditView(LoginRequiredMixin, UserPassesTestMixin, View):
         return book.author == self.request.user or self.request.user.is_admin_user()
     
     def get(self, request, pk):
-        book = get_object_or_404(Book, pk=pk)
+        book = get_object_or_404(Book.objects.with_details(), pk=pk)
         form = self.form_class(instance=book)
         return render(request, self.template_name, {'form': form, 'book': book, 'action': 'Edit'})
     
     def post(self, request, pk):
-        book = get_object_or_404(Book, pk=pk)
+        book = get_object_or_404(Book.objects.with_details(), pk=pk)
         form = self.form_class(request.POST, request.FILES, instance=book)
         if form.is_valid():
             book = form.save(commit=False)
             if book.status == 'rejected':
                 book.status = 'pending'
-            # Handle uploaded file (store in DB fields)
+            # Handle uploaded file (streamed into the blob store)
             upload = request.FILES.get('upload_file') or request.FILES.get('pdf_file')
             if upload:
                 try:
-                    content = upload.read()
-                    book.file_blob = content
-                    book.file_name = upload.name
-                    book.file_mime = getattr(upload, 'content_type', '')
-                except Exception:
-                    pass
+                    book.attach_file(upload)
+                except OSError:
+                    logger.exception('Could not store the file uploaded for book %s', book.pk)
+                    form.add_error('upload_file', 'The file could not be stored. Please try again.')
+                    return render(request, self.template_name, {'form': form, 'book': book, 'action': 'Edit'})
+            if not upload and form.cleaned_data.get('upload_id'):
+                # a file sent in parts through the resumable upload API
+                upload = completed_upload(request, form.cleaned_data['upload_id'])
+                if upload is None:
+                    form.add_error(None, 'The uploaded file has expired. Please upload it again.')
+                    return render(request, self.template_name, {'form': form, 'book': book, 'action': 'Edit'})
+                attach_session(book, upload)
             book.save()
+            if upload:
+                queue_processing(book)
+            if book.cover_image and 'cover_image' in form.changed_data:
+                generate_variants(book.cover_image)
             messages.success(request, 'Book updated successfully!')
             return redirect('book_detail', pk=book.pk)
         return render(request, self.template_name, {'form': form, 'book': book, 'action': 'Edit'})
@@ -199,11 +256,99 @@ class BookDeleteView(LoginRequiredMixin, UserPassesTestMixin, View):
         return redirect('author_books')
 
 
+class AuthorUploadMixin(LoginRequiredMixin, UserPassesTestMixin):
+    login_url = 'login'
+
+    def test_func(self):
+        return self.request.user.is_author() or self.request.user.is_admin_user()
+
+    def get_session(self, upload_id):
+        return get_object_or_404(UploadSession, pk=upload_id, user=self.request.user)
+
+
+def upload_state(session):
+    return {
+        'id': str(session.pk),
+        'url': reverse('book_upload', args=[session.pk]),
+        'offset': session.received,
+        'size': session.size,
+        'status': session.status,
+        'part_max_bytes': settings.BOOK_UPLOAD_PART_MAX_BYTES,
+    }
+
+
+def completed_upload(request, upload_id):
+    return UploadSession.objects.filter(pk=upload_id, user=request.user, status='complete').first()
+
+
+class BookUploadCreateView(AuthorUploadMixin, View):
+    """Open a resumable upload for a book file of the given name and size."""
+
+    def post(self, request):
+        try:
+            size = int(request.POST.get('size', ''))
+        except ValueError:
+            return JsonResponse({'error': 'size must be a whole number of bytes.'}, status=400)
+        try:
+            session = create_session(
+                request.user, request.POST.get('file_name', ''), size,
+                content_type=request.POST.get('content_type', ''),
+                expected_digest=request.POST.get('sha256', ''),
+            )
+        except UploadError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        return JsonResponse(upload_state(session), status=201)
+
+
+class BookUploadView(AuthorUploadMixin, View):
+    """
+    GET reports how much of the file has arrived; PUT appends the part in the
+    request body, which must start at Upload-Offset and hash to the SHA-256
+    given in Upload-Checksum.
+    """
+
+    def get(self, request, upload_id):
+        return JsonResponse(upload_state(self.get_session(upload_id)))
+
+    def put(self, request, upload_id):
+        session = self.get_session(upload_id)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return JsonResponse({'error': 'Upload-Offset and Content-Length are required.'}, status=400)
+        try:
+            append_part(session, offset, request, length, request.headers.get('Upload-Checksum', ''))
+        except UploadConflict as exc:
+            return JsonResponse({'error': str(exc), 'offset': exc.received}, status=409)
+        except UploadError as exc:
+            return JsonResponse({'error': str(exc), 'offset': session.received}, status=400)
+        return JsonResponse(upload_state(session))
+
+    def delete(self, request, upload_id):
+        session = self.get_session(upload_id)
+        discard_parts(session)
+        session.delete()
+        return JsonResponse({'deleted': True})
+
+
+class BookUploadCompleteView(AuthorUploadMixin, View):
+    """Assemble a fully received upload into the blob store, ready to attach to a book."""
+
+    def post(self, request, upload_id):
+        session = self.get_session(upload_id)
+        try:
+            complete_session(session)
+        except UploadError as exc:
+            return JsonResponse({'error': str(exc), 'offset': session.received}, status=400)
+        return JsonResponse(upload_state(session))
+
+
 class BookDownloadView(LoginRequiredMixin, View):
     login_url = 'login'
     
     def get(self, request, pk):
-        book = get_object_or_404(Book, pk=pk)
+        book = get_object_or_404(Book.objects.with_file(), pk=pk)
         
         # Allow download only when the book itself is marked available for download.
         # Borrow-approved users must use the online viewer and are not permitted
@@ -212,24 +357,31 @@ class BookDownloadView(LoginRequiredMixin, View):
             messages.error(request, 'This book is not available for download.')
             return redirect('book_detail', pk=book.pk)
 
-        # Log the download activity
-        BookDownload.objects.create(user=request.user, book=book)
-
-        # Serve the file from DB blob if present, otherwise fallback to FileField
-        if book.file_blob:
-            try:
-                bio = io.BytesIO(book.file_blob)
-                # FileResponse will stream the BytesIO
-                return FileResponse(bio, as_attachment=True, filename=book.file_name or f'{book.pk}.bin')
-            except Exception:
-                raise Http404("The requested file could not be served from the database.")
-
-        # Fallback to file system stored file
         try:
-            return FileResponse(book.pdf_file.open('rb'), as_attachment=True, filename=book.pdf_file.name.split('/')[-1])
-        except Exception:
+            response = deliver_file(request, BookFile(book), as_attachment=True)
+        except OSError:
             raise Http404("The requested file was not found on the server.")
 
+        # Log the download once per transfer, not for every resumed range or 304
+        if is_first_transfer(request, response):
+            BookDownload.objects.create(user=request.user, book=book)
+        return response
+
+
+def can_read_file(request, book):
+    """
+    Whether the user may read the book's file: through the viewer's access
+    grant, a current loan, or because the book is open for download.
+    """
+    # epub.js sends the grant as a header on the requests it makes for the book's parts
+    token = request.GET.get('grant') or request.headers.get('X-Book-Grant')
+    if check_grant(token, request.user, book.pk):
+        return True
+    today = timezone.now().date()
+    if BorrowRequest.objects.between(request.user, book).current(today).exists():
+        return True
+    return book.is_available_for_download()
+
 
 class BookViewerView(LoginRequiredMixin, View):
     """Simple endpoint rendering a viewer page for approved borrowings."""
@@ -237,13 +389,8 @@ class BookViewerView(LoginRequiredMixin, View):
     def get(self, request, pk):
         book = get_object_or_404(Book, pk=pk)
         today = timezone.now().date()
-        allowed = BorrowRequest.objects.filter(
-            book=book,
-            reader=request.user,
-            status__in=['approved', 'borrowed'],
-            due_date__gte=today,
-            returned_at__isnull=True,
-        ).exists()
+        loan = BorrowRequest.objects.between(request.user, book).current(today).only('pk', 'due_date').first()
+        allowed = loan is not None
 
         if not allowed and book.is_available_for_download():
             allowed = True
@@ -251,49 +398,190 @@ class BookViewerView(LoginRequiredMixin, View):
         if not allowed:
             return HttpResponseForbidden("You are not allowed to view this file.")
 
-        if not (book.pdf_file or book.file_blob):
+        if not book.has_file():
             return HttpResponseNotFound("No file available for this book.")
 
         # pass mime type to template so it can choose correct renderer
         mime = book.file_mime or ''
-        return render(request, 'books/book_viewer.html', {'book': book, 'mime': mime})
+        # the viewer's file requests carry this grant instead of repeating the checks above
+        grant = issue_grant(request.user, book, loan)
+        pages_url = None
+        if 'epub' not in mime and get_page_renderer() is not None:
+            pages_url = _with_grant(reverse('book_pages', args=[book.pk]), grant)
+        return render(request, 'books/book_viewer.html', {
+            'book': book, 'mime': mime, 'grant': grant, 'pages_url': pages_url,
+        })
 
 
 class BookFileView(LoginRequiredMixin, View):
     """Stream bytes of the book file with access checks."""
 
     def get(self, request, pk):
-        book = get_object_or_404(Book, pk=pk)
-        today = timezone.now().date()
-        allowed = BorrowRequest.objects.filter(
-            book=book,
-            reader=request.user,
-            status__in=['approved', 'borrowed'],
-            due_date__gte=today,
-            returned_at__isnull=True,
-        ).exists()
-
-        if not allowed and book.is_available_for_download():
-            allowed = True
+        book = get_object_or_404(Book.objects.with_file(), pk=pk)
 
-        if not allowed:
+        if not can_read_file(request, book):
             return HttpResponseForbidden("You are not allowed to access this file.")
 
-        if book.pdf_file:
-            f = book.pdf_file
-            data = f.read()
-            mime = book.file_mime or 'application/pdf'
-            filename = f.name.split('/')[-1]
-        elif book.file_blob:
-            data = book.file_blob
-            mime = book.file_mime or 'application/pdf'
-            filename = book.file_name or 'book'
-        else:
+        try:
+            return deliver_file(request, BookFile(book))
+        except OSError:
             return HttpResponseNotFound("No file stored for this book.")
 
-        response = HttpResponse(data, content_type=mime)
-        response['Content-Disposition'] = f'inline; filename="{filename}"'
+
+def book_pages(book):
+    """The server-rendered pages of a book's PDF, or None if they can't be produced."""
+    renderer = get_page_renderer()
+    if renderer is None:
+        return None
+    try:
+        book_file = BookFile(book)
+    except FileNotFoundError:
+        return None
+    if book_file.content_type != 'application/pdf':
+        return None
+    return BookPages(book_file, renderer)
+
+
+def _with_grant(url, grant):
+    return f'{url}?{urlencode({"grant": grant})}' if grant else url
+
+
+class BookPagesView(LoginRequiredMixin, View):
+    """Page count and URLs of a book's rendered pages, one window at a time."""
+    paginate_by = 20
+
+    def get(self, request, pk):
+        book = get_object_or_404(Book.objects.with_file(), pk=pk)
+        if not can_read_file(request, book):
+            return HttpResponseForbidden("You are not allowed to access this file.")
+
+        if get_page_renderer() is None:
+            # neither pdftoppm nor pypdf is installed; the viewer falls back to pdf.js
+            return JsonResponse({'error': 'No page renderer is installed on the server.'}, status=501)
+        pages = book_pages(book)
+        if pages is None:
+            return HttpResponseNotFound("Pages are not available for this book.")
+        try:
+            page_count = pages.page_count()
+        except PageRenderError:
+            return HttpResponseNotFound("Pages are not available for this book.")
+
+        try:
+            start = max(int(request.GET.get('start', 1)), 1)
+        except ValueError:
+            start = 1
+        end = min(start + self.paginate_by - 1, page_count)
+        grant = request.GET.get('grant', '')
+        next_url = None
+        if end < page_count:
+            next_url = f'{request.path}?{urlencode({"start": end + 1, "grant": grant})}'
+
+        return JsonResponse({
+            'page_count': page_count,
+            'media_type': pages.media_type,
+            'pages': [
+                {'number': n, 'url': _with_grant(reverse('book_page', args=[book.pk, n]), grant)}
+                for n in range(start, end + 1)
+            ],
+            'next': next_url,
+        })
+
+
+class BookPageView(LoginRequiredMixin, View):
+    """One rendered page, produced on first request and served from the page cache after."""
+
+    def get(self, request, pk, number):
+        book = get_object_or_404(Book.objects.with_file(), pk=pk)
+        if not can_read_file(request, book):
+            return HttpResponseForbidden("You are not allowed to access this file.")
+
+        if get_page_renderer() is None:
+            # neither pdftoppm nor pypdf is installed; the viewer falls back to pdf.js
+            return JsonResponse({'error': 'No page renderer is installed on the server.'}, status=501)
+        pages = book_pages(book)
+        if pages is None:
+            return HttpResponseNotFound("Pages are not available for this book.")
+
+        etag = f'"{pages.digest}-{number}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                if not 1 <= number <= pages.page_count():
+                    return HttpResponseNotFound("No such page.")
+                path = pages.page(number)
+            except PageRenderError:
+                return HttpResponseNotFound("This page could not be rendered.")
+            response = FileResponse(open(path, 'rb'), content_type=pages.media_type)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=3600)
+        return response
+
+
+def epub_index(book):
+    """The book's EPUB index, or None if the book has no readable EPUB."""
+    try:
+        return get_epub_index(book)
+    except (FileNotFoundError, EpubError):
+        return None
+
+
+class BookChaptersView(LoginRequiredMixin, View):
+    """Spine and table of contents of an EPUB, with a URL for each chapter."""
+
+    def get(self, request, pk):
+        book = get_object_or_404(Book.objects.with_file(), pk=pk)
+        if not can_read_file(request, book):
+            return HttpResponseForbidden("You are not allowed to access this file.")
+
+        index = epub_index(book)
+        if index is None:
+            return HttpResponseNotFound("Chapters are not available for this book.")
+
+        grant = request.GET.get('grant', '')
+        chapter_url = lambda href: _with_grant(reverse('book_epub_resource', args=[book.pk, href]), grant)
+        return JsonResponse({
+            'base_url': reverse('book_epub', args=[book.pk]),
+            'spine': [
+                {'href': href, 'url': chapter_url(href), 'size': index.entries[href][2]}
+                for href in index.spine if href in index.entries
+            ],
+            'toc': [
+                {'title': item['title'], 'href': item['href'], 'url': chapter_url(item['href'].partition('#')[0])}
+                for item in index.toc
+            ],
+        })
+
+
+class BookEpubResourceView(LoginRequiredMixin, View):
+    """One file from inside an EPUB, read straight out of the archive through its index."""
+
+    def get(self, request, pk, href=''):
+        book = get_object_or_404(Book.objects.with_file(), pk=pk)
+        if not can_read_file(request, book):
+            return HttpResponseForbidden("You are not allowed to access this file.")
+
+        index = epub_index(book)
+        if index is None:
+            return HttpResponseNotFound("This book is not an EPUB.")
+        entry = index.entries.get(href)
+        if entry is None:
+            return HttpResponseNotFound("No such file in this book.")
+
+        etag = f'"{index.digest}-{entry[0]}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                content = read_entry(BookFile(book), entry)
+            except (OSError, EpubError):
+                return HttpResponseNotFound("This file could not be read.")
+            response = HttpResponse(content, content_type=entry[4])
+        response['ETag'] = etag
+        # the archive is uploaded content: a chapter opened directly must not
+        # run its scripts on this origin (epub.js fetches entries, so it is unaffected)
+        response['Content-Security-Policy'] = 'sandbox'
+        response['Content-Disposition'] = 'inline'
         response['X-Content-Type-Options'] = 'nosniff'
+        patch_cache_control(response, private=True, max_age=3600)
         return response
 
 
@@ -381,6 +669,7 @@ class ReaderDashboardView(LoginRequiredMixin, UserPassesTestMixin, View):
         reading_history = ReadingHistory.objects.filter(user=request.user)
         
         context = {
+            'feed': feed_entries(request.user).order_by('rank')[:4],
             'active_borrows': borrow_requests.filter(status__in=['approved', 'borrowed']),
             'pending_requests': borrow_requests.filter(status='pending'),
             'wishlist': wishlist,
@@ -389,6 +678,24 @@ class ReaderDashboardView(LoginRequiredMixin, UserPassesTestMixin, View):
         return render(request, self.template_name, context)
 
 
+class ReaderFeedView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Books picked for the reader from their favourite genres, history and what is popular."""
+    template_name = 'books/reader_feed.html'
+    login_url = 'login'
+    paginate_by = 12
+    
+    def test_func(self):
+        return self.request.user.is_reader()
+    
+    def get(self, request):
+        page_obj = CursorPaginator(feed_entries(request.user), self.paginate_by, ['rank']).get_page(request)
+        context = {
+            'page_obj': page_obj,
+            'books': [entry.book for entry in page_obj.object_list],
+        }
+        return render(request, self.template_name, context)
+
+
 class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, View):
     template_name = 'books/admin_dashboard.html'
     login_url = 'login'
@@ -420,6 +727,8 @@ class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, View):
             'pending_role_requests': pending_role_requests,
             'recent_books': recent_books,
             'recent_users': recent_users,
+            'notification_queue': NotificationJob.objects.depth(),
+            'export_datasets': list(EXPORTS),
 
             # Author-like context (used by the Author tab in the admin dashboard)
             'total_requests': borrow_requests.count(),
@@ -435,6 +744,27 @@ class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, View):
         return render(request, self.template_name, context)
 
 
+class AdminExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Stream a dataset (books, borrows, downloads, reviews) as CSV or JSON Lines, optionally gzipped."""
+    login_url = 'login'
+
+    def test_func(self):
+        return self.request.user.is_admin_user()
+
+    def get(self, request, dataset, fmt):
+        if dataset not in EXPORTS or fmt not in EXPORT_FORMATS:
+            raise Http404("Unknown export.")
+        compress = request.GET.get('gzip') == '1'
+        response = StreamingHttpResponse(
+            export_stream(dataset, fmt, compress),
+            content_type='application/gzip' if compress else EXPORT_FORMATS[fmt],
+        )
+        response['Content-Disposition'] = content_disposition_header(
+            True, export_filename(dataset, fmt, compress))
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+
 class AdminBookRequestsView(LoginRequiredMixin, UserPassesTestMixin, View):
     template_name = 'books/admin_book_requests.html'
     login_url = 'login'
@@ -443,7 +773,7 @@ class AdminBookRequestsView(LoginRequiredMixin, UserPassesTestMixin, View):
         return self.request.user.is_admin_user()
     
     def get(self, request):
-        books = Book.objects.filter(status='pending')
+        books = Book.objects.with_details().filter(status='pending')
         context = {
             'books': books,
         }
@@ -453,6 +783,7 @@ class AdminBookRequestsView(LoginRequiredMixin, UserPassesTestMixin, View):
         book_id = request.POST.get('book_id')
         action = request.POST.get('action')
         book = get_object_or_404(Book, pk=book_id)
+        was_approved = book.status == 'approved'
         
         if action == 'approve':
             book.status = 'approved'
@@ -465,6 +796,8 @@ class AdminBookRequestsView(LoginRequiredMixin, UserPassesTestMixin, View):
             message = 'Invalid action'
         
         book.save()
+        if book.status == 'approved' and not was_approved:
+            notify_book_available(book, 'approved')
         messages.success(request, message)
         return redirect('admin_book_requests')
 
@@ -508,7 +841,7 @@ class AdminRoleRequestsView(LoginRequiredMixin, UserPassesTestMixin, View):
         
         if action == 'approve':
             role_request.user.role = role_request.requested_role
-            role_request.user.save()
+            role_request.user.save(update_fields=['role', 'updated_at'])
             role_request.status = 'approved'
             message = f'Role change request for {role_request.user.username} approved!'
         elif action == 'reject':
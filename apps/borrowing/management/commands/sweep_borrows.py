@@ -0,0 +1,32 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from apps.borrowing.reminders import REMINDER_KINDS, sweep
+
+
+class Command(BaseCommand):
+    help = 'Send due-soon and overdue reminders for loans that have not had them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=REMINDER_KINDS, action='append',
+                            help='Reminder kind to sweep (default: all)')
+        parser.add_argument('--today', type=date.fromisoformat,
+                            help='Sweep as if it were this date (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Notifications inserted per statement')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=3600,
+                            help='Seconds between sweeps with --loop')
+
+    def handle(self, *args, **options):
+        kinds = options['kind'] or REMINDER_KINDS
+        while True:
+            for kind in kinds:
+                sent = sweep(kind, today=options['today'], batch_size=options['batch_size'])
+                self.stdout.write(self.style.SUCCESS(f'{kind}: {sent} reminder(s) sent.'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-02-26 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0004_add_requested_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowrequest',
+            name='due_reminder_sent_at',
+            field=models.DateTimeField(blank=True, help_text='When the "due soon" reminder was sent', null=True),
+        ),
+        migrations.AddField(
+            model_name='borrowrequest',
+            name='overdue_reminder_sent_at',
+            field=models.DateTimeField(blank=True, help_text='When the overdue reminder was sent', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrequest',
+            index=models.Index(condition=models.Q(('due_reminder_sent_at__isnull', True), ('returned_at__isnull', True), ('status__in', ('approved', 'borrowed'))), fields=['due_date'], name='borrow_due_reminder_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrequest',
+            index=models.Index(condition=models.Q(('overdue_reminder_sent_at__isnull', True), ('returned_at__isnull', True), ('status__in', ('approved', 'borrowed'))), fields=['due_date'], name='borrow_overdue_reminder_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0005_loan_reminder_flags'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='borrowrequest',
+            name='borrowing_b_reader__719e8c_idx',
+        ),
+        migrations.AddIndex(
+            model_name='borrowrequest',
+            index=models.Index(fields=['reader', 'book', 'status', 'due_date'], name='borrowing_b_reader__129e51_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrequest',
+            index=models.Index(condition=models.Q(('returned_at__isnull', True), ('status__in', ('approved', 'borrowed'))), fields=['reader', 'book', 'due_date'], name='borrow_active_loan_idx'),
+        ),
+    ]
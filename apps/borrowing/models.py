@@ -5,6 +5,20 @@ from apps.users.models import User
 from apps.books.models import Book
 
 
+# statuses of a loan the reader currently holds
+ACTIVE_STATUSES = ('approved', 'borrowed')
+
+
+class BorrowRequestQuerySet(models.QuerySet):
+    def between(self, reader, book):
+        return self.filter(reader=reader, book=book)
+    
+    def current(self, today=None):
+        """Loans that grant access today: active, not returned and not past due."""
+        today = today or timezone.now().date()
+        return self.filter(status__in=ACTIVE_STATUSES, due_date__gte=today, returned_at__isnull=True)
+
+
 class BorrowRequest(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -71,37 +85,73 @@ class BorrowRequest(models.Model):
         help_text='Reason for rejecting the request'
     )
     
+    due_reminder_sent_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text='When the "due soon" reminder was sent'
+    )
+    
+    overdue_reminder_sent_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text='When the overdue reminder was sent'
+    )
+    
+    objects = BorrowRequestQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-requested_at']
         verbose_name = 'Borrow Request'
         verbose_name_plural = 'Borrow Requests'
         indexes = [
-            models.Index(fields=['reader']),
             models.Index(fields=['book']),
             models.Index(fields=['status']),
+            # "does this reader already have a request for this book"
+            models.Index(fields=['reader', 'book', 'status', 'due_date']),
+            # access checks on the current loan; partial where the backend supports it
+            models.Index(
+                fields=['reader', 'book', 'due_date'],
+                condition=models.Q(status__in=ACTIVE_STATUSES, returned_at__isnull=True),
+                name='borrow_active_loan_idx',
+            ),
+            # sweep_borrows: active loans still owed each kind of reminder
+            models.Index(
+                fields=['due_date'],
+                condition=models.Q(
+                    status__in=ACTIVE_STATUSES, returned_at__isnull=True, due_reminder_sent_at__isnull=True),
+                name='borrow_due_reminder_idx',
+            ),
+            models.Index(
+                fields=['due_date'],
+                condition=models.Q(
+                    status__in=ACTIVE_STATUSES, returned_at__isnull=True, overdue_reminder_sent_at__isnull=True),
+                name='borrow_overdue_reminder_idx',
+            ),
         ]
     
     def __str__(self):
         return f"{self.reader.username} - {self.book.title} ({self.status})"
     
     def is_overdue(self):
-        if self.due_date and self.status in ['approved', 'borrowed'] and not self.returned_at:
+        if self.due_date and self.status in ACTIVE_STATUSES and not self.returned_at:
             return timezone.now().date() > self.due_date
         return False
     
     def days_remaining(self):
-        if self.due_date and self.status in ['approved', 'borrowed'] and not self.returned_at:
+        if self.due_date and self.status in ACTIVE_STATUSES and not self.returned_at:
             return (self.due_date - timezone.now().date()).days
         return None
     
     def approve_request(self):
         from django.conf import settings
+        from apps.books.trending import record_activity
         self.status = 'approved'
         self.approved_at = timezone.now()
         # if the reader picked a specific duration, use it; otherwise fall back to global default
         days = self.requested_days or settings.BOOK_BORROW_DAYS
         self.due_date = timezone.now().date() + timedelta(days=days)
         self.save()
+        record_activity(self.book_id)
     
     def reject_request(self, reason):
         self.status = 'rejected'
@@ -114,5 +164,8 @@ class BorrowRequest(models.Model):
             self.save()
     
     def return_book(self):
+        from apps.books.notifications import notify_book_available
         self.returned_at = timezone.now()
         self.save()
+        notify_book_available(self.book, f'return:{self.pk}', exclude_user=self.reader)
+
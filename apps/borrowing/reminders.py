@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.models import Notification
+from apps.core.utils import create_notifications
+from .models import ACTIVE_STATUSES, BorrowRequest
+
+REMINDER_KINDS = ('due_soon', 'overdue')
+
+# the loan column recording that each kind of reminder went out
+SENT_FIELDS = {'due_soon': 'due_reminder_sent_at', 'overdue': 'overdue_reminder_sent_at'}
+
+
+def reminder_window(kind, today):
+    """Return (first, last): the due dates a reminder of this kind is for today."""
+    if kind == 'due_soon':
+        return today, today + timedelta(days=settings.BOOK_REMINDER_DAYS)
+    return None, today - timedelta(days=1)
+
+
+def build_reminder(kind, reader_id, book_id, title, due_date):
+    if kind == 'due_soon':
+        return Notification(
+            user_id=reader_id,
+            notification_type='borrow_due_soon',
+            title=f'"{title}" is due soon',
+            message=f'Please return "{title}" by {due_date}.',
+            related_book_id=book_id,
+        )
+    return Notification(
+        user_id=reader_id,
+        notification_type='borrow_overdue',
+        title=f'"{title}" is overdue',
+        message=f'"{title}" was due on {due_date}. Please return it as soon as possible.',
+        related_book_id=book_id,
+    )
+
+
+def sweep(kind, today=None, batch_size=1000):
+    """
+    Send one reminder of `kind` for every active loan in its window that
+    hasn't had one, and flag the loan. Loans are picked from a partial
+    index on due_date over the unflagged active loans, batch by batch, so
+    a loan approved late or a missed run is caught by the next sweep and
+    memory use doesn't grow with the number of loans. Returns the number
+    of reminders sent.
+    """
+    today = today or timezone.localdate()
+    first, last = reminder_window(kind, today)
+    sent_field = SENT_FIELDS[kind]
+    loans = BorrowRequest.objects.filter(
+        status__in=ACTIVE_STATUSES,
+        due_date__lte=last,
+        returned_at__isnull=True,
+        **{f'{sent_field}__isnull': True},
+    )
+    if first is not None:
+        # loans that are already late only get the overdue reminder
+        loans = loans.filter(due_date__gte=first)
+
+    sent = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                loans.select_for_update(of=('self',)).order_by('pk')
+                .values_list('pk', 'reader_id', 'book_id', 'book__title', 'due_date')[:batch_size]
+            )
+            if not batch:
+                return sent
+            create_notifications([build_reminder(kind, *loan[1:]) for loan in batch])
+            BorrowRequest.objects.filter(pk__in=[loan[0] for loan in batch]).update(**{sent_field: timezone.now()})
+        sent += len(batch)
@@ -1,11 +1,18 @@
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
+import io
+
+from django.core.management import call_command
 
 from apps.books.models import Book
-from .models import BorrowRequest
+from apps.core.models import Notification
+from .models import ACTIVE_STATUSES, BorrowRequest
 
 User = get_user_model()
 
@@ -123,4 +130,86 @@ class BorrowRequestViewerTests(TestCase):
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(resp['Content-Type'], 'application/pdf')
-        self.assertIn(b'%PDF-1.4', resp.content)
+        self.assertIn(b'%PDF-1.4', b''.join(resp.streaming_content))
+
+
+class SweepBorrowsTests(TestCase):
+    def setUp(self):
+        self.reader = create_user('reader')
+        self.author = create_user('author', role='author')
+        self.book = create_book(self.author)
+        self.today = date(2026, 3, 10)
+
+    def loan(self, days_from_today, **kwargs):
+        kwargs.setdefault('status', 'approved')
+        return BorrowRequest.objects.create(
+            reader=self.reader, book=self.book, due_date=self.today + timedelta(days=days_from_today), **kwargs)
+
+    def sweep(self, today, *args):
+        call_command('sweep_borrows', '--today', today.isoformat(), *args, stdout=io.StringIO())
+        return sorted(Notification.objects.values_list('notification_type', 'message'))
+
+    def test_reminders_are_sent_once_per_loan(self):
+        self.loan(2)
+        self.loan(5)
+        self.loan(-1)
+        self.loan(-1, returned_at=timezone.now())
+        self.loan(-1, status='rejected')
+
+        self.assertEqual([kind for kind, _ in self.sweep(self.today)], ['borrow_due_soon', 'borrow_overdue'])
+        self.reader.refresh_from_db()
+        self.assertEqual(self.reader.unread_notification_count, 2)
+        # rerunning the same day finds nothing new
+        self.assertEqual(len(self.sweep(self.today)), 2)
+        # three days later the day-5 loan is due soon; the day-2 loan is now overdue
+        self.assertEqual(len(self.sweep(self.today + timedelta(days=3))), 4)
+
+    def test_loans_approved_after_a_sweep_are_still_reminded(self):
+        self.sweep(self.today)
+        # approved later the same day, already inside the window that was swept
+        self.loan(1)
+        self.assertEqual([kind for kind, _ in self.sweep(self.today)], ['borrow_due_soon'])
+        self.assertEqual(len(self.sweep(self.today)), 1)
+
+    def test_missed_sweeps_are_caught_up(self):
+        self.loan(-10)
+        self.loan(0)
+        self.assertEqual([kind for kind, _ in self.sweep(self.today)], ['borrow_due_soon', 'borrow_overdue'])
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'query plans are checked on SQLite and PostgreSQL')
+class BorrowRequestQueryPlanTests(TestCase):
+    """The hot BorrowRequest lookups must stay on an index as the table grows."""
+
+    def setUp(self):
+        self.reader = create_user('reader')
+        self.book = create_book(create_user('author', role='author'))
+
+    def hot_queries(self):
+        today = timezone.now().date()
+        loans = BorrowRequest.objects.between(self.reader, self.book)
+        return {
+            # BookViewerView / BookFileView access check
+            'current loan': loans.current(today).order_by().values('pk')[:1],
+            # BookDetailView and BorrowRequestCreateView
+            'existing request': loans.filter(status__in=['pending', 'approved', 'rejected', 'borrowed'])[:1],
+            # sweep_borrows
+            'unreminded loans': BorrowRequest.objects.filter(
+                status__in=ACTIVE_STATUSES, due_date__gte=today, due_date__lte=today + timedelta(days=2),
+                returned_at__isnull=True, due_reminder_sent_at__isnull=True,
+            ).order_by('pk').values_list('pk', 'reader_id', 'due_date'),
+        }
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # small test tables would otherwise always be scanned
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_hot_queries_use_an_index(self):
+        for label, queryset in self.hot_queries().items():
+            with self.subTest(label):
+                plan = self.plan(queryset)
+                self.assertNotRegex(plan, r'SCAN borrowing_borrowrequest\b|Seq Scan on borrowing_borrowrequest')
+                self.assertRegex(plan, r'(?i)index')
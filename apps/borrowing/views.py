@@ -20,9 +20,7 @@ class BorrowRequestCreateView(LoginRequiredMixin, View):
             return redirect('book_detail', pk=book.pk)
 
         # already have an active/pending request?
-        existing_request = BorrowRequest.objects.filter(
-            reader=request.user,
-            book=book,
+        existing_request = BorrowRequest.objects.between(request.user, book).filter(
             status__in=['pending', 'approved', 'rejected', 'borrowed']
         ).first()
         if existing_request:
@@ -39,9 +37,7 @@ class BorrowRequestCreateView(LoginRequiredMixin, View):
             messages.error(request, 'This book is not available for borrowing.')
             return redirect('book_detail', pk=book.pk)
         
-        existing_request = BorrowRequest.objects.filter(
-            reader=request.user,
-            book=book,
+        existing_request = BorrowRequest.objects.between(request.user, book).filter(
             status__in=['pending', 'approved', 'rejected', 'borrowed']
         ).first()
         if existing_request:
@@ -2,7 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.core.paginator import Paginator
+from apps.core.pagination import CursorPaginator
 from .models import Community, CommunityPost, Comment
 from .forms import CommunityForm, CommunityPostForm, CommentForm
 
@@ -26,9 +26,7 @@ class CommunityHubView(LoginRequiredMixin, View):
         ).order_by('-created_at')
         
         # Paginate posts
-        paginator = Paginator(posts, self.paginate_by)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        page_obj = CursorPaginator(posts, self.paginate_by, ['-created_at']).get_page(request)
         
         context = {
             'communities': communities,
@@ -72,9 +70,7 @@ class CommunityDetailView(LoginRequiredMixin, View):
         posts = community.posts.all().order_by('-created_at')
         
         # Paginate posts
-        paginator = Paginator(posts, self.paginate_by)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        page_obj = CursorPaginator(posts, self.paginate_by, ['-created_at']).get_page(request)
         
         # Check if user is member
         is_member = request.user in community.members.all()
@@ -204,9 +200,7 @@ class CommentHistoryView(LoginRequiredMixin, View):
         comments = Comment.objects.filter(author=request.user).order_by('-created_at')
         
         # Paginate comments
-        paginator = Paginator(comments, self.paginate_by)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        page_obj = CursorPaginator(comments, self.paginate_by, ['-created_at']).get_page(request)
         
         context = {
             'page_obj': page_obj,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Notification, NotificationJob
 
 
 @admin.register(Notification)
@@ -8,3 +8,16 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ('notification_type', 'is_read', 'created_at')
     search_fields = ('user__username', 'title', 'message')
     readonly_fields = ('created_at',)
+    actions = ['mark_read']
+
+    @admin.action(description='Mark selected notifications as read')
+    def mark_read(self, request, queryset):
+        updated = queryset.mark_read()
+        self.message_user(request, f'{updated} notification(s) marked as read.')
+
+
+@admin.register(NotificationJob)
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = ('title', 'notification_type', 'status', 'delivered', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'notification_type')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'last_user_id', 'delivered', 'last_error')
@@ -1,15 +1,24 @@
+from django.utils.functional import SimpleLazyObject
+
+from .utils import get_notification_preview
+
+
 def user_notifications(request):
     """
-    Context processor to add user notifications to all templates
+    Context processor to add user notifications to all templates.
+    Both values are lazy, so pages that don't show them run no queries.
     """
-    notifications = []
-    unread_count = 0
+    def notifications():
+        if request.user.is_authenticated:
+            return get_notification_preview(request.user)
+        return []
     
-    if request.user.is_authenticated:
-        notifications = request.user.notifications.all()[:5]
-        unread_count = request.user.notifications.filter(is_read=False).count()
+    def unread_count():
+        if request.user.is_authenticated:
+            return request.user.unread_notification_count
+        return 0
     
     return {
-        'user_notifications': notifications,
-        'unread_notifications_count': unread_count,
+        'user_notifications': SimpleLazyObject(notifications),
+        'unread_notifications_count': SimpleLazyObject(unread_count),
     }
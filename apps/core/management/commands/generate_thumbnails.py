@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from apps.books.models import Book
+from apps.core.thumbnails import remember_variants, write_variants
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Create the resized variants of every book cover and profile picture'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Images resized in parallel')
+        parser.add_argument('--force', action='store_true',
+                            help='Rewrite variants that already exist')
+
+    def handle(self, *args, **options):
+        images = [
+            book.cover_image
+            for book in Book.objects.exclude(cover_image='').exclude(cover_image=None).only('pk', 'cover_image')
+        ] + [
+            user.profile_picture
+            for user in User.objects.exclude(profile_picture='').exclude(profile_picture=None).only(
+                'pk', 'profile_picture')
+        ]
+        # resizing happens in Pillow's C code, which releases the GIL
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            results = list(pool.map(lambda image: write_variants(image, force=options['force']), images))
+        # the cache may be the database; write it from this thread only
+        for image, variants in zip(images, results):
+            if variants is not None:
+                remember_variants(image, variants)
+
+        failed = results.count(None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(images) - failed} image(s), {failed} could not be read.'
+        ))
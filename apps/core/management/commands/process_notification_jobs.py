@@ -0,0 +1,64 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.core.models import NotificationJob
+from apps.core.utils import claim_notification_job, process_notification_job
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notification fan-outs (see NOTIFICATION_DISPATCH)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.NOTIFICATION_BATCH_SIZE,
+                            help='Notifications inserted per statement')
+        parser.add_argument('--max-jobs', type=int, default=0,
+                            help='Stop after this many jobs (0 = no limit)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new jobs instead of exiting when the queue is empty')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Seconds to wait between polls with --loop')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Reclaim running jobs with no progress for this many seconds')
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Mark a job failed after this many attempts')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print queue depth and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+
+        processed = 0
+        while not options['max_jobs'] or processed < options['max_jobs']:
+            job = claim_notification_job(stale_after=options['stale_after'])
+            if job is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            processed += 1
+            try:
+                delivered = process_notification_job(job, batch_size=options['batch_size'])
+            except Exception as exc:
+                status = 'failed' if job.attempts >= options['max_attempts'] else 'pending'
+                NotificationJob.objects.filter(pk=job.pk).update(
+                    status=status, last_error=repr(exc), finished_at=timezone.now() if status == 'failed' else None,
+                )
+                self.stderr.write(f'Job {job.pk} {status}: {exc!r}')
+            else:
+                self.stdout.write(f'Job {job.pk}: {delivered} notification(s) delivered.')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s).'))
+        self.print_stats()
+
+    def print_stats(self):
+        depth = NotificationJob.objects.depth()
+        self.stdout.write(
+            'Queue: {pending} pending, {running} running, {failed} failed, '
+            'oldest pending {oldest_pending_seconds:.0f}s'.format(**depth)
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.core.models import Notification, invalidate_notification_preview
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Recompute every user\'s stored unread notification count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of users to update per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        unread = Notification.objects.filter(user=OuterRef('pk'), is_read=False).order_by().values('user')
+        count = Coalesce(Subquery(unread.annotate(n=Count('pk')).values('n')), 0)
+        updated = 0
+        last_pk = 0
+        while True:
+            batch_ids = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch_ids:
+                break
+            last_pk = batch_ids[-1]
+            updated += User.objects.filter(pk__in=batch_ids).update(unread_notification_count=count)
+            for user_id in batch_ids:
+                invalidate_notification_preview(user_id)
+
+        self.stdout.write(self.style.SUCCESS(f'Unread counts recomputed for {updated} user(s).'))
@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 01:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_book_facet_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0003_alter_notification_notification_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('borrow_request', 'Borrow Request'), ('borrow_approved', 'Borrow Request Approved'), ('borrow_rejected', 'Borrow Request Rejected'), ('book_available', 'Book Became Available'), ('borrow_due_soon', 'Borrow Due Soon'), ('borrow_overdue', 'Borrow Overdue'), ('review_added', 'Review Added'), ('role_change_approved', 'Role Change Approved'), ('role_change_rejected', 'Role Change Rejected'), ('book_approved', 'Book Approved'), ('book_rejected', 'Book Rejected')], max_length=50)),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('user_ids', models.JSONField(blank=True, default=list)),
+                ('audience', models.CharField(blank=True, max_length=255)),
+                ('audience_kwargs', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('last_user_id', models.PositiveIntegerField(default=0)),
+                ('delivered', models.PositiveIntegerField(default=0)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('related_book', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='books.book')),
+                ('related_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notification Job',
+                'verbose_name_plural': 'Notification Jobs',
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notificationjob',
+            index=models.Index(fields=['status', 'created_at'], name='core_notifi_status_d144da_idx'),
+        ),
+    ]
@@ -1,4 +1,42 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+# Cache key for a user's five most recent notifications
+PREVIEW_CACHE_KEY = 'notifications:preview:{}'
+PREVIEW_SIZE = 5
+
+
+def invalidate_notification_preview(user_id):
+    cache.delete(PREVIEW_CACHE_KEY.format(user_id))
+
+
+def adjust_unread_count(user_id, delta):
+    """Shift a user's unread counter in one UPDATE and drop their cached preview."""
+    from apps.users.models import User
+
+    if delta:
+        # clamped at zero so drift can't trip the column's CHECK constraint
+        User.objects.filter(pk=user_id).update(
+            unread_notification_count=Greatest(F('unread_notification_count') + delta, 0)
+        )
+    invalidate_notification_preview(user_id)
+
+
+class NotificationQuerySet(models.QuerySet):
+    def mark_read(self):
+        """Mark every unread notification in the queryset read, keeping the counters in step."""
+        with transaction.atomic():
+            unread = self.filter(is_read=False)
+            per_user = dict(unread.order_by().values_list('user').annotate(n=Count('pk')))
+            if not per_user:
+                return 0
+            updated = unread.update(is_read=True)
+            for user_id, n in per_user.items():
+                adjust_unread_count(user_id, -n)
+        return updated
 
 
 class Notification(models.Model):
@@ -51,6 +89,8 @@ class Notification(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = NotificationQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Notification'
@@ -63,5 +103,100 @@ class Notification(models.Model):
         return f"{self.user.username} - {self.title}"
     
     def mark_as_read(self):
+        # conditional update so a double click can't decrement the counter twice
+        with transaction.atomic():
+            updated = Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True)
+            if updated:
+                adjust_unread_count(self.user_id, -1)
         self.is_read = True
-        self.save()
+
+
+class NotificationJobQuerySet(models.QuerySet):
+    def depth(self):
+        """Queue metrics: jobs per status and the age of the oldest pending job."""
+        counts = dict(self.order_by().values_list('status').annotate(n=Count('pk')))
+        oldest = self.filter(status='pending').order_by('created_at').values_list('created_at', flat=True).first()
+        return {
+            'pending': counts.get('pending', 0),
+            'running': counts.get('running', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_pending_seconds': (timezone.now() - oldest).total_seconds() if oldest else 0,
+        }
+
+
+class NotificationJob(models.Model):
+    """
+    A deferred notification fan-out, drained by the process_notification_jobs
+    command. Recipients are either an explicit list of user ids or an
+    audience: the dotted path of a callable returning a User queryset, so
+    the enqueuing request doesn't have to load the recipients itself.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    notification_type = models.CharField(
+        max_length=50,
+        choices=Notification.NOTIFICATION_TYPES
+    )
+    
+    title = models.CharField(max_length=255)
+    
+    message = models.TextField()
+    
+    related_book = models.ForeignKey(
+        'books.Book',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    
+    related_user = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    
+    user_ids = models.JSONField(default=list, blank=True)
+    
+    audience = models.CharField(max_length=255, blank=True)
+    
+    audience_kwargs = models.JSONField(default=dict, blank=True)
+    
+    # jobs sharing a key are only ever enqueued once
+    dedupe_key = models.CharField(max_length=100, unique=True, blank=True, null=True)
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    
+    # highest recipient id already delivered, so a retried job resumes instead of repeating
+    last_user_id = models.PositiveIntegerField(default=0)
+    
+    delivered = models.PositiveIntegerField(default=0)
+    
+    attempts = models.PositiveSmallIntegerField(default=0)
+    
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    objects = NotificationJobQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Notification Job'
+        verbose_name_plural = 'Notification Jobs'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_notification_type_display()} ({self.status})"
@@ -0,0 +1,168 @@
+import datetime
+
+from django.core import signing
+from django.db.models import Q
+from django.core.exceptions import FieldDoesNotExist
+
+# Exact counts stop at this many rows; beyond it the page shows "N+"
+ESTIMATE_CAP = 1000
+
+
+class CursorPage:
+    """One page of a CursorPaginator, with links to its neighbours."""
+
+    def __init__(self, paginator, object_list, has_next, has_previous, params):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def _url(self, cursor=None):
+        params = self.params.copy()
+        params.pop(self.paginator.cursor_param, None)
+        params.pop('page', None)
+        if cursor:
+            params[self.paginator.cursor_param] = cursor
+        query = params.urlencode()
+        return f'?{query}' if query else '?'
+
+    @property
+    def first_url(self):
+        return self._url()
+
+    @property
+    def next_url(self):
+        if self.has_next_page:
+            return self._url(self.paginator.encode_cursor(self.object_list[-1], 'next'))
+        return None
+
+    @property
+    def previous_url(self):
+        if self.has_previous_page:
+            return self._url(self.paginator.encode_cursor(self.object_list[0], 'prev'))
+        return None
+
+    @property
+    def estimated_count(self):
+        """Number of rows, counted up to ESTIMATE_CAP (see count_is_capped)."""
+        if not hasattr(self, '_estimated_count'):
+            self._estimated_count = self.paginator.estimate_count()
+        return self._estimated_count
+
+    @property
+    def count_is_capped(self):
+        return self.estimated_count >= self.paginator.estimate_cap
+
+
+class CursorPaginator:
+    """
+    Keyset pagination: each page is fetched with a WHERE on the sort key of
+    the last row seen instead of an OFFSET, so page 50 costs the same as
+    page 1 and no COUNT(*) is needed. Cursors are signed so they can't be
+    tampered with, and they are bound to the ordering they were made for.
+
+    `ordering` lists the sort fields (e.g. ['-created_at']); the primary key
+    is appended as a tie-breaker. Sort fields must not be nullable.
+    """
+    cursor_param = 'cursor'
+
+    def __init__(self, queryset, per_page, ordering=None, estimate_cap=ESTIMATE_CAP):
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering or ['-pk'])
+        if not any(name.lstrip('-') in ('pk', 'id') for name in ordering):
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.estimate_cap = estimate_cap
+        self.salt = f'cursor:{queryset.model._meta.label}:{",".join(ordering)}'
+
+    def _model_field(self, name):
+        try:
+            return self.queryset.model._meta.get_field('id' if name == 'pk' else name)
+        except FieldDoesNotExist:
+            return None
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for name, _ in self.fields:
+            value = getattr(obj, name)
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            values.append(value)
+        return signing.dumps({'v': values, 'd': direction}, salt=self.salt, compress=True)
+
+    def decode_cursor(self, cursor):
+        """Return (values, direction), or None for a missing or invalid cursor."""
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt=self.salt)
+            raw_values, direction = data['v'], data['d']
+        except (signing.BadSignature, KeyError, TypeError):
+            return None
+        if direction not in ('next', 'prev') or len(raw_values) != len(self.fields):
+            return None
+        values = []
+        for (name, _), value in zip(self.fields, raw_values):
+            field = self._model_field(name)
+            values.append(field.to_python(value) if field is not None else value)
+        return values, direction
+
+    def _keyset_filter(self, values, forward):
+        """
+        Rows strictly after (forward) or before the cursor row in the sort
+        order: (a > x) OR (a = x AND b > y) OR ..., with > and < swapped
+        for descending fields.
+        """
+        condition = Q()
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for (prev_name, _), prev_value in zip(self.fields[:i], values[:i]):
+                term &= Q(**{prev_name: prev_value})
+            condition |= term
+        return condition
+
+    def get_page(self, request):
+        """Return the page addressed by the request's cursor (first page if none or invalid)."""
+        decoded = self.decode_cursor(request.GET.get(self.cursor_param))
+        queryset = self.queryset.order_by(*self.ordering)
+
+        if decoded is None:
+            rows = list(queryset[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            return CursorPage(self, rows[:self.per_page], has_next, False, request.GET)
+
+        values, direction = decoded
+        if direction == 'next':
+            rows = list(queryset.filter(self._keyset_filter(values, forward=True))[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            return CursorPage(self, rows[:self.per_page], has_next, True, request.GET)
+
+        reverse = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        rows = list(queryset.filter(self._keyset_filter(values, forward=False)).order_by(*reverse)[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(self, rows, True, has_previous, request.GET)
+
+    def estimate_count(self):
+        """Count matching rows, stopping at estimate_cap to keep the query cheap."""
+        return self.queryset.order_by()[:self.estimate_cap].count()
@@ -0,0 +1,43 @@
+from django import template
+from django.conf import settings
+from django.utils.html import format_html, format_html_join
+
+from apps.core import thumbnails
+
+register = template.Library()
+
+# Card columns are a quarter of the page on desktop and full width on phones
+DEFAULT_SIZES = '(max-width: 768px) 100vw, 25vw'
+
+
+@register.simple_tag
+def responsive_image(image_file, alt='', sizes=DEFAULT_SIZES, css_class='', style=''):
+    """
+    A <picture> offering the image's resized variants through srcset, one
+    <source> per format. Falls back to the original when there are none.
+    """
+    if not image_file:
+        return ''
+    variants = thumbnails.get_variants(image_file)
+    if not variants:
+        return format_html('<img src="{}" alt="{}" class="{}" style="{}" loading="lazy">',
+                           image_file.url, alt, css_class, style)
+
+    def srcset(fmt):
+        return ', '.join(f'{url} {width}w' for width, url in variants[fmt])
+
+    *preferred, fallback = settings.THUMBNAIL_FORMATS
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((thumbnails.FORMATS[fmt][1], srcset(fmt), sizes) for fmt in preferred),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" style="{}" loading="lazy"></picture>',
+        sources, variants[fallback][0][1], srcset(fallback), sizes, alt, css_class, style,
+    )
+
+
+@register.filter
+def thumbnail_url(image_file, width):
+    """URL of a variant at least `width` pixels wide, e.g. {{ user.profile_picture|thumbnail_url:160 }}."""
+    return thumbnails.thumbnail_url(image_file, int(width))
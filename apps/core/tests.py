@@ -0,0 +1,235 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .context_processors import user_notifications
+from .models import Notification, NotificationJob
+from .thumbnails import generate_variants, get_variants
+from .utils import (
+    dispatch_notifications, get_notification_preview, process_notification_job, send_notification,
+    send_notifications_bulk,
+)
+
+User = get_user_model()
+
+
+def readers():
+    """Test audience for queued fan-outs."""
+    return User.objects.filter(role='reader')
+
+
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='password')
+
+    def assertUnread(self, expected):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notification_count, expected)
+
+    def send(self, n=1):
+        return [send_notification(self.user, 'borrow_approved', f'Title {i}', 'Message') for i in range(n)]
+
+    def test_counter_follows_send_and_mark_read(self):
+        first, second, third = self.send(3)
+        self.assertUnread(3)
+        first.mark_as_read()
+        first.mark_as_read()
+        self.assertUnread(2)
+        Notification.objects.filter(user=self.user).mark_read()
+        self.assertUnread(0)
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+
+    def test_saving_the_user_leaves_the_counter_alone(self):
+        from apps.users.models import RoleChangeRequest
+
+        self.send(2)
+        role_request = RoleChangeRequest.objects.create(user=self.user, requested_role='author', reason='Writing')
+        User.objects.create_superuser(username='admin', password='password')
+        self.client.login(username='admin', password='password')
+        with CaptureQueriesContext(connection) as approve:
+            self.client.post(reverse('admin_role_requests'), {'request_id': role_request.pk, 'action': 'approve'})
+        self.client.login(username='reader', password='password')
+        with CaptureQueriesContext(connection) as profile:
+            self.client.post(reverse('profile_edit'), {'first_name': 'Rea', 'last_name': 'Der', 'email': 'r@example.com'})
+        # a full save would write back the counter as it was when the user was loaded
+        for queries in (approve, profile):
+            updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "users_user"')]
+            self.assertTrue(updates)
+            self.assertFalse([sql for sql in updates if 'unread_notification_count' in sql])
+            self.assertTrue(all('"updated_at"' in sql for sql in updates))
+        self.assertUnread(2)
+        self.assertEqual((self.user.role, self.user.first_name), ('author', 'Rea'))
+
+    def test_preview_is_cached_until_the_next_write(self):
+        self.send(6)
+        self.assertEqual(len(get_notification_preview(self.user)), 5)
+        with CaptureQueriesContext(connection) as queries:
+            get_notification_preview(self.user)
+        self.assertFalse([q for q in queries if Notification._meta.db_table in q['sql']])
+        self.send()
+        self.assertEqual(get_notification_preview(self.user)[0].title, 'Title 0')
+        Notification.objects.filter(user=self.user).mark_read()
+        self.assertTrue(all(n.is_read for n in get_notification_preview(self.user)))
+
+    def test_context_processor_is_lazy(self):
+        self.send(2)
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            context = user_notifications(request)
+        self.assertEqual(context['unread_notifications_count'], 2)
+        self.assertEqual(len(context['user_notifications']), 2)
+
+        request.user = AnonymousUser()
+        context = user_notifications(request)
+        self.assertEqual(context['unread_notifications_count'], 0)
+        self.assertEqual(list(context['user_notifications']), [])
+
+    def test_recompute_unread_counts_repairs_drift(self):
+        self.send(2)
+        User.objects.filter(pk=self.user.pk).update(unread_notification_count=9)
+        call_command('recompute_unread_counts', stdout=io.StringIO())
+        self.assertUnread(2)
+
+
+class NotificationFanOutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.bulk_create([User(username=f'reader{i}', role='reader') for i in range(7)])
+        User.objects.create_user(username='author', role='author')
+
+    def test_bulk_send_batches_inserts_and_counters(self):
+        users = readers()
+        with CaptureQueriesContext(connection) as ctx:
+            sent = send_notifications_bulk(users, 'book_available', 'Back', 'Available', batch_size=3)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(sent, 7)
+        self.assertEqual(Notification.objects.count(), 7)
+        self.assertEqual(set(users.values_list('unread_notification_count', flat=True)), {1})
+
+    def test_queued_job_is_one_insert_and_drained_by_worker(self):
+        with self.assertNumQueries(1):
+            job = dispatch_notifications('book_available', 'Back', 'Available', audience='apps.core.tests.readers',
+                                         defer=True)
+        self.assertEqual(NotificationJob.objects.depth()['pending'], 1)
+        self.assertEqual(Notification.objects.count(), 0)
+
+        out = io.StringIO()
+        call_command('process_notification_jobs', '--batch-size', '3', stdout=out)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.delivered), ('done', 7))
+        self.assertEqual(Notification.objects.count(), 7)
+        self.assertIn('0 pending', out.getvalue())
+
+    def test_retried_job_resumes_after_delivered_batches(self):
+        job = dispatch_notifications('book_available', 'Back', 'Available', audience='apps.core.tests.readers',
+                                     defer=True)
+        first_batch = list(readers().order_by('pk').values_list('pk', flat=True)[:3])
+        send_notifications_bulk(first_batch, 'book_available', 'Back', 'Available')
+        NotificationJob.objects.filter(pk=job.pk).update(last_user_id=first_batch[-1], delivered=3)
+        job.refresh_from_db()
+        process_notification_job(job, batch_size=3)
+        self.assertEqual(Notification.objects.count(), 7)
+        self.assertEqual(Notification.objects.values('user').distinct().count(), 7)
+
+    @override_settings(NOTIFICATION_DISPATCH='inline')
+    def test_inline_dispatch_delivers_immediately(self):
+        author = User.objects.get(username='author')
+        job = dispatch_notifications('review_added', 'Hi', 'Msg', user_ids=[author.pk, author.pk])
+        self.assertEqual(job.status, 'done')
+        author.refresh_from_db()
+        self.assertEqual(author.unread_notification_count, 1)
+
+
+def png_bytes(color='red', size=(800, 1200)):
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, 'PNG')
+    return out.getvalue()
+
+
+@override_settings(THUMBNAIL_WIDTHS=(160, 320), THUMBNAIL_FORMATS=('webp', 'jpeg'))
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username='reader', password='password')
+        self.user.profile_picture = SimpleUploadedFile('me.png', png_bytes())
+        self.user.save()
+
+    def render(self):
+        return Template('{% load thumbnails %}{% responsive_image user.profile_picture "Me" %}').render(
+            Context({'user': self.user}))
+
+    def test_rendering_never_makes_variants(self):
+        html = self.render()
+        self.assertNotIn('<picture>', html)
+        self.assertIn(self.user.profile_picture.url, html)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'profiles', 'thumbs')))
+
+    def test_srcset_lists_the_widths_written(self):
+        from PIL import Image
+
+        generate_variants(self.user.profile_picture)
+        html = self.render()
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('320w', html)
+        variants = get_variants(self.user.profile_picture)
+        for fmt in ('webp', 'jpeg'):
+            for width, url in variants[fmt]:
+                path = os.path.join(self.media_root, url[len('/media/'):])
+                with Image.open(path) as image:
+                    self.assertEqual(image.width, width)
+
+    def test_small_originals_are_not_scaled_up(self):
+        self.user.profile_picture = SimpleUploadedFile('small.png', png_bytes(size=(200, 300)))
+        self.user.save()
+        generate_variants(self.user.profile_picture)
+        self.assertEqual([width for width, _ in get_variants(self.user.profile_picture)['jpeg']], [160, 200])
+        self.assertNotIn('320w', self.render())
+
+    def test_uploading_a_picture_makes_its_variants(self):
+        self.client.login(username='reader', password='password')
+        self.client.post(reverse('profile_edit'), {
+            'first_name': 'Rea', 'last_name': 'Der', 'email': 'r@example.com',
+            'profile_picture': SimpleUploadedFile('new.png', png_bytes('green')),
+        })
+        self.user.refresh_from_db()
+        self.assertIn('<picture>', self.render())
+
+    def test_variants_follow_the_content_hash(self):
+        generate_variants(self.user.profile_picture)
+        before = get_variants(self.user.profile_picture)
+        with open(self.user.profile_picture.path, 'wb') as f:
+            f.write(png_bytes('blue'))
+        call_command('generate_thumbnails', '--workers', '2', stdout=io.StringIO())
+        after = get_variants(self.user.profile_picture)
+        self.assertNotEqual(before['jpeg'][0][1], after['jpeg'][0][1])
+
+    def test_unreadable_images_fall_back_to_the_original(self):
+        with open(self.user.profile_picture.path, 'wb') as f:
+            f.write(b'not an image')
+        with self.assertLogs('apps.core.thumbnails', 'WARNING'):
+            self.assertIsNone(generate_variants(self.user.profile_picture))
+        html = self.render()
+        self.assertIn(self.user.profile_picture.url, html)
+        self.assertNotIn('srcset', html)
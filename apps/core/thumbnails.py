@@ -0,0 +1,132 @@
+"""
+Resized variants of uploaded images (book covers, profile pictures) for
+list pages. Variants are written next to the original as
+<dir>/thumbs/<name>-<hash>-<width>w.<ext>, where <hash> comes from the
+original's bytes, so a replaced image never reuses stale thumbnails.
+
+Variants are made when an image is uploaded, and by `manage.py
+generate_thumbnails` for older images; rendering never makes them. The hash
+and the widths actually written are kept in the shared cache, so rendering a
+srcset needs no file access. Until they are there the original is shown.
+"""
+
+import hashlib
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'thumbnail_variants:{name}'
+
+# Pillow format name and MIME type for each configured output format
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def content_hash(image_file):
+    hasher = hashlib.sha256()
+    with image_file.storage.open(image_file.name, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()[:16]
+
+
+def variant_name(name, digest, width, fmt):
+    directory, filename = posixpath.split(name)
+    stem = filename.rsplit('.', 1)[0]
+    return posixpath.join(directory, 'thumbs', f'{stem}-{digest}-{width}w.{"jpg" if fmt == "jpeg" else fmt}')
+
+
+def variant_widths(image_width):
+    """The configured widths, capped at the original's: images are never scaled up."""
+    return sorted({min(width, image_width) for width in settings.THUMBNAIL_WIDTHS})
+
+
+def _encode(image, width, fmt):
+    variant = image.copy()
+    # bound the width only; covers keep their aspect ratio
+    variant.thumbnail((width, image.height))
+    if variant.mode not in ('RGB', 'RGBA') or fmt == 'jpeg':
+        variant = variant.convert('RGB')
+    out = io.BytesIO()
+    variant.save(out, FORMATS[fmt][0], quality=settings.THUMBNAIL_QUALITY)
+    return out.getvalue()
+
+
+def write_variants(image_file, force=False):
+    """
+    Write any missing variants of an image. Returns (hash, widths), or None
+    if the image can't be read.
+    """
+    from PIL import Image
+
+    storage = image_file.storage
+    try:
+        digest = content_hash(image_file)
+        # opening reads only the header; pixels are decoded if a variant is missing
+        with storage.open(image_file.name, 'rb') as f, Image.open(f) as image:
+            widths = variant_widths(image.width)
+            missing = [
+                (width, fmt) for width in widths for fmt in settings.THUMBNAIL_FORMATS
+                if force or not storage.exists(variant_name(image_file.name, digest, width, fmt))
+            ]
+            if missing:
+                image.load()
+            for width, fmt in missing:
+                name = variant_name(image_file.name, digest, width, fmt)
+                if storage.exists(name):
+                    storage.delete(name)
+                storage.save(name, ContentFile(_encode(image, width, fmt)))
+    except (OSError, ValueError) as exc:
+        logger.warning('Could not make thumbnails of %s: %s', image_file.name, exc)
+        return None
+    return digest, widths
+
+
+def remember_variants(image_file, variants):
+    cache.set(CACHE_KEY.format(name=image_file.name), variants, None)
+
+
+def generate_variants(image_file, force=False):
+    """Write any missing variants of an image and cache (hash, widths). Returns them, or None."""
+    variants = write_variants(image_file, force)
+    if variants is not None:
+        remember_variants(image_file, variants)
+    return variants
+
+
+def get_variants(image_file):
+    """
+    {format: [(width, url), ...]} for an image's variants. Returns None when
+    there are none to offer yet.
+    """
+    if not image_file:
+        return None
+    variants = cache.get(CACHE_KEY.format(name=image_file.name))
+    if variants is None:
+        return None
+    digest, widths = variants
+    storage = image_file.storage
+    return {
+        fmt: [(width, storage.url(variant_name(image_file.name, digest, width, fmt))) for width in widths]
+        for fmt in settings.THUMBNAIL_FORMATS
+    }
+
+
+def thumbnail_url(image_file, width):
+    """URL of the smallest variant at least `width` wide in the last configured format, else the original."""
+    variants = get_variants(image_file)
+    if not variants:
+        return image_file.url if image_file else ''
+    candidates = variants[settings.THUMBNAIL_FORMATS[-1]]
+    for variant_width, url in candidates:
+        if variant_width >= width:
+            return url
+    return candidates[-1][1]
@@ -1,17 +1,219 @@
-from .models import Notification
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
 from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.users.models import User
+from .models import PREVIEW_CACHE_KEY, PREVIEW_SIZE, Notification, NotificationJob, adjust_unread_count
 
 
 def send_notification(user, notification_type, title, message, related_book=None, related_user=None):
     """
     Helper function to send notifications to users
     """
-    notification = Notification.objects.create(
-        user=user,
+    with transaction.atomic():
+        notification = Notification.objects.create(
+            user=user,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            related_book=related_book,
+            related_user=related_user,
+        )
+        adjust_unread_count(user.pk, 1)
+    return notification
+
+
+def get_notification_preview(user):
+    """
+    Return the user's most recent notifications, cached until the next
+    notification is sent or marked read.
+    """
+    key = PREVIEW_CACHE_KEY.format(user.pk)
+    preview = cache.get(key)
+    if preview is None:
+        preview = list(user.notifications.select_related('related_book', 'related_user')[:PREVIEW_SIZE])
+        cache.set(key, preview, settings.NOTIFICATION_PREVIEW_CACHE_TIMEOUT)
+    return preview
+
+
+def create_notifications(notifications):
+    """
+    Insert a batch of unsaved Notification objects with one INSERT and bump
+    the recipients' unread counters with one UPDATE per distinct increment.
+    """
+    Notification.objects.bulk_create(notifications)
+    per_user = Counter(notification.user_id for notification in notifications)
+    by_delta = defaultdict(list)
+    for user_id, delta in per_user.items():
+        by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        User.objects.filter(pk__in=user_ids).update(unread_notification_count=F('unread_notification_count') + delta)
+    keys = [PREVIEW_CACHE_KEY.format(user_id) for user_id in per_user]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _deliver(user_ids, fields):
+    """Send the same notification to each of a batch of distinct user ids."""
+    create_notifications([Notification(user_id=user_id, **fields) for user_id in user_ids])
+
+
+def _id_batches(users, batch_size, after=0):
+    """
+    Yield lists of distinct user ids in batches. Querysets are walked by
+    primary key so they are never loaded whole.
+    """
+    if isinstance(users, models.QuerySet):
+        last_id = after
+        while True:
+            batch = list(
+                users.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True).distinct()[:batch_size]
+            )
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1]
+    else:
+        seen, batch = set(), []
+        for user in users:
+            user_id = getattr(user, 'pk', user)
+            if user_id in seen:
+                continue
+            seen.add(user_id)
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def send_notifications_bulk(users, notification_type, title, message, related_book=None, related_user=None,
+                            batch_size=None):
+    """
+    Send the same notification to many users with one INSERT per batch.
+    `users` may be a User queryset or an iterable of users or user ids.
+    Returns the number of notifications created.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    fields = dict(
         notification_type=notification_type,
         title=title,
         message=message,
         related_book=related_book,
         related_user=related_user,
     )
-    return notification
+    sent = 0
+    for batch in _id_batches(users, batch_size):
+        with transaction.atomic():
+            _deliver(batch, fields)
+        sent += len(batch)
+    return sent
+
+
+def dispatch_notifications(notification_type, title, message, user_ids=None, audience='', audience_kwargs=None,
+                           related_book=None, related_user=None, defer=None, dedupe_key=None):
+    """
+    Record a notification fan-out as a NotificationJob. Recipients are
+    either `user_ids` or an `audience`: the dotted path of a callable that
+    takes `audience_kwargs` and returns a User queryset. With deferred
+    dispatch (settings.NOTIFICATION_DISPATCH = 'queue', or defer=True) the
+    caller only pays for the one INSERT and a worker delivers the job;
+    otherwise it is delivered before returning.
+
+    A `dedupe_key` makes the call idempotent: if a job with that key was
+    already recorded, nothing is sent and None is returned.
+    """
+    if defer is None:
+        defer = settings.NOTIFICATION_DISPATCH == 'queue'
+    if dedupe_key and NotificationJob.objects.filter(dedupe_key=dedupe_key).exists():
+        return None
+    job = NotificationJob(
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        related_book=related_book,
+        related_user=related_user,
+        user_ids=list(user_ids or []),
+        audience=audience,
+        audience_kwargs=audience_kwargs or {},
+        status='pending' if defer else 'running',
+        started_at=None if defer else timezone.now(),
+        attempts=0 if defer else 1,
+        dedupe_key=dedupe_key,
+    )
+    if dedupe_key:
+        try:
+            with transaction.atomic():
+                job.save()
+        except IntegrityError:
+            # lost a race with another request enqueueing the same key
+            return None
+    else:
+        job.save()
+    if not defer:
+        try:
+            process_notification_job(job)
+        except Exception as exc:
+            # leave it for the worker to retry rather than failing the request
+            NotificationJob.objects.filter(pk=job.pk).update(status='pending', last_error=repr(exc))
+    return job
+
+
+def job_recipients(job):
+    if job.audience:
+        return import_string(job.audience)(**job.audience_kwargs)
+    return User.objects.filter(pk__in=job.user_ids)
+
+
+def process_notification_job(job, batch_size=None):
+    """
+    Deliver a claimed job batch by batch. Each batch commits together with
+    the job's progress, so a job retried after a crash resumes where it
+    stopped without notifying anyone twice.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    fields = dict(
+        notification_type=job.notification_type,
+        title=job.title,
+        message=job.message,
+        related_book_id=job.related_book_id,
+        related_user_id=job.related_user_id,
+    )
+    for batch in _id_batches(job_recipients(job), batch_size, after=job.last_user_id):
+        with transaction.atomic():
+            _deliver(batch, fields)
+            job.last_user_id = batch[-1]
+            job.delivered += len(batch)
+            # started_at doubles as a heartbeat so long jobs aren't mistaken for stale ones
+            NotificationJob.objects.filter(pk=job.pk).update(
+                last_user_id=job.last_user_id, delivered=job.delivered, started_at=timezone.now(),
+            )
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.last_error = ''
+    job.save(update_fields=['status', 'finished_at', 'last_error'])
+    return job.delivered
+
+
+def claim_notification_job(stale_after=600):
+    """
+    Take the oldest pending job, or one whose worker stopped reporting for
+    `stale_after` seconds. The claim is a conditional UPDATE, so concurrent
+    workers never run the same job.
+    """
+    now = timezone.now()
+    claimable = Q(status='pending') | Q(status='running', started_at__lt=now - timedelta(seconds=stale_after))
+    candidates = NotificationJob.objects.filter(claimable).order_by('created_at').values_list('pk', flat=True)[:10]
+    for job_id in candidates:
+        claimed = NotificationJob.objects.filter(claimable, pk=job_id).update(
+            status='running', started_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return NotificationJob.objects.get(pk=job_id)
+    return None
@@ -1,6 +1,6 @@
 from django.views.generic import TemplateView
-from apps.books.models import Book
-from django.db.models import Avg
+from apps.books.featured import get_featured_books
+from apps.books.trending import get_trending_books
 
 
 class HomeView(TemplateView):
@@ -9,10 +9,8 @@ class HomeView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get featured books (approved books with highest ratings)
-        featured_books = Book.objects.filter(status='approved').annotate(
-            avg_rating=Avg('reviews__rating')
-        ).order_by('-avg_rating')[:4]
-        
-        context['featured_books'] = featured_books
+        # Best-rated approved books, precomputed and cached (see apps/books/featured.py)
+        context['featured_books'] = get_featured_books()
+        # Most borrowed and downloaded lately (see apps/books/trending.py)
+        context['trending_books'] = get_trending_books()
         return context
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from apps.books.featured import refresh_featured_books
+from apps.books.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored rating count, sum and average of every book from its reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of books to update per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            batch_ids = list(
+                Book.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch_ids:
+                break
+            last_pk = batch_ids[-1]
+            updated += Book.objects.filter(pk__in=batch_ids).recompute_ratings()
+        refresh_featured_books()
+
+        self.stdout.write(self.style.SUCCESS(f'Ratings recomputed for {updated} book(s).'))
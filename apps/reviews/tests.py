@@ -0,0 +1,51 @@
+import io
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.books.models import Book
+from .models import Review
+
+User = get_user_model()
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password', role='author')
+        self.reader = User.objects.create_user(username='reader', password='password', role='reader')
+        self.book = Book.objects.create(
+            title='Rated', original_author='Original', author=self.author, description='d',
+            genre='fiction', language='English', publication_date=timezone.now().date(),
+            status='approved',
+        )
+        self.client.login(username='reader', password='password')
+
+    def assertRatings(self, count, total, avg):
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.rating_count, count)
+        self.assertEqual(self.book.rating_sum, total)
+        self.assertAlmostEqual(self.book.rating_avg, avg)
+
+    def test_create_edit_delete_keep_aggregates_in_step(self):
+        other = User.objects.create_user(username='other', password='password')
+        Review.objects.create(book=self.book, reviewer=other, rating=5, content='great')
+        Book.objects.filter(pk=self.book.pk).adjust_ratings(1, 5)
+
+        self.client.post(reverse('review_add', args=[self.book.pk]), {'rating': 2, 'title': 't', 'content': 'meh'})
+        self.assertRatings(2, 7, 3.5)
+
+        review = Review.objects.get(reviewer=self.reader)
+        self.client.post(reverse('review_edit', args=[review.pk]), {'rating': 4, 'title': 't', 'content': 'better'})
+        self.assertRatings(2, 9, 4.5)
+
+        self.client.post(reverse('review_delete', args=[review.pk]))
+        self.assertRatings(1, 5, 5.0)
+
+    def test_recompute_ratings_repairs_drift(self):
+        Review.objects.create(book=self.book, reviewer=self.reader, rating=3, content='ok')
+        Book.objects.filter(pk=self.book.pk).update(rating_count=10, rating_sum=1, rating_avg=0.1)
+        call_command('recompute_ratings', stdout=io.StringIO())
+        self.assertRatings(1, 3, 3.0)
@@ -2,6 +2,8 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
+from django.db import transaction
+from apps.books.featured import invalidate_featured_books
 from apps.books.models import Book
 from .models import Review
 from .forms import ReviewForm
@@ -32,7 +34,10 @@ class ReviewCreateView(LoginRequiredMixin, View):
             review = form.save(commit=False)
             review.book = book
             review.reviewer = request.user
-            review.save()
+            with transaction.atomic():
+                review.save()
+                Book.objects.filter(pk=book.pk).adjust_ratings(1, review.rating)
+            invalidate_featured_books()
             messages.success(request, 'Review posted successfully!')
             return redirect('book_detail', pk=book.pk)
         
@@ -61,9 +66,15 @@ class ReviewEditView(LoginRequiredMixin, View):
             messages.error(request, 'You cannot edit this review.')
             return redirect('book_detail', pk=review.book.pk)
         
+        old_rating = review.rating
         form = self.form_class(request.POST, instance=review)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                review = form.save()
+                if review.rating != old_rating:
+                    Book.objects.filter(pk=review.book_id).adjust_ratings(0, review.rating - old_rating)
+            if review.rating != old_rating:
+                invalidate_featured_books()
             messages.success(request, 'Review updated successfully!')
             return redirect('book_detail', pk=review.book.pk)
         
@@ -81,6 +92,9 @@ class ReviewDeleteView(LoginRequiredMixin, View):
             return redirect('book_detail', pk=review.book.pk)
         
         book_id = review.book.pk
-        review.delete()
+        with transaction.atomic():
+            review.delete()
+            Book.objects.filter(pk=book_id).adjust_ratings(-1, -review.rating)
+        invalidate_featured_books()
         messages.success(request, 'Review deleted successfully!')
         return redirect('book_detail', pk=book_id)
@@ -7,7 +7,7 @@ from .models import User, RoleChangeRequest
 class UserAdmin(BaseUserAdmin):
     fieldsets = BaseUserAdmin.fieldsets + (
         ('Additional Info', {
-            'fields': ('role', 'bio', 'profile_picture', 'favorite_genres', 'is_approved')
+            'fields': ('role', 'bio', 'profile_picture', 'is_approved')
         }),
     )
     list_display = ('username', 'email', 'role', 'is_approved', 'created_at')
@@ -1,7 +1,9 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm, UserChangeForm
+from django.contrib.auth.forms import PasswordChangeForm as BasePasswordChangeForm, UserCreationForm, UserChangeForm
 from django.core.exceptions import ValidationError
 import re
+from apps.books.feed import invalidate_feed
+from apps.books.models import Book, FavoriteGenre
 from .models import User, RoleChangeRequest
 
 
@@ -86,9 +88,49 @@ class CustomUserCreationForm(UserCreationForm):
 
 
 class CustomUserChangeForm(UserChangeForm):
+    favorite_genres = forms.MultipleChoiceField(
+        choices=Book.GENRE_CHOICES,
+        required=False,
+        widget=forms.CheckboxSelectMultiple(),
+        help_text='Used to suggest books on your dashboard'
+    )
+    
     class Meta:
         model = User
         fields = ('first_name', 'last_name', 'email', 'bio', 'profile_picture')
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['favorite_genres'].initial = list(
+                self.instance.favorite_genre_set.values_list('genre', flat=True)
+            )
+    
+    def save(self, commit=True):
+        user = super().save(commit=False)
+        if commit:
+            # only the form's columns, so counters updated meanwhile aren't overwritten
+            user.save(update_fields=[*self._meta.fields, 'updated_at'])
+            self.save_favorite_genres()
+        return user
+    
+    def save_favorite_genres(self):
+        chosen = set(self.cleaned_data.get('favorite_genres') or [])
+        current = set(self.instance.favorite_genre_set.values_list('genre', flat=True))
+        self.instance.favorite_genre_set.filter(genre__in=current - chosen).delete()
+        FavoriteGenre.objects.bulk_create(
+            [FavoriteGenre(user=self.instance, genre=genre) for genre in sorted(chosen - current)]
+        )
+        if chosen != current:
+            invalidate_feed(self.instance.pk)
+
+
+class PasswordChangeForm(BasePasswordChangeForm):
+    def save(self, commit=True):
+        user = super().save(commit=False)
+        if commit:
+            user.save(update_fields=['password', 'updated_at'])
+        return user
 
 
 class RoleChangeRequestForm(forms.ModelForm):
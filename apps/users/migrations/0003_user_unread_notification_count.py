@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-18 01:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counts(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Notification = apps.get_model('core', 'Notification')
+    unread = Notification.objects.filter(user=OuterRef('pk'), is_read=False).order_by().values('user')
+    User.objects.update(
+        unread_notification_count=Coalesce(Subquery(unread.annotate(n=Count('pk')).values('n')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_rolechangerequest_requested_role_and_more'),
+        ('core', '0003_alter_notification_notification_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notification_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of unread notifications'),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-18 01:54
+
+from django.db import migrations, models
+
+
+def copy_favorite_genres(apps, schema_editor):
+    """Turn the comma-separated favorite_genres text into FavoriteGenre rows, matching values or labels."""
+    User = apps.get_model('users', 'User')
+    Book = apps.get_model('books', 'Book')
+    FavoriteGenre = apps.get_model('books', 'FavoriteGenre')
+    genres = {}
+    for value, label in Book._meta.get_field('genre').choices:
+        genres[value] = value
+        genres[str(label).lower()] = value
+    rows = []
+    users = User.objects.exclude(favorite_genres__isnull=True).exclude(favorite_genres='')
+    for user_id, text in users.values_list('pk', 'favorite_genres').iterator():
+        matched = {genres.get(name.strip().lower()) for name in text.split(',')} - {None}
+        rows.extend(FavoriteGenre(user_id=user_id, genre=genre) for genre in sorted(matched))
+    FavoriteGenre.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_unread_notification_count'),
+        ('books', '0016_favorite_genre_feed_entry'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_favorite_genres, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='favorite_genres',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='feed_built_at',
+            field=models.DateTimeField(blank=True, help_text='When the "For You" feed was last built; cleared when it needs rebuilding', null=True),
+        ),
+    ]
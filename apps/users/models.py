@@ -28,11 +28,10 @@ class User(AbstractUser):
         help_text='User profile picture'
     )
     
-    favorite_genres = models.CharField(
-        max_length=255,
+    feed_built_at = models.DateTimeField(
         blank=True,
         null=True,
-        help_text='Comma-separated list of favorite genres for readers'
+        help_text='When the "For You" feed was last built; cleared when it needs rebuilding'
     )
     
     is_approved = models.BooleanField(
@@ -40,6 +39,11 @@ class User(AbstractUser):
         help_text='Whether the user account is approved'
     )
     
+    unread_notification_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of unread notifications'
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -5,8 +5,9 @@ from django.contrib.auth.views import PasswordChangeView as BasePasswordChangeVi
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.urls import reverse_lazy
+from apps.core.thumbnails import generate_variants
 from .models import User, RoleChangeRequest
-from .forms import CustomUserCreationForm, CustomUserChangeForm, RoleChangeRequestForm
+from .forms import CustomUserCreationForm, CustomUserChangeForm, PasswordChangeForm, RoleChangeRequestForm
 
 
 class RegisterView(View):
@@ -84,13 +85,16 @@ class ProfileEditView(LoginRequiredMixin, View):
     def post(self, request):
         form = self.form_class(request.POST, request.FILES, instance=request.user)
         if form.is_valid():
-            form.save()
+            user = form.save()
+            if user.profile_picture and 'profile_picture' in form.changed_data:
+                generate_variants(user.profile_picture)
             messages.success(request, 'Profile updated successfully!')
             return redirect('profile')
         return render(request, self.template_name, {'form': form})
 
 
 class PasswordChangeView(LoginRequiredMixin, BasePasswordChangeView):
+    form_class = PasswordChangeForm
     template_name = 'users/password_change.html'
     success_url = reverse_lazy('profile')
     login_url = 'login'
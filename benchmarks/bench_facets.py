@@ -0,0 +1,52 @@
+"""
+Facet counts on the search page: one GROUP BY per dimension, compared with
+the naive approach of one COUNT query per facet value.
+
+    python benchmarks/bench_facets.py --books 100000
+"""
+
+import argparse
+
+from common import seed_books, test_database, timer
+
+from apps.books.facets import compute_facets, normalize_filters
+from apps.books.models import Book
+from apps.books.search import get_search_backend
+
+
+def naive_facets(queryset, filters):
+    counts = {}
+    for field, choices in (('genre', Book.GENRE_CHOICES), ('availability', Book.AVAILABILITY_CHOICES)):
+        counts[field] = {value: queryset.filter(**{field: value}).count() for value, _ in choices}
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--books', type=int, default=100000)
+    args = parser.parse_args()
+
+    with test_database():
+        with timer(f'seed {args.books} books'):
+            seed_books(args.books)
+        backend = get_search_backend()
+        with timer('build search index'):
+            backend.rebuild()
+
+        approved = Book.objects.filter(status='approved')
+        cases = {
+            'no filters': normalize_filters(backend),
+            'genre=mystery,fantasy': normalize_filters(backend, genres=['mystery', 'fantasy']),
+            'query "dragon"': normalize_filters(backend, query='dragon'),
+            'query "dragon" + availability=borrow': normalize_filters(backend, query='dragon', availability=['borrow']),
+        }
+        for label, filters in cases.items():
+            base = backend.search(approved, filters['query']) if filters['query'] else approved
+            with timer(f'grouped facets: {label}'):
+                compute_facets(base, filters)
+            with timer(f'naive per-value COUNTs: {label}'):
+                naive_facets(base, filters)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Streaming catalogue import: writes a CSV of --rows books (a tenth of them
+repeating earlier ISBNs) and times `import_catalog` on it, then a dry run
+of the same file against the now-populated catalogue.
+
+    python benchmarks/bench_import_catalog.py --rows 1000000
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import resource
+import tempfile
+
+from common import WORDS, create_users, test_database, timer
+
+from django.core.management import call_command
+
+from apps.books.models import Book
+from apps.users.models import User
+
+
+def write_catalog(path, rows, seed=1):
+    rng = random.Random(seed)
+    genres = [value for value, _ in Book.GENRE_CHOICES]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['title', 'original_author', 'description', 'genre', 'language', 'publication_date',
+                         'isbn', 'pages'])
+        for i in range(rows):
+            number = rng.randrange(i) if i and rng.random() < 0.1 else i
+            writer.writerow([
+                ' '.join(rng.sample(WORDS, 3)).title(), rng.choice(WORDS).title(), ' '.join(rng.choices(WORDS, k=20)),
+                rng.choice(genres), 'English', f'{rng.randint(1800, 2024)}-01-01', f'978{number:010d}',
+                rng.randint(50, 900),
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    with test_database(), tempfile.TemporaryDirectory() as tmp:
+        create_users(1, prefix='owner', role='admin')
+        User.objects.filter(username='owner0').update(is_superuser=True)
+        path = os.path.join(tmp, 'catalog.csv')
+        with timer(f'write {args.rows} rows'):
+            write_catalog(path, args.rows)
+
+        with timer('import_catalog'):
+            call_command('import_catalog', path, '--chunk-size', str(args.chunk_size), stdout=io.StringIO())
+        print(f'{"books in catalogue":<50} {Book.objects.count():8d}')
+        with timer('import_catalog --dry-run (all duplicates)'):
+            call_command('import_catalog', path, '--dry-run', '--chunk-size', str(args.chunk_size),
+                         stdout=io.StringIO())
+        print(f'{"peak RSS (MB)":<50} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:8.0f}')
+
+
+if __name__ == '__main__':
+    main()
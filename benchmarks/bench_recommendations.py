@@ -0,0 +1,78 @@
+"""
+Offline "readers also borrowed" build: seeds --books books and
+--interactions borrows and downloads (popular books drawn more often,
+readers with a few favourite genres) and times `build_recommendations`,
+then the detail page's neighbour query.
+
+    python benchmarks/bench_recommendations.py --books 100000 --interactions 1000000
+"""
+
+import argparse
+import io
+import random
+import resource
+
+from common import create_users, explain, seed_books, test_database, timer
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.books.models import Book, BookDownload, BookNeighbor
+from apps.books.recommendations import similar_books
+from apps.borrowing.models import BorrowRequest
+
+
+def seed_interactions(count, reader_ids, book_ids, batch_size=20000, seed=1):
+    rng = random.Random(seed)
+    # a long tail: book i is drawn with weight 1 / (i + 1)
+    weights = [1 / (rank + 1) for rank in range(len(book_ids))]
+    borrows, downloads = [], []
+    per_reader = max(1, count // len(reader_ids))
+    done = 0
+    while done < count:
+        reader = rng.choice(reader_ids)
+        books = rng.choices(book_ids, weights=weights, k=rng.randint(1, 2 * per_reader))
+        for book in books:
+            if rng.random() < 0.5:
+                borrows.append(BorrowRequest(reader_id=reader, book_id=book, status='approved'))
+            else:
+                downloads.append(BookDownload(user_id=reader, book_id=book))
+        done += len(books)
+        if len(borrows) + len(downloads) >= batch_size:
+            BorrowRequest.objects.bulk_create(borrows)
+            BookDownload.objects.bulk_create(downloads)
+            borrows, downloads = [], []
+    BorrowRequest.objects.bulk_create(borrows)
+    BookDownload.objects.bulk_create(downloads)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--readers', type=int, default=50000)
+    parser.add_argument('--interactions', type=int, default=1000000)
+    parser.add_argument('--block-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with test_database():
+        with timer(f'seed {args.books} books, {args.interactions} interactions'):
+            book_ids = seed_books(args.books)
+            reader_ids = create_users(args.readers, prefix='reader')
+            seed_interactions(args.interactions, reader_ids, book_ids)
+
+        with timer('build_recommendations'):
+            call_command('build_recommendations', '--block-size', str(args.block_size), stdout=io.StringIO())
+        print(f'{"neighbour rows":<50} {BookNeighbor.objects.count():8d}')
+        print(f'{"peak RSS (MB)":<50} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:8.0f}')
+
+        book = Book.objects.get(pk=book_ids[0])
+        with CaptureQueriesContext(connection) as queries, timer('similar_books (x100)'):
+            for _ in range(100):
+                list(similar_books(book))
+        print(f'{"queries per detail page":<50} {len(queries) // 100:8d}')
+        print(explain(similar_books(book)))
+
+
+if __name__ == '__main__':
+    main()
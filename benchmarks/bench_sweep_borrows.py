@@ -0,0 +1,81 @@
+"""
+Due-soon/overdue sweep over a large loan table: batches read from a partial
+index over the loans not yet reminded, which reruns find empty.
+--naive also times the per-object is_overdue() scan it replaces.
+
+    python benchmarks/bench_sweep_borrows.py --loans 1000000
+"""
+
+import argparse
+import random
+from datetime import timedelta
+
+from common import create_users, explain, seed_books, test_database, timer
+
+from django.utils import timezone
+
+from apps.borrowing.models import BorrowRequest
+from apps.borrowing.reminders import ACTIVE_STATUSES, sweep
+from apps.core.models import Notification
+
+
+def seed_loans(count, reader_ids, book_ids, batch_size=20000, seed=1):
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    returned = timezone.now()
+    statuses = ['approved'] * 6 + ['borrowed'] * 2 + ['rejected', 'cancelled']
+    batch = []
+    for _ in range(count):
+        status = rng.choice(statuses)
+        batch.append(BorrowRequest(
+            reader_id=rng.choice(reader_ids),
+            book_id=rng.choice(book_ids),
+            status=status,
+            due_date=today + timedelta(days=rng.randint(-180, 21)),
+            # a third of approved loans have already come back
+            returned_at=returned if status in ACTIVE_STATUSES and rng.random() < 0.33 else None,
+        ))
+        if len(batch) >= batch_size:
+            BorrowRequest.objects.bulk_create(batch)
+            batch = []
+    BorrowRequest.objects.bulk_create(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--loans', type=int, default=1000000)
+    parser.add_argument('--readers', type=int, default=20000)
+    parser.add_argument('--naive', action='store_true', help='also time the per-object Python scan')
+    args = parser.parse_args()
+
+    with test_database():
+        with timer(f'seed {args.loans} loans'):
+            book_ids = seed_books(2000)
+            reader_ids = create_users(args.readers, prefix='reader')
+            seed_loans(args.loans, reader_ids, book_ids)
+
+        today = timezone.localdate()
+        print(explain(BorrowRequest.objects.filter(
+            status__in=ACTIVE_STATUSES, due_date__gte=today, due_date__lte=today + timedelta(days=2),
+            returned_at__isnull=True, due_reminder_sent_at__isnull=True,
+        ).order_by('pk').values_list('pk', 'reader_id', 'book_id', 'book__title', 'due_date')[:1000]))
+
+        for kind in ('due_soon', 'overdue'):
+            with timer(f'first sweep: {kind}'):
+                sent = sweep(kind, today=today)
+            print(f'  {sent} reminder(s)')
+            with timer(f'rerun same day: {kind}'):
+                sweep(kind, today=today)
+        with timer('next day: both kinds'):
+            sent = sweep('due_soon', today=today + timedelta(days=1)) + sweep('overdue', today=today + timedelta(days=1))
+        print(f'  {sent} reminder(s)')
+        print(f'{Notification.objects.count()} notifications written')
+
+        if args.naive:
+            with timer('naive: is_overdue() over every active loan'):
+                overdue = [loan for loan in BorrowRequest.objects.filter(status__in=ACTIVE_STATUSES) if loan.is_overdue()]
+            print(f'  {len(overdue)} overdue loan(s) (all of them, every run)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Incremental trending refresh: seeds --history-events already folded into
+the scores (spread over the last 30 days of hourly buckets) and times
+`refresh_trending` for batches of new events. The refresh cost should
+follow the number of new events, whatever the size of the history.
+
+    python benchmarks/bench_trending.py --books 100000 --history-events 10000000
+"""
+
+import argparse
+import random
+from datetime import timedelta
+
+from common import seed_books, test_database, timer
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.books.models import BookActivityBucket
+from apps.books.trending import floor_hour, refresh_trending
+
+
+def seed_buckets(events, book_ids, hours, pending, rng, batch_size=20000):
+    """Spread `events` over buckets for (book, hour) pairs; returns the hours used."""
+    now = floor_hour(timezone.now())
+    counts = {}
+    for _ in range(events):
+        key = (rng.choice(book_ids), now - timedelta(hours=rng.choice(hours)))
+        counts[key] = counts.get(key, 0) + 1
+    batch = []
+    for (book_id, hour), count in counts.items():
+        batch.append(BookActivityBucket(book_id=book_id, hour=hour, count=count, pending=count if pending else 0))
+        if len(batch) >= batch_size:
+            BookActivityBucket.objects.bulk_create(batch)
+            batch = []
+    BookActivityBucket.objects.bulk_create(batch)
+    return len(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--history-events', type=int, default=10000000)
+    parser.add_argument('--new-events', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with test_database():
+        book_ids = seed_books(args.books)
+        refresh_trending()
+        # history in hours 24..720 ago, new events in the last day, so the two never share a bucket
+        for history in (0, args.history_events):
+            BookActivityBucket.objects.all().delete()
+            with timer(f'seed {history} history events'):
+                buckets = seed_buckets(history, book_ids, range(24, 720), False, rng)
+            print(f'{"history buckets":<50} {buckets:8d}')
+            for new_events in args.new_events:
+                BookActivityBucket.objects.filter(hour__gt=timezone.now() - timedelta(hours=24)).delete()
+                seed_buckets(new_events, book_ids, range(0, 24), True, rng)
+                with CaptureQueriesContext(connection) as queries, \
+                        timer(f'refresh {new_events} new events ({history} history)'):
+                    counts = refresh_trending()
+                print(f'{"  buckets / books / queries":<50} {counts["buckets"]:8d} {counts["books"]:8d} '
+                      f'{len(queries):8d}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Shared setup for the benchmark scripts in this directory.
+
+Every benchmark runs against a fresh test database created the same way
+`manage.py test` does (in memory for SQLite), never against db.sqlite3.
+Run them from the project root, e.g.:
+
+    python benchmarks/bench_facets.py --books 100000
+"""
+
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment
+
+from apps.books.models import Book
+from apps.users.models import User
+
+WORDS = (
+    'dragon shadow river garden winter empire secret journey ocean silver '
+    'forest crown midnight letter castle storm island memory harbor mirror'
+).split()
+
+LANGUAGES = ['English'] * 6 + ['French', 'Spanish', 'German', 'Italian']
+
+
+@contextmanager
+def test_database():
+    """Create a throwaway test database for the duration of the block."""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def timer(label):
+    start = time.perf_counter()
+    yield
+    print(f'{label:<50} {time.perf_counter() - start:8.3f}s')
+
+
+def create_users(count, prefix='user', role='reader'):
+    users = [User(username=f'{prefix}{i}', role=role, first_name=random.choice(WORDS).title())
+             for i in range(count)]
+    User.objects.bulk_create(users, batch_size=5000)
+    return list(User.objects.filter(username__startswith=prefix).values_list('pk', flat=True))
+
+
+def seed_books(count, author_count=50, batch_size=5000, seed=1):
+    """Bulk insert `count` approved books with varied genres and languages."""
+    rng = random.Random(seed)
+    author_ids = create_users(author_count, prefix='author', role='author')
+    genres = [value for value, _ in Book.GENRE_CHOICES]
+    availability = [value for value, _ in Book.AVAILABILITY_CHOICES]
+    today = date.today()
+
+    batch = []
+    for i in range(count):
+        batch.append(Book(
+            title=' '.join(rng.sample(WORDS, 3)).title(),
+            original_author=rng.choice(WORDS).title(),
+            author_id=rng.choice(author_ids),
+            description=' '.join(rng.choices(WORDS, k=30)),
+            genre=rng.choice(genres),
+            language=rng.choice(LANGUAGES),
+            availability=rng.choice(availability),
+            status='approved' if rng.random() < 0.9 else 'pending',
+            publication_date=today - timedelta(days=rng.randint(0, 20000)),
+            isbn=f'bench-{i}',
+        ))
+        if len(batch) >= batch_size:
+            Book.objects.bulk_create(batch)
+            batch = []
+    Book.objects.bulk_create(batch)
+    return list(Book.objects.values_list('pk', flat=True))
+
+
+def explain(queryset):
+    return queryset.explain()
@@ -76,6 +76,28 @@ DATABASES = {
     }
 }
 
+# Cache shared by every web worker and the management commands: featured and
+# trending lists, facet counts, notification previews, thumbnail hashes and
+# the feed's genre lists are written by one process and read by the others.
+# The database backend needs `python manage.py createcachetable`; set
+# REDIS_URL to use Redis instead.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            # thumbnail entries never expire; the default of 300 entries would cull them
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -139,3 +161,99 @@ DEFAULT_PAGE_SIZE = 10
 # Book borrowing settings
 BOOK_BORROW_DAYS = 14
 BOOK_REMINDER_DAYS = 2
+
+# Book file storage: uploads are stored by SHA-256 digest outside MEDIA_ROOT
+BOOK_BLOB_STORE = 'apps.books.storage.FileSystemBlobStore'
+BOOK_BLOB_ROOT = BASE_DIR / 'blobstore'
+
+# How book files are sent to the client:
+#   'django' - streamed by the worker (development)
+#   'nginx'  - X-Accel-Redirect to the internal locations below
+#   'apache' - X-Sendfile with the absolute path (mod_xsendfile)
+BOOK_FILE_DELIVERY = os.getenv('BOOK_FILE_DELIVERY', 'django')
+BOOK_ACCEL_BLOB_PREFIX = '/protected/blobs/'
+BOOK_ACCEL_MEDIA_PREFIX = '/protected/media/'
+
+# Server-side page rendering for the PDF viewer. BOOK_PAGE_RENDERER is the
+# dotted path of a PageRenderer; empty picks pdftoppm (poppler-utils) or,
+# failing that, pypdf text extraction. Without either the viewer uses pdf.js.
+BOOK_PAGE_RENDERER = os.getenv('BOOK_PAGE_RENDERER', '')
+BOOK_PAGE_DPI = 110
+BOOK_PAGE_CACHE_ROOT = BASE_DIR / 'pagecache'
+BOOK_PAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Prune the page cache after this many pages have been written
+BOOK_PAGE_CACHE_PRUNE_INTERVAL = 100
+
+# Resumable uploads: parts are staged under BOOK_UPLOAD_ROOT (empty means
+# inside BOOK_BLOB_ROOT, so completing an upload is a rename)
+BOOK_UPLOAD_ROOT = os.getenv('BOOK_UPLOAD_ROOT', '')
+BOOK_UPLOAD_MAX_BYTES = 1024 * 1024 * 1024
+BOOK_UPLOAD_PART_MAX_BYTES = 8 * 1024 * 1024
+# Unfinished uploads untouched this long are removed by `manage.py prune_uploads`
+BOOK_UPLOAD_EXPIRY_HOURS = 24
+
+# Resized variants of covers and profile pictures, written next to the
+# originals when they are uploaded (and by `manage.py generate_thumbnails`).
+# Widths above the original's are capped. The last format is the <img> fallback.
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_FORMATS = ('webp', 'jpeg')
+THUMBNAIL_QUALITY = 80
+
+# Post-upload processing of book files (MIME sniffing, page count, cover,
+# EPUB index): 'pool' runs it in BOOK_PROCESSING_WORKERS threads once the
+# upload commits; 'queue' leaves it to `manage.py process_uploads`
+BOOK_PROCESSING = os.getenv('BOOK_PROCESSING', 'pool')
+BOOK_PROCESSING_WORKERS = 2
+# Bounding box of generated cover thumbnails
+BOOK_COVER_SIZE = (400, 600)
+
+# Lifetime in seconds of the signed grant the book viewer hands to its file requests
+BOOK_ACCESS_GRANT_TTL = 300
+
+# Featured books on the landing page, ranked by a Bayesian average that adds
+# FEATURED_BOOKS_PRIOR_WEIGHT ratings at the catalogue mean to every book.
+# Refresh with `manage.py refresh_featured_books` more often than the timeout.
+FEATURED_BOOKS_COUNT = 4
+FEATURED_BOOKS_PRIOR_WEIGHT = 5
+FEATURED_BOOKS_CACHE_TIMEOUT = 60 * 60
+
+# "Readers also borrowed" (manage.py build_recommendations): neighbours stored per book,
+# shown on the detail page, books per write transaction, weight of each kind of
+# interaction, and readers with more books than this are left out of the build
+RECOMMENDATIONS_NEIGHBORS = 20
+RECOMMENDATIONS_SHOWN = 4
+RECOMMENDATIONS_BLOCK_SIZE = 1000
+RECOMMENDATION_WEIGHTS = {'borrows': 3, 'reading': 2, 'downloads': 2, 'wishlist': 1}
+RECOMMENDATIONS_MAX_USER_ITEMS = 500
+
+# Readers' "For You" feed (apps.books.feed): books kept per reader, how the score blends
+# genre affinity, popularity and recency, the recency half-life in days, how long the
+# per-genre candidate lists are cached, and readers rebuilt per batch by build_feeds
+READER_FEED_SIZE = 100
+READER_FEED_WEIGHTS = {'genre': 0.6, 'popularity': 0.25, 'recency': 0.15}
+READER_FEED_RECENCY_DAYS = 90
+READER_FEED_LEADERS_TIMEOUT = 60 * 60
+READER_FEED_BATCH_SIZE = 500
+
+# Trending books (apps.books.trending): an event's weight halves every TRENDING_HALF_LIFE_HOURS;
+# books need a decayed score of TRENDING_MIN_SCORE (e.g. one event in the last half-life)
+# to be listed. Folded-in hourly buckets are kept for TRENDING_BUCKET_RETENTION_DAYS.
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_MIN_SCORE = 0.5
+TRENDING_BOOKS_COUNT = 4
+TRENDING_CACHE_TIMEOUT = 5 * 60
+TRENDING_BUCKET_RETENTION_DAYS = 30
+
+# Rows fetched per round trip by the admin exports and `manage.py export_catalog`
+EXPORT_CHUNK_SIZE = 2000
+
+# Seconds to cache search facet counts per normalized query
+BOOK_FACET_CACHE_TIMEOUT = 300
+
+# Seconds to cache each user's notification preview (cleared on every write)
+NOTIFICATION_PREVIEW_CACHE_TIMEOUT = 300
+
+# 'inline' delivers notification fan-outs during the request; 'queue' leaves
+# them to `manage.py process_notification_jobs`
+NOTIFICATION_DISPATCH = os.getenv('NOTIFICATION_DISPATCH', 'inline')
+NOTIFICATION_BATCH_SIZE = 500